@@ -1,311 +1,885 @@
 # 1_create_database.py - ИСПРАВЛЕННАЯ ВЕРСИЯ БЕЗ ОШИБОК
+import argparse
+import hashlib
+from array import array
 import sqlite3
 import pandas as pd
 import os
-import re
-
-print("="*60)
-print("СОЗДАНИЕ БАЗЫ ДАННЫХ ДЛЯ КНИГ С ФИЛЬТРАЦИЕЙ")
-print("="*60)
-
-def clean_text(text):
-    """Очищает текст от лишних символов"""
-    if not text or str(text).lower() == 'nan' or text == 'None':
-        return ""
-    text = str(text).strip()
-    text = re.sub(r'\s+', ' ', text)
-    return text
-
-def is_valid_book(book_data):
-    """Проверяет, является ли книга валидной"""
-    title = clean_text(book_data.get('title', ''))
-    author = clean_text(book_data.get('author', ''))
-    price = book_data.get('price', 0)
+from concurrent.futures import ProcessPoolExecutor
+
+from dedup import FuzzyMatcher, UnionFind
+
+# Текстовые столбцы CSV, которые попадают в базу
+TEXT_COLUMNS = ['title', 'author', 'isbn', 'url', 'image_url']
+
+# В ссылках пробелов внутри не бывает - их только обрезаем по краям
+URL_COLUMNS = ['url', 'image_url']
+
+# Так выглядят пропуски после str(): 'nan' в любом регистре и 'None'
+MISSING_VALUES = [a + b + c for a in 'nN' for b in 'aA' for c in 'nN'] + ['None']
+
+# Заглушки парсера вместо настоящего названия
+INVALID_TITLES = ["Без названия", "Название не указано"]
+
+def clean_text_column(column, collapse_spaces=True):
+    """Очищает текстовый столбец: пропуски, 'nan' и 'None' -> '', пробелы -> один пробел"""
+    column = column.fillna('').astype(str).str.strip()
+    if collapse_spaces:
+        # Замена по регулярному выражению дорогая - делаем ее только там, где она что-то изменит
+        messy = column.str.contains(r'\s\s|[^\S ]', regex=True)
+        if messy.any():
+            column = column.copy()
+            column[messy] = column[messy].str.replace(r'\s+', ' ', regex=True)
+    return column.mask(column.isin(MISSING_VALUES), '')
+
+def load_source(filename, website):
+    """Читает CSV магазина и возвращает (DataFrame валидных книг, число отброшенных строк).
     
-    if not title or title == "Без названия" or title == "Название не указано":
-        return False
+    Очистка и фильтрация делаются операциями над столбцами целиком, без цикла по строкам.
+    Книга валидна, если у нее есть название (не заглушка, от 2 символов) и цена > 0.
+    """
+    df = pd.read_csv(filename, encoding='utf-8-sig', dtype=str)
     
-    if price <= 0:
-        return False
+    books = pd.DataFrame(index=df.index)
+    for column in TEXT_COLUMNS:
+        if column in df.columns:
+            books[column] = clean_text_column(df[column], collapse_spaces=column not in URL_COLUMNS)
+        else:
+            books[column] = ''
+    # ISBN - ключ объединения книг разных магазинов: «978-5-04-...» и «9785...» - одно и то же
+    books['isbn'] = books['isbn'].str.replace(r'[\s-]', '', regex=True).str.upper()
+    books['price'] = pd.to_numeric(df['price'], errors='coerce') if 'price' in df.columns else 0.0
+    books['website'] = website
     
-    if len(title) < 2:
-        return False
+    valid = (
+        (books['title'].str.len() >= 2)
+        & ~books['title'].isin(INVALID_TITLES)
+        & (books['price'] > 0)
+    )
+    books = books.loc[valid, ['title', 'author', 'isbn', 'price', 'website', 'url', 'image_url']]
+    return books, int((~valid).sum())
+
+def load_sources(sources, workers=None):
+    """Читает CSV магазинов (load_source) в отдельных процессах - по файлу на процесс.
     
-    return True
-
-# 1. Создаем базу данных
-conn = sqlite3.connect('book_database.db')
-cursor = conn.cursor()
-
-# 2. Создаем таблицы - БЕЗ КОММЕНТАРИЕВ С #
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS products (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    title TEXT NOT NULL,
-    author TEXT,
-    isbn TEXT UNIQUE,
-    image_url TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-)
-''')
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS offers (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    product_id INTEGER NOT NULL,
-    website TEXT NOT NULL,
-    price REAL,
-    url TEXT NOT NULL,
-    parsed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    UNIQUE(product_id, website, url),
-    FOREIGN KEY (product_id) REFERENCES products(id)
-)
-''')
-
-print("✅ Созданы таблицы")
-
-# 3. Загружаем и фильтруем данные
-csv_files = [
-    ('chitai_gorod_1000.csv', 'chitai-gorod'),
-    ('labirint_1000.csv', 'labirint'),
-    ('moscowbooks_1000.csv', 'moscowbooks')
-]
-
-all_books = []
-valid_count = 0
-invalid_count = 0
-
-for filename, website in csv_files:
-    if os.path.exists(filename):
-        print(f"\n📖 Загружаем {filename}...")
-        
-        try:
-            df = pd.read_csv(filename, encoding='utf-8-sig')
-            print(f"   Найдено {len(df)} записей")
-            
-            # Берем все записи, а не только 200
-            for _, row in df.iterrows():
-                try:
-                    book = {
-                        'title': str(row.get('title', '')),
-                        'author': str(row.get('author', '')),
-                        'isbn': str(row.get('isbn', '')),
-                        'price': float(row.get('price', 0)),
-                        'website': website,
-                        'url': str(row.get('url', '')),
-                        'image_url': str(row.get('image_url', ''))
-                    }
-                    
-                    # Фильтрация
-                    if is_valid_book(book):
-                        book['title'] = clean_text(book['title'])
-                        book['author'] = clean_text(book['author'])
-                        book['isbn'] = clean_text(book['isbn'])
-                        
-                        all_books.append(book)
-                        valid_count += 1
-                    else:
-                        invalid_count += 1
-                        
-                except (ValueError, TypeError):
-                    invalid_count += 1
-                    continue
-                    
-            print(f"   ✅ Валидных: {valid_count}, ❌ Отброшено: {invalid_count}")
-            valid_count = 0  # Сбрасываем для следующего файла
-            invalid_count = 0
-            
-        except Exception as e:
-            print(f"❌ Ошибка чтения файла: {str(e)[:50]}")
+    Отдает (файл, магазин, DataFrame валидных книг, число отброшенных строк, ошибка)
+    в порядке sources - каждый файл, как только готов он и все предыдущие. Поэтому
+    дедупликация первого магазина идет, пока остальные еще читаются, а порядок
+    книг (и id товаров) не зависит от того, какой процесс закончил раньше.
+    Столбцы DataFrame передаются между процессами целиком, а не построчно.
+    workers - число процессов (по умолчанию - по числу ядер, но не больше числа
+    файлов); при одном процессе файлы читаются здесь же, без пула.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(sources))
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        futures = [executor.submit(load_source, filename, website) if executor else None
+                   for filename, website in sources]
+        for (filename, website), future in zip(sources, futures):
+            try:
+                books, invalid_count = future.result() if future else load_source(filename, website)
+            except Exception as e:
+                yield filename, website, None, 0, e
+                continue
+            yield filename, website, books, invalid_count, None
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+
+def iter_books(books, chunk_size=100_000):
+    """Строки DataFrame книг - словарями для deduplicate"""
+    # Столбцы в списки Python - заметно быстрее, чем to_dict('records'); кусками,
+    # чтобы не держать копию всего файла объектами Python
+    columns = list(books.columns)
+    for start in range(0, len(books), chunk_size):
+        chunk = books.iloc[start:start + chunk_size]
+        for row in zip(*(chunk[c].tolist() for c in columns)):
+            yield dict(zip(columns, row))
+
+class ProductColumns:
+    """Новые товары столбцами: id - first_id + номер строки, строка -
+    (id, название, автор, isbn, картинка), как ее вставляет executemany.
+    Без кортежа и списка на каждый товар, id не хранится вовсе."""
+
+    def __init__(self, first_id):
+        self.first_id = first_id
+        self.titles = []
+        self.authors = []
+        self.isbns = []
+        self.image_urls = []
+
+    def append(self, title, author, isbn, image_url):
+        """Добавляет товар и возвращает его id"""
+        self.titles.append(title)
+        self.authors.append(author)
+        self.isbns.append(isbn)
+        self.image_urls.append(image_url)
+        return self.first_id + len(self.titles) - 1
+
+    def keep(self, kept):
+        """Оставляет только товары, для которых kept[номер строки] истинно (id идут подряд заново)"""
+        for name in ('titles', 'authors', 'isbns', 'image_urls'):
+            setattr(self, name, [value for value, keep in zip(getattr(self, name), kept) if keep])
+
+    def __len__(self):
+        return len(self.titles)
+
+    def __getitem__(self, index):
+        return (self.first_id + index, self.titles[index], self.authors[index],
+                self.isbns[index], self.image_urls[index])
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+class OfferColumns:
+    """Новые предложения столбцами: строка - (id товара, магазин, цена, url, хэш),
+    как ее вставляет executemany.
+    
+    Кортеж на строку со своими int, float и строкой хэша - сотни байт на
+    предложение. Здесь id товаров и цены лежат в array, магазин - номер в
+    websites (строка магазина одна на все его предложения), хэш - 20 байт в
+    общем bytearray; объекты строки создаются только при ее чтении.
+    """
+
+    def __init__(self):
+        self.websites = []
+        self._website_codes = {}
+        self.product_ids = array('q')
+        self.website_codes = array('H')
+        self.prices = array('d')
+        self.urls = []
+        self.hashes = bytearray()
+
+    def append(self, product_id, website, price, url, row_hash):
+        code = self._website_codes.get(website)
+        if code is None:
+            code = self._website_codes[website] = len(self.websites)
+            self.websites.append(website)
+        self.product_ids.append(product_id)
+        self.website_codes.append(code)
+        self.prices.append(price)
+        self.urls.append(url)
+        self.hashes += bytes.fromhex(row_hash)
+
+    def __len__(self):
+        return len(self.urls)
+
+    def __getitem__(self, index):
+        return (self.product_ids[index], self.websites[self.website_codes[index]], self.prices[index],
+                self.urls[index], self.hashes[index * 20:index * 20 + 20].hex())
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+def content_hash(book):
+    """Хэш содержимого предложения - по нему повторная загрузка находит измененные строки"""
+    fields = [book['title'], book['author'], book['isbn'], repr(float(book['price'])), book['image_url']]
+    return hashlib.sha1('\x1f'.join(fields).encode('utf-8')).hexdigest()
+
+def title_key(title, author):
+    """Ключ точного совпадения книги: «название_автор» в нижнем регистре"""
+    return f"{title.lower()}_{author.lower() if author else ''}"
+
+def load_existing(cursor, matcher=None):
+    """Читает из базы то, что уже загружено: карты ISBN и «название_автор» -> id товара
+    и предложения по URL (url -> (id предложения, хэш содержимого, id товара)).
+    Товары добавляются и в matcher (dedup.FuzzyMatcher), если он передан."""
+    isbn_to_id = {}
+    title_author_to_id = {}
+    cursor.execute("SELECT id, title, author, isbn FROM products ORDER BY id")
+    for product_id, title, author, isbn in cursor:
+        if isbn:
+            isbn_to_id.setdefault(isbn, product_id)
+        key = title_key(title, author)
+        if key not in title_author_to_id:
+            title_author_to_id[key] = product_id
+            if matcher is not None:
+                matcher.add_later(product_id, title, author)
+    
+    cursor.execute("SELECT url, id, content_hash, product_id FROM offers")
+    known_offers = {url: (offer_id, row_hash, product_id) for url, offer_id, row_hash, product_id in cursor}
+    return isbn_to_id, title_author_to_id, known_offers
+
+def merge_pairs(clusters):
+    """Связные компоненты UnionFind товаров -> пары (id оставшегося товара, id дубликата);
+    остается наименьший id компоненты - самый старый товар"""
+    pairs = []
+    for members in clusters.groups():
+        kept = min(members)
+        pairs.extend((kept, member) for member in sorted(members) if member != kept)
+    return pairs
+
+def deduplicate(books, next_product_id=1, existing=None, matcher=None):
+    """Раскладывает книги на уникальные товары и предложения, не обращаясь к базе.
+    
+    id новых товаров назначаются здесь же, начиная с next_product_id, поэтому
+    товары и предложения потом вставляются в базу пачками. existing - результат
+    load_existing(): книги сопоставляются и с уже загруженными товарами, а
+    предложения с известным URL не вставляются заново - у измененных
+    обновляется цена, неизмененные пропускаются. matcher (dedup.FuzzyMatcher) -
+    книга без совпадения ISBN и «название_автор» ищется среди товаров с похожими
+    названием и автором («Лукьяненко С. В.» и «Сергей Лукьяненко»); без него
+    совпадение только точное.
+    
+    Каждое совпадение книги (ISBN, «название_автор», известный URL, похожая книга) -
+    ребро между товарами, товары - связные компоненты (dedup.UnionFind). Поэтому
+    книга с ISBN одного товара и названием другого объединяет их, в каком бы
+    порядке ни шли строки CSV. Если так связались уже загруженные товары, они
+    попадают в пары для merge_products().
+    Возвращает (строки products - ProductColumns, строки offers - OfferColumns,
+    строки для обновления offers (цена, хэш, id предложения, id товара),
+    число неизмененных предложений, число отброшенных повторов URL,
+    пары (id оставшегося товара, id дубликата) среди уже загруженных).
+    """
+    if existing is None:
+        existing = ({}, {}, {})
+    isbn_to_id, title_author_to_id, known_offers = existing
+    processed_urls = set()
+    clusters = UnionFind()
+    first_new_id = next_product_id
+    
+    new_products = ProductColumns(first_new_id)
+    offers = OfferColumns()
+    update_rows = []
+    unchanged_offers = 0
+    duplicate_offers_rejected = 0
+    
+    for book in books:
+        # Пропускаем если URL уже обработан
+        url = book['url']
+        if url in processed_urls:
+            duplicate_offers_rejected += 1
             continue
-    else:
-        print(f"⚠️ Файл {filename} не найден")
-
-print(f"\n📚 Всего валидных книг для обработки: {len(all_books)}")
+        processed_urls.add(url)
+        
+        # Предложение уже в базе: сравниваем содержимое по хэшу, товар - тот же
+        row_hash = content_hash(book)
+        known = known_offers.get(url)
+        linked = []
+        if known is not None:
+            offer_id, known_hash, known_product_id = known
+            if known_hash == row_hash:
+                unchanged_offers += 1
+            else:
+                update_rows.append((book['price'], row_hash, offer_id, known_product_id))
+            linked.append(known_product_id)
+        
+        isbn = book['isbn']
+        key = title_key(book['title'], book['author'])
+        
+        # Способ 1: По ISBN, способ 2: по названию и автору, способ 3: по похожим названию и автору
+        if isbn and isbn in isbn_to_id:
+            linked.append(isbn_to_id[isbn])
+        if key in title_author_to_id:
+            linked.append(title_author_to_id[key])
+        if not linked and matcher is not None:
+            similar_id = matcher.find(book['title'], book['author'])
+            if similar_id is not None:
+                linked.append(similar_id)
+        
+        if linked:
+            product_id = linked[0]
+            for other_id in linked[1:]:
+                clusters.union(product_id, other_id)
+        else:
+            # Создаем новую книгу (без ISBN - с NULL, чтобы не нарушать UNIQUE)
+            product_id = new_products.append(book['title'], book['author'], isbn or None, book['image_url'])
+            if matcher is not None:
+                matcher.add(product_id, book['title'], book['author'])
+        
+        if isbn and isbn not in isbn_to_id:
+            isbn_to_id[isbn] = product_id
+            # Новый товар без ISBN получает ISBN первого своего предложения, у которого он есть
+            if product_id >= first_new_id and new_products.isbns[product_id - first_new_id] is None:
+                new_products.isbns[product_id - first_new_id] = isbn
+        title_author_to_id.setdefault(key, product_id)
+        
+        if known is None:
+            offers.append(product_id, book['website'], book['price'], url, row_hash)
+    
+    # Компоненты: остается самый старый товар, у новых id идут подряд без пропусков
+    merge_rows = []
+    kept_id = {}
+    isbns = new_products.isbns
+    for kept, duplicate in merge_pairs(clusters):
+        kept_id[duplicate] = kept
+        if duplicate < first_new_id:
+            merge_rows.append((kept, duplicate))
+        elif kept >= first_new_id and isbns[kept - first_new_id] is None:
+            # ISBN дубликата переходит к оставшемуся товару, если у того своего нет
+            isbns[kept - first_new_id] = isbns[duplicate - first_new_id]
+    
+    if kept_id:
+        # Новые id после удаления дубликатов - по номеру строки нового товара
+        final_id = array('q', [0]) * len(new_products)
+        next_id = first_new_id
+        for index in range(len(new_products)):
+            if first_new_id + index not in kept_id:
+                final_id[index] = next_id
+                next_id += 1
+        new_products.keep(final_id)
+        product_ids = offers.product_ids
+        for index, product_id in enumerate(product_ids):
+            product_id = kept_id.get(product_id, product_id)
+            product_ids[index] = final_id[product_id - first_new_id] if product_id >= first_new_id else product_id
+    
+    return new_products, offers, update_rows, unchanged_offers, duplicate_offers_rejected, merge_rows
 
-if len(all_books) == 0:
-    print("\n❌ Нет валидных данных для обработки!")
-    print("Проверьте CSV файлы и их содержимое")
-    conn.close()
-    exit()
-
-# 4. Дедупликация
-print("\n🔄 ВЫПОЛНЯЕМ ДЕДУПЛИКАЦИЮ...")
-
-isbn_to_id = {}
-title_author_to_id = {}
-processed_urls = set()
-
-products_added = 0
-offers_added = 0
-duplicate_offers_rejected = 0
-
-for book in all_books:
-    # Пропускаем если URL уже обработан
-    url = book['url']
-    if url in processed_urls:
-        duplicate_offers_rejected += 1
-        continue
-    processed_urls.add(url)
+def find_duplicates(cursor, matcher=None):
+    """Ищет дубликаты среди товаров уже собранной базы и возвращает пары
+    (id оставшегося товара, id дубликата) для merge_products().
     
-    isbn = book['isbn']
-    product_id = None
+    Ребра между товарами: одинаковый ISBN (без дефисов и пробелов), одинаковые
+    «название_автор», одно и то же предложение (URL) и - с matcher - похожие
+    название и автор. Товары - связные компоненты (dedup.UnionFind).
+    """
+    clusters = UnionFind()
+    first_with_key = {}
     
-    # Способ 1: По ISBN
-    if isbn and isbn != '':
-        if isbn in isbn_to_id:
-            product_id = isbn_to_id[isbn]
-        else:
-            # Проверяем по названию и автору
-            title = book['title'].lower()
-            author = book['author'].lower() if book['author'] else ''
-            title_key = f"{title}_{author}"
-            
-            if title_key in title_author_to_id:
-                product_id = title_author_to_id[title_key]
-                isbn_to_id[isbn] = product_id
+    def link(key, product_id):
+        other_id = first_with_key.setdefault(key, product_id)
+        if other_id != product_id:
+            clusters.union(other_id, product_id)
+    
+    cursor.execute("SELECT id, title, author, isbn FROM products ORDER BY id")
+    products = cursor.fetchall()
+    for product_id, title, author, isbn in products:
+        if isbn:
+            link(('isbn', isbn.replace('-', '').replace(' ', '').upper()), product_id)
+        link(('title', title_key(title, author)), product_id)
+    
+    cursor.execute("SELECT url, product_id FROM offers ORDER BY product_id")
+    for url, product_id in cursor:
+        link(('url', url), product_id)
+    
+    if matcher is not None:
+        for product_id, title, author, _ in products:
+            similar_id = matcher.find(title, author)
+            if similar_id is None:
+                matcher.add(product_id, title, author)
             else:
-                # Создаем новую книгу
-                cursor.execute('''
-                    INSERT INTO products (title, author, isbn, image_url)
-                    VALUES (?, ?, ?, ?)
-                ''', (book['title'], book['author'], isbn, book['image_url']))
-                
-                product_id = cursor.lastrowid
-                isbn_to_id[isbn] = product_id
-                title_author_to_id[title_key] = product_id
-                products_added += 1
+                clusters.union(similar_id, product_id)
     
-    # Способ 2: По названию и автору
-    if product_id is None:
-        title = book['title'].lower()
-        author = book['author'].lower() if book['author'] else ''
-        title_key = f"{title}_{author}"
-        
-        if title_key in title_author_to_id:
-            product_id = title_author_to_id[title_key]
-        else:
-            # Создаем новую книгу без ISBN
-            cursor.execute('''
-                INSERT INTO products (title, author, isbn, image_url)
-                VALUES (?, ?, ?, ?)
-            ''', (book['title'], book['author'], '', book['image_url']))
-            
-            product_id = cursor.lastrowid
-            title_author_to_id[title_key] = product_id
-            products_added += 1
+    return merge_pairs(clusters)
+
+def merge_products(cursor, merge_rows):
+    """Объединяет товары-дубликаты одним проходом: предложения дубликатов переходят
+    к оставшемуся товару (одинаковые предложения не повторяются), ISBN дубликата -
+    тоже, если у оставшегося товара своего нет; дубликаты удаляются.
+    merge_rows - пары (id оставшегося товара, id дубликата). Возвращает число
+    удаленных товаров."""
+    if not merge_rows:
+        return 0
+    cursor.execute("CREATE TEMP TABLE merge_map (duplicate_id INTEGER PRIMARY KEY, kept_id INTEGER NOT NULL)")
+    cursor.executemany("INSERT INTO merge_map (kept_id, duplicate_id) VALUES (?, ?)", merge_rows)
     
-    # Добавляем предложение
-    try:
+    # То же предложение уже есть у оставшегося товара (UNIQUE product_id, website, url) - лишнее удаляем
+    cursor.execute('''
+        UPDATE OR IGNORE offers
+        SET product_id = (SELECT kept_id FROM merge_map WHERE duplicate_id = offers.product_id)
+        WHERE product_id IN (SELECT duplicate_id FROM merge_map)
+    ''')
+    cursor.execute("DELETE FROM offers WHERE product_id IN (SELECT duplicate_id FROM merge_map)")
+    
+    cursor.execute('''
+        SELECT m.kept_id, p.isbn
+        FROM merge_map m
+        JOIN products p ON p.id = m.duplicate_id
+        WHERE p.isbn IS NOT NULL
+        ORDER BY m.duplicate_id
+    ''')
+    isbn_rows = [(isbn, kept_id) for kept_id, isbn in cursor.fetchall()]
+    cursor.execute("DELETE FROM products WHERE id IN (SELECT duplicate_id FROM merge_map)")
+    # ISBN уникален - переносим его только после удаления дубликата
+    cursor.executemany("UPDATE products SET isbn = ? WHERE id = ? AND isbn IS NULL", isbn_rows)
+    
+    cursor.execute("DROP TABLE merge_map")
+    return len(merge_rows)
+
+def create_summary_tables(cursor):
+    """Создает сводные таблицы для сайта, если их нет (например, в базе, собранной
+    до их появления). Возвращает True, если все они уже были."""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    existed = {'database_stats', 'website_stats', 'product_summary', 'store_summary'} <= {row[0] for row in cursor.fetchall()}
+
+    # Сводная статистика для главной страницы сайта
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS database_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_books INTEGER NOT NULL,
+            total_offers INTEGER NOT NULL,
+            avg_price REAL NOT NULL,
+            websites INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Магазины и их биты для маски product_summary.websites_mask
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS website_stats (
+            website TEXT PRIMARY KEY,
+            offers_count INTEGER NOT NULL,
+            bit INTEGER NOT NULL
+        )
+    ''')
+
+    # Цены и магазины по каждой книге - список книг на сайте читает только эту таблицу
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_summary (
+            product_id INTEGER PRIMARY KEY,
+            min_price REAL NOT NULL,
+            max_price REAL NOT NULL,
+            avg_price REAL NOT NULL,
+            offers_count INTEGER NOT NULL,
+            websites_mask INTEGER NOT NULL,
+            FOREIGN KEY (product_id) REFERENCES products(id)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_product_summary_min_price ON product_summary(min_price)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_product_summary_offers_count ON product_summary(offers_count)")
+
+    # Цена и число предложений книги в каждом магазине - для фильтра по магазину на сайте
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS store_summary (
+            product_id INTEGER NOT NULL,
+            website TEXT NOT NULL,
+            min_price REAL NOT NULL,
+            offers_count INTEGER NOT NULL,
+            PRIMARY KEY (product_id, website),
+            FOREIGN KEY (product_id) REFERENCES products(id)
+        )
+    ''')
+    # Список книг одного магазина по цене в нем - по этому индексу
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_store_summary_price ON store_summary(website, min_price, product_id)")
+    return existed
+
+def refresh_summary(cursor, product_ids=None):
+    """Обновляет сводные таблицы для сайта: product_summary и store_summary (цены и
+    магазины каждой книги), website_stats и database_stats - после каждой загрузки
+    и объединения дубликатов.
+
+    product_ids - товары, предложения которых изменились в этой загрузке (новые,
+    обновленные, перенесенные при объединении): пересчитываются только их строки,
+    а счетчики магазинов и базы меняются на разницу. None - полный пересчет; он же,
+    если в базе еще нет сводных таблиц.
+    """
+    if not create_summary_tables(cursor):
+        product_ids = None
+    if product_ids is None:
+        for table in ('product_summary', 'store_summary', 'website_stats', 'database_stats'):
+            cursor.execute(f"DELETE FROM {table}")
+        touched = "1"
+    else:
+        cursor.execute("DROP TABLE IF EXISTS temp.summary_products")
+        cursor.execute("CREATE TEMP TABLE summary_products (product_id INTEGER PRIMARY KEY)")
+        cursor.executemany("INSERT OR IGNORE INTO summary_products (product_id) VALUES (?)",
+                           ((product_id,) for product_id in product_ids))
+        touched = "product_id IN (SELECT product_id FROM temp.summary_products)"
+
+    # Старые строки пересчитываемых товаров вычитаем из счетчиков и удаляем
+    cursor.execute(f"SELECT COALESCE(SUM(offers_count), 0), COALESCE(SUM(avg_price * offers_count), 0) "
+                   f"FROM product_summary WHERE {touched}")
+    old_offers, old_price_sum = cursor.fetchone()
+    cursor.execute(f'''
+        UPDATE website_stats SET offers_count = offers_count - (
+            SELECT COALESCE(SUM(s.offers_count), 0) FROM store_summary s
+            WHERE s.website = website_stats.website AND {touched})
+    ''')
+    cursor.execute(f"DELETE FROM store_summary WHERE {touched}")
+    cursor.execute(f"DELETE FROM product_summary WHERE {touched}")
+
+    # Новым магазинам - следующие свободные биты; биты старых не меняются
+    cursor.execute(f'''
+        SELECT DISTINCT website FROM offers
+        WHERE price > 0 AND {touched} AND website NOT IN (SELECT website FROM website_stats)
+        ORDER BY website
+    ''')
+    new_websites = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT COALESCE(MAX(bit), 0) FROM website_stats")
+    bit = cursor.fetchone()[0]
+    website_rows = []
+    for website in new_websites:
+        bit = bit * 2 if bit else 1
+        website_rows.append((website, bit))
+    cursor.executemany("INSERT INTO website_stats (website, offers_count, bit) VALUES (?, 0, ?)", website_rows)
+
+    cursor.execute(f'''
+        INSERT INTO store_summary (product_id, website, min_price, offers_count)
+        SELECT product_id, website, MIN(price), COUNT(*)
+        FROM offers
+        WHERE price > 0 AND {touched}
+        GROUP BY product_id, website
+    ''')
+    cursor.execute(f'''
+        UPDATE website_stats SET offers_count = offers_count + (
+            SELECT COALESCE(SUM(s.offers_count), 0) FROM store_summary s
+            WHERE s.website = website_stats.website AND {touched})
+    ''')
+    # Магазин, у которого не осталось предложений, из фильтра убираем
+    cursor.execute("DELETE FROM website_stats WHERE offers_count <= 0")
+
+    cursor.execute(f'''
+        INSERT INTO product_summary (product_id, min_price, max_price, avg_price, offers_count, websites_mask)
+        SELECT o.product_id, MIN(o.price), MAX(o.price), AVG(o.price), COUNT(*), SUM(DISTINCT w.bit)
+        FROM offers o
+        JOIN website_stats w ON w.website = o.website
+        WHERE o.price > 0 AND {touched}
+        GROUP BY o.product_id
+    ''')
+    cursor.execute(f"SELECT COALESCE(SUM(offers_count), 0), COALESCE(SUM(avg_price * offers_count), 0) "
+                   f"FROM product_summary WHERE {touched}")
+    new_offers, new_price_sum = cursor.fetchone()
+
+    # Средняя цена - через сумму цен: старую сумму пересчитываемых товаров заменяем новой
+    cursor.execute("SELECT total_offers, avg_price FROM database_stats WHERE id = 1")
+    total_offers, avg_price = cursor.fetchone() or (0, 0)
+    price_sum = avg_price * total_offers - old_price_sum + new_price_sum
+    total_offers += new_offers - old_offers
+    cursor.execute('''
+        INSERT OR REPLACE INTO database_stats (id, total_books, total_offers, avg_price, websites, updated_at)
+        SELECT 1,
+               (SELECT COUNT(*) FROM products WHERE title != '' AND title IS NOT NULL),
+               ?, ?,
+               (SELECT COUNT(*) FROM website_stats),
+               CURRENT_TIMESTAMP
+    ''', (total_offers, price_sum / total_offers if total_offers else 0))
+    if product_ids is not None:
+        cursor.execute("DROP TABLE temp.summary_products")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сборка базы книг из CSV магазинов")
+    parser.add_argument('--full', action='store_true',
+                        help="удалить существующую базу и собрать ее заново")
+    parser.add_argument('--exact', action='store_true',
+                        help="объединять книги только по точному совпадению ISBN или названия и автора")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="процессов для чтения CSV (по умолчанию - по числу ядер; 1 - без процессов)")
+    parser.add_argument('--merge-duplicates', action='store_true',
+                        help="не загружать CSV, а найти и объединить дубликаты в существующей базе")
+    args = parser.parse_args()
+
+    if args.merge_duplicates:
+        print("="*60)
+        print("ОБЪЕДИНЕНИЕ ДУБЛИКАТОВ В СУЩЕСТВУЮЩЕЙ БАЗЕ")
+        print("="*60)
+        if not os.path.exists('book_database.db'):
+            print("❌ База book_database.db не найдена - сначала соберите ее")
+            exit()
+
+        conn = sqlite3.connect('book_database.db')
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM products")
+        products_before = cursor.fetchone()[0]
+
+        matcher = None if args.exact else FuzzyMatcher()
+        merge_rows = find_duplicates(cursor, matcher)
+        products_merged = merge_products(cursor, merge_rows)
+        refresh_summary(cursor, {product_id for pair in merge_rows for product_id in pair})
+        conn.commit()
+        conn.close()
+
+        print(f"📚 Товаров было: {products_before}, стало: {products_before - products_merged}")
+        print(f"🧩 Объединено дубликатов: {products_merged}")
+        if matcher is not None:
+            print(f"🔗 Совпадений по похожим названию и автору: {matcher.matches}")
+        exit()
+
+    print("="*60)
+    print("СОЗДАНИЕ БАЗЫ ДАННЫХ ДЛЯ КНИГ С ФИЛЬТРАЦИЕЙ")
+    print("="*60)
+
+    # 1. Создаем базу данных (или дополняем существующую)
+    if args.full:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists('book_database.db' + suffix):
+                os.remove('book_database.db' + suffix)
+    incremental = os.path.exists('book_database.db')
+
+    conn = sqlite3.connect('book_database.db')
+    cursor = conn.cursor()
+
+    if incremental:
+        # База уже есть и ее может читать сайт - остаемся в WAL
+        print("🔁 Инкрементальная загрузка: добавляем новые и измененные предложения")
+        cursor.execute("PRAGMA synchronous = NORMAL")
+    else:
+        # На время сборки не ждем fsync и держим журнал в памяти: при сбое базу просто собирают заново
+        cursor.execute("PRAGMA synchronous = OFF")
+        cursor.execute("PRAGMA journal_mode = MEMORY")
+
+    # 2. Создаем таблицы - БЕЗ КОММЕНТАРИЕВ С #
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        author TEXT,
+        isbn TEXT UNIQUE,
+        image_url TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS offers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        website TEXT NOT NULL,
+        price REAL,
+        url TEXT NOT NULL,
+        parsed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        content_hash TEXT,
+        UNIQUE(product_id, website, url),
+        FOREIGN KEY (product_id) REFERENCES products(id)
+    )
+    ''')
+
+    # Базы, собранные до инкрементальной загрузки, - без хэша (такие предложения один раз обновятся)
+    cursor.execute("PRAGMA table_info(offers)")
+    if 'content_hash' not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE offers ADD COLUMN content_hash TEXT")
+
+    # Полнотекстовый индекс по названию и автору (FTS5).
+    # unicode61 приводит кириллицу к нижнему регистру, а «ё» заменяем на «е» сами,
+    # поэтому «Ёжик», «ежик» и «ЁЖИК» находятся одинаково.
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'")
+    fts_exists = cursor.fetchone() is not None
+
+    cursor.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        title,
+        author,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products
+    BEGIN
+        INSERT INTO products_fts (rowid, title, author)
+        VALUES (NEW.id,
+                replace(replace(NEW.title, 'ё', 'е'), 'Ё', 'Е'),
+                replace(replace(COALESCE(NEW.author, ''), 'ё', 'е'), 'Ё', 'Е'));
+    END
+    ''')
+
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF title, author ON products
+    BEGIN
+        UPDATE products_fts
+        SET title = replace(replace(NEW.title, 'ё', 'е'), 'Ё', 'Е'),
+            author = replace(replace(COALESCE(NEW.author, ''), 'ё', 'е'), 'Ё', 'Е')
+        WHERE rowid = NEW.id;
+    END
+    ''')
+
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products
+    BEGIN
+        DELETE FROM products_fts WHERE rowid = OLD.id;
+    END
+    ''')
+
+    # Если база создана до появления индекса - заполняем его существующими книгами
+    if not fts_exists:
         cursor.execute('''
-            INSERT OR IGNORE INTO offers (product_id, website, price, url)
-            VALUES (?, ?, ?, ?)
-        ''', (product_id, book['website'], book['price'], book['url']))
-        
-        if cursor.rowcount > 0:
-            offers_added += 1
-        else:
-            duplicate_offers_rejected += 1
-            
-    except Exception:
-        duplicate_offers_rejected += 1
-        continue
-
-conn.commit()
-
-# 5. Создаем индексы для производительности
-print("\n📈 СОЗДАЕМ ИНДЕКСЫ...")
-cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_isbn ON products(isbn)")
-cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_title ON products(title)")
-cursor.execute("CREATE INDEX IF NOT EXISTS idx_offers_product_id ON offers(product_id)")
-cursor.execute("CREATE INDEX IF NOT EXISTS idx_offers_price ON offers(price)")
-print("✅ Индексы созданы")
-
-# 6. Статистика
-print("\n" + "="*60)
-print("📊 РЕЗУЛЬТАТЫ ДЕДУПЛИКАЦИИ С ФИЛЬТРАЦИЕЙ")
-print("="*60)
-
-cursor.execute("SELECT COUNT(*) FROM products")
-total_products = cursor.fetchone()[0]
-
-cursor.execute("SELECT COUNT(*) FROM offers")
-total_offers = cursor.fetchone()[0]
-
-cursor.execute("SELECT website, COUNT(*) FROM offers GROUP BY website")
-websites_stats = cursor.fetchall()
-
-print(f"📚 Уникальных книг: {total_products}")
-print(f"🛒 Уникальных предложений: {total_offers}")
-print(f"🚫 Отклонено дубликатов предложений: {duplicate_offers_rejected}")
-
-if total_products > 0:
-    ratio = len(all_books) / total_products
-    print(f"📈 Коэффициент дедупликации: {ratio:.2f}")
-
-print("\n🌐 Предложений по сайтам:")
-for website, count in websites_stats:
-    print(f"   • {website}: {count}")
-
-# 7. Примеры
-print("\n📖 ПРИМЕРЫ КНИГ С НЕСКОЛЬКИМИ ПРЕДЛОЖЕНИЯМИ:")
-
-cursor.execute('''
-    SELECT p.title, p.author, COUNT(o.id) as offers_count,
-           GROUP_CONCAT(DISTINCT o.website) as websites,
-           MIN(o.price) as min_price, MAX(o.price) as max_price
-    FROM products p
-    JOIN offers o ON p.id = o.product_id
-    GROUP BY p.id
-    HAVING offers_count > 1
-    ORDER BY offers_count DESC
-    LIMIT 5
-''')
-
-examples = cursor.fetchall()
-
-if examples:
-    for i, (title, author, count, websites, min_price, max_price) in enumerate(examples, 1):
-        short_title = title[:40] + "..." if len(title) > 40 else title
-        print(f"\n{i}. {short_title}")
-        if author and author != "Неизвестен":
-            print(f"   Автор: {author}")
-        print(f"   Предложений: {count} ({websites})")
-        if min_price != max_price:
-            print(f"   Цены: от {min_price}₽ до {max_price}₽")
+            INSERT INTO products_fts (rowid, title, author)
+            SELECT id,
+                   replace(replace(title, 'ё', 'е'), 'Ё', 'Е'),
+                   replace(replace(COALESCE(author, ''), 'ё', 'е'), 'Ё', 'Е')
+            FROM products
+        ''')
+
+    print("✅ Созданы таблицы")
+
+    # 3. Загружаем и фильтруем данные
+    csv_files = [
+        ('chitai_gorod_1000.csv', 'chitai-gorod'),
+        ('labirint_1000.csv', 'labirint'),
+        ('moscowbooks_1000.csv', 'moscowbooks')
+    ]
+
+    sources = []
+    for filename, website in csv_files:
+        if os.path.exists(filename):
+            sources.append((filename, website))
         else:
-            print(f"   Цена: {min_price}₽")
-else:
-    print("   ⚠️ Нет книг на нескольких сайтах")
-
-# 8. Общая статистика цен
-print("\n💰 ОБЩАЯ СТАТИСТИКА ПО ЦЕНАМ:")
-cursor.execute('''
-    SELECT 
-        MIN(price) as min_price,
-        MAX(price) as max_price,
-        AVG(price) as avg_price,
-        COUNT(*) as total_offers
-    FROM offers 
-    WHERE price > 0
-''')
-
-min_p, max_p, avg_p, total = cursor.fetchone()
-print(f"   Минимальная цена: {min_p}₽")
-print(f"   Максимальная цена: {max_p}₽")
-print(f"   Средняя цена: {avg_p:.0f}₽")
-print(f"   Всего предложений с ценой > 0: {total}")
-
-conn.close()
-
-print("\n" + "="*60)
-print("🎉 БАЗА ДАННЫХ СОЗДАНА УСПЕШНО!")
-print("="*60)
-print("✅ Внедрены улучшения:")
-print("   1. Фильтрация книг без названия/с ценой 0")
-print("   2. Удаление дубликатов предложений")
-print("   3. Улучшенная дедупликация")
-print(f"📁 Файл базы: book_database.db")
-print("\n🚀 Дальнейшие действия:")
-print("   1. Проверить данные: python 2_check_data.py")
-print("   2. Запустить сайт: python 3_website_final.py")
\ No newline at end of file
+            print(f"⚠️ Файл {filename} не найден")
+
+    # 4. Дедупликация - файлы читаются параллельно, книги идут в дедупликацию по мере готовности
+    print("\n🔄 ЗАГРУЖАЕМ ФАЙЛЫ И ВЫПОЛНЯЕМ ДЕДУПЛИКАЦИЮ...")
+    books_loaded = 0
+
+    def loaded_books():
+        global books_loaded
+        for filename, website, books, invalid_count, error in load_sources(sources, args.workers):
+            print(f"\n📖 Загружен {filename}")
+            if error is not None:
+                print(f"❌ Ошибка чтения файла: {str(error)[:50]}")
+                continue
+            print(f"   Найдено {len(books) + invalid_count} записей")
+            print(f"   ✅ Валидных: {len(books)}, ❌ Отброшено: {invalid_count}")
+            books_loaded += len(books)
+            yield from iter_books(books)
+
+    cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM products")
+    next_product_id = cursor.fetchone()[0]
+    matcher = None if args.exact else FuzzyMatcher()
+    product_rows, offer_rows, update_rows, unchanged_offers, duplicate_offers_rejected, merge_rows = \
+        deduplicate(loaded_books(), next_product_id, load_existing(cursor, matcher), matcher)
+
+    print(f"\n📚 Всего валидных книг обработано: {books_loaded}")
+
+    if books_loaded == 0:
+        print("\n❌ Нет валидных данных для обработки!")
+        print("Проверьте CSV файлы и их содержимое")
+        conn.close()
+        exit()
+    
+    # Вставляем пачками в одной транзакции
+    cursor.executemany('''
+        INSERT INTO products (id, title, author, isbn, image_url)
+        VALUES (?, ?, ?, ?, ?)
+    ''', product_rows)
+    products_added = len(product_rows)
+    
+    cursor.executemany('''
+        INSERT OR IGNORE INTO offers (product_id, website, price, url, content_hash)
+        VALUES (?, ?, ?, ?, ?)
+    ''', offer_rows)
+    offers_added = cursor.rowcount
+    duplicate_offers_rejected += len(offer_rows) - offers_added
+    
+    # Изменившиеся предложения обновляем на месте
+    cursor.executemany('''
+        UPDATE offers SET price = ?, content_hash = ?, parsed_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND product_id = ?
+    ''', update_rows)
+    offers_updated = len(update_rows)
+    
+    # Новые книги связали уже загруженные товары - объединяем их
+    products_merged = merge_products(cursor, merge_rows)
+    
+    conn.commit()
+
+    # 5. Создаем индексы для производительности
+    print("\n📈 СОЗДАЕМ ИНДЕКСЫ...")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_isbn ON products(isbn)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_title ON products(title)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_author ON products(author)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_offers_product_id ON offers(product_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_offers_price ON offers(price)")
+    cursor.execute("INSERT INTO products_fts (products_fts) VALUES ('optimize')")
+    conn.commit()
+    print("✅ Индексы созданы")
+
+    # Считаем статистику для сайта один раз здесь, а не на каждый запрос страницы:
+    # при дозагрузке - только для товаров, чьи предложения изменились
+    touched_products = None
+    if incremental:
+        touched_products = set(offer_rows.product_ids)
+        touched_products.update(row[3] for row in update_rows)
+        touched_products.update(product_id for pair in merge_rows for product_id in pair)
+    refresh_summary(cursor, touched_products)
+    conn.commit()
+    print("✅ Статистика для сайта обновлена")
+
+    # WAL: сайт читает базу (соединения только для чтения) параллельно с обновлением
+    cursor.execute("PRAGMA journal_mode = WAL")
+
+    # 6. Статистика
+    print("\n" + "="*60)
+    print("📊 РЕЗУЛЬТАТЫ ДЕДУПЛИКАЦИИ С ФИЛЬТРАЦИЕЙ")
+    print("="*60)
+
+    cursor.execute("SELECT COUNT(*) FROM products")
+    total_products = cursor.fetchone()[0]
+
+    cursor.execute("SELECT COUNT(*) FROM offers")
+    total_offers = cursor.fetchone()[0]
+
+    cursor.execute("SELECT website, COUNT(*) FROM offers GROUP BY website")
+    websites_stats = cursor.fetchall()
+
+    print(f"📚 Уникальных книг: {total_products}")
+    print(f"🛒 Уникальных предложений: {total_offers}")
+    print(f"🚫 Отклонено дубликатов предложений: {duplicate_offers_rejected}")
+    print(f"🆕 Добавлено: книг {products_added}, предложений {offers_added}")
+    print(f"🔁 Обновлено предложений: {offers_updated}, без изменений: {unchanged_offers}")
+    if products_merged:
+        print(f"🧩 Объединено уже загруженных товаров-дубликатов: {products_merged}")
+    if matcher is not None:
+        fuzzy = matcher.stats()
+        print(f"🔗 Объединено по похожим названию и автору: {fuzzy['matches']} "
+              f"(сравнений: {fuzzy['comparisons']}, блоков: {fuzzy['blocks']})")
+
+    if total_products > 0:
+        ratio = books_loaded / total_products
+        print(f"📈 Коэффициент дедупликации: {ratio:.2f}")
+
+    print("\n🌐 Предложений по сайтам:")
+    for website, count in websites_stats:
+        print(f"   • {website}: {count}")
+
+    # 7. Примеры
+    print("\n📖 ПРИМЕРЫ КНИГ С НЕСКОЛЬКИМИ ПРЕДЛОЖЕНИЯМИ:")
+
+    cursor.execute('''
+        SELECT p.title, p.author, COUNT(o.id) as offers_count,
+               GROUP_CONCAT(DISTINCT o.website) as websites,
+               MIN(o.price) as min_price, MAX(o.price) as max_price
+        FROM products p
+        JOIN offers o ON p.id = o.product_id
+        GROUP BY p.id
+        HAVING offers_count > 1
+        ORDER BY offers_count DESC
+        LIMIT 5
+    ''')
+
+    examples = cursor.fetchall()
+
+    if examples:
+        for i, (title, author, count, websites, min_price, max_price) in enumerate(examples, 1):
+            short_title = title[:40] + "..." if len(title) > 40 else title
+            print(f"\n{i}. {short_title}")
+            if author and author != "Неизвестен":
+                print(f"   Автор: {author}")
+            print(f"   Предложений: {count} ({websites})")
+            if min_price != max_price:
+                print(f"   Цены: от {min_price}₽ до {max_price}₽")
+            else:
+                print(f"   Цена: {min_price}₽")
+    else:
+        print("   ⚠️ Нет книг на нескольких сайтах")
+
+    # 8. Общая статистика цен
+    print("\n💰 ОБЩАЯ СТАТИСТИКА ПО ЦЕНАМ:")
+    cursor.execute('''
+        SELECT 
+            MIN(price) as min_price,
+            MAX(price) as max_price,
+            AVG(price) as avg_price,
+            COUNT(*) as total_offers
+        FROM offers 
+        WHERE price > 0
+    ''')
+
+    min_p, max_p, avg_p, total = cursor.fetchone()
+    print(f"   Минимальная цена: {min_p}₽")
+    print(f"   Максимальная цена: {max_p}₽")
+    print(f"   Средняя цена: {avg_p:.0f}₽")
+    print(f"   Всего предложений с ценой > 0: {total}")
+
+    conn.close()
+
+    print("\n" + "="*60)
+    print("🎉 БАЗА ДАННЫХ СОЗДАНА УСПЕШНО!")
+    print("="*60)
+    print("✅ Внедрены улучшения:")
+    print("   1. Фильтрация книг без названия/с ценой 0")
+    print("   2. Удаление дубликатов предложений")
+    print("   3. Улучшенная дедупликация")
+    print(f"📁 Файл базы: book_database.db")
+    print("\n🚀 Дальнейшие действия:")
+    print("   1. Проверить данные: python 2_check_data.py")
+    print("   2. Запустить сайт: python 3_website_final.py")
\ No newline at end of file
@@ -1,156 +1,274 @@
 # 3_website.py
 import http.server
 import socketserver
-import sqlite3
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import argparse
+import base64
 import os
 import sys
 import json
+import math
 
-print("="*60)
-print("🚀 ЗАПУСК БИБЛИОТЕКИ КНИГ")
-print("="*60)
+from db_pool import ConnectionPool
 
-# Проверяем базу данных
-if not os.path.exists('book_database.db'):
-    print("❌ ОШИБКА: Файл book_database.db не найден!")
-    print("\n🔧 РЕШЕНИЕ:")
-    print("1. Сначала запустите: python 1_create_database.py")
-    print("2. Убедитесь, что CSV файлы в той же папке")
-    print("\n📁 Текущая папка:", os.getcwd())
-    print("="*60)
-    input("Нажмите Enter для выхода...")
-    sys.exit(1)
+WORKERS = 8
+
+# Общий пул соединений для всех обработчиков запросов
+pool = ConnectionPool('book_database.db', size=WORKERS)
 
 def get_database_stats():
-    """Получает статистику из базы данных"""
-    conn = sqlite3.connect('book_database.db')
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT COUNT(*) FROM products WHERE title != '' AND title IS NOT NULL")
-    total_books = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM offers WHERE price > 0")
-    total_offers = cursor.fetchone()[0]
+    """Получает статистику, посчитанную при сборке базы (1_create_database.py)"""
+    with pool.connection() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute("SELECT AVG(price) FROM offers WHERE price > 0")
-    avg_price = cursor.fetchone()[0] or 0
+        cursor.execute("SELECT total_books, total_offers, avg_price, websites FROM database_stats WHERE id = 1")
+        row = cursor.fetchone() or (0, 0, 0, 0)
     
-    cursor.execute("SELECT COUNT(DISTINCT website) FROM offers")
-    websites = cursor.fetchone()[0]
+        total_books, total_offers, avg_price, websites = row
     
-    conn.close()
-    
-    return {
-        'total_books': total_books,
-        'total_offers': total_offers,
-        'avg_price': round(avg_price),
-        'websites': websites
-    }
+        return {
+            'total_books': total_books,
+            'total_offers': total_offers,
+            'avg_price': round(avg_price),
+            'websites': websites
+        }
 
 def get_all_websites():
     """Получает список всех магазинов"""
-    conn = sqlite3.connect('book_database.db')
-    cursor = conn.cursor()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute("SELECT DISTINCT website FROM offers ORDER BY website")
-    websites = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT website FROM website_stats ORDER BY website")
+        websites = [row[0] for row in cursor.fetchall()]
     
-    conn.close()
-    return websites
+        return websites
+
+def build_fts_query(query):
+    """Превращает поисковую строку в запрос FTS5: каждое слово ищется по префиксу"""
+    words = query.replace('ё', 'е').replace('Ё', 'Е').split()
+    terms = ['"' + word.replace('"', '""') + '"*' for word in words]
+    return ' OR '.join(terms)
 
-def search_books(query="", sort_by="relevance", website_filter="all", min_price=None, max_price=None):
-    """Ищет книги в базе данных с фильтрами"""
-    conn = sqlite3.connect('book_database.db')
-    cursor = conn.cursor()
+# Порядок сортировки: ключи (последний всегда делает порядок однозначным) и направление.
+# По этим же ключам строится курсор следующей страницы.
+SORT_ORDERS = {
+    'relevance': (['f.rank', '-s.offers_count', 's.product_id'], 'ASC'),
+    'popular': (['s.offers_count', 's.product_id'], 'DESC'),
+    'price_asc': (['s.min_price', 's.product_id'], 'ASC'),
+    'price_desc': (['s.min_price', 's.product_id'], 'DESC'),
+    'title': (['p.title', 'p.id'], 'ASC'),
+    'author': (['p.author', 'p.id'], 'ASC'),
+}
+
+# Сортировки по столбцам products: идем по индексу products, к product_summary - по ключу
+PRODUCT_SORTS = {'title', 'author'}
+
+# С выбранным магазином цена книги - ее цена в этом магазине (store_summary ws):
+# по ней фильтруем и сортируем, идя по индексу store_summary (website, min_price, product_id)
+PRICE_SORTS = {'price_asc', 'price_desc'}
+STORE_PRICE_KEYS = {'s.min_price': 'ws.min_price', 's.product_id': 'ws.product_id'}
+
+PAGE_SIZE = 100
+
+def encode_cursor(values):
+    """Кодирует ключи сортировки последней книги на странице в строку для URL"""
+    data = json.dumps(values, ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+def decode_cursor(cursor, keys_count):
+    """Разбирает курсор; для испорченного курсора (не та длина, не числа и не строки,
+    целые вне 64 бит SQLite, бесконечность и NaN) возвращает None (первая страница)"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError):
+        return None
+    if not isinstance(values, list) or len(values) != keys_count:
+        return None
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            return None
+        if isinstance(value, int) and not -2**63 <= value < 2**63:
+            return None
+        if isinstance(value, float) and not math.isfinite(value):
+            return None
+    return values
+
+def keyset_conditions(sort_keys, values, direction):
+    """Условия «строго после курсора» по шагам: сначала книги с теми же значениями
+    всех ключей, кроме последнего, потом - с теми же, кроме двух последних, и т.д.
+
+    Сравнение (a, b) > (?, ?) SQLite ищет по индексу только по первому ключу, и
+    книги с тем же a (у popular их почти все - offers_count принимает 1-3 значения)
+    перебираются с начала. На каждом шаге здесь равенства по префиксу и одно
+    неравенство - индекс (a, id) сразу находит нужное место.
+    Возвращает список (условия, параметры).
+    """
+    comparison = '>' if direction == 'ASC' else '<'
+    steps = []
+    for i in reversed(range(len(sort_keys))):
+        conditions = [f"{key} = ?" for key in sort_keys[:i]] + [f"{sort_keys[i]} {comparison} ?"]
+        steps.append((conditions, values[:i + 1]))
+    return steps
+
+def search_books(query="", sort_by="relevance", website_filter="all", min_price=None, max_price=None,
+                 after=None, page_size=PAGE_SIZE):
+    """Ищет книги в базе данных с фильтрами.
     
-    # Базовый SQL
-    select_sql = '''
-        SELECT p.id, p.title, p.author, p.image_url,
-               MIN(o.price) as min_price,
-               MAX(o.price) as max_price,
-               GROUP_CONCAT(DISTINCT o.website) as websites,
-               COUNT(o.id) as offers_count
-        FROM products p
-        JOIN offers o ON p.id = o.product_id
-    '''
+    Возвращает (книги, курсор следующей страницы или None).
+    """
+    match_query = build_fts_query(query)
+    if sort_by not in SORT_ORDERS:
+        sort_by = "relevance"
+    # Без поискового запроса релевантности нет - показываем книги с большим числом предложений
+    if sort_by == "relevance" and not match_query:
+        sort_by = "popular"
+    sort_keys, direction = SORT_ORDERS[sort_by]
+    store_filter = website_filter != "all"
+    if store_filter and sort_by in PRICE_SORTS:
+        sort_keys = [STORE_PRICE_KEYS[key] for key in sort_keys]
+    price_sql = "ws.min_price" if store_filter else "s.min_price"
     
-    where_conditions = ["p.title != '' AND p.title IS NOT NULL", "o.price > 0"]
-    params = []
+    with pool.connection() as conn:
+        cursor = conn.cursor()
     
-    # Поисковый запрос
-    if query:
-        words = query.strip().split()
-        if words:
-            search_conditions = []
-            for word in words:
-                search_conditions.append("(p.title LIKE ? OR p.author LIKE ?)")
-                params.extend([f'%{word}%', f'%{word}%'])
-            where_conditions.append(f"({' OR '.join(search_conditions)})")
+        where_conditions = ["p.title != '' AND p.title IS NOT NULL"]
+        params = []
     
-    # Фильтр по магазину
-    if website_filter != "all":
-        where_conditions.append("o.website = ?")
-        params.append(website_filter)
+        # Поисковый запрос - через полнотекстовый индекс products_fts
+        rank_sql = "0"
+        fts_join_sql = ""
+        if match_query:
+            rank_sql = "f.rank"
+            fts_join_sql = '''
+            JOIN (
+                SELECT rowid, rank
+                FROM products_fts
+                WHERE products_fts MATCH ?
+            ) f ON f.rowid = s.product_id'''
+            params.append(match_query)
     
-    # Фильтр по цене
-    if min_price is not None:
-        where_conditions.append("o.price >= ?")
-        params.append(float(min_price))
+        # Без поиска задаем порядок соединения сами: читаем по индексу той таблицы,
+        # по которой сортируем, и останавливаемся, набрав страницу
+        if match_query:
+            from_sql = "product_summary s JOIN products p ON p.id = s.product_id"
+        elif sort_by in PRODUCT_SORTS:
+            from_sql = "products p CROSS JOIN product_summary s ON s.product_id = p.id"
+        elif store_filter and sort_by in PRICE_SORTS:
+            from_sql = ("store_summary ws CROSS JOIN product_summary s ON s.product_id = ws.product_id"
+                        " CROSS JOIN products p ON p.id = s.product_id")
+        else:
+            from_sql = "product_summary s CROSS JOIN products p ON p.id = s.product_id"
+        if store_filter and not from_sql.startswith("store_summary"):
+            from_sql += " CROSS JOIN store_summary ws ON ws.product_id = s.product_id"
     
-    if max_price is not None:
-        where_conditions.append("o.price <= ?")
-        params.append(float(max_price))
+        # Базовый SQL: цены и магазины уже посчитаны в product_summary при сборке базы
+        # (с выбранным магазином цена - цена в нем, диапазона цен нет)
+        select_sql = f'''
+            SELECT s.product_id, p.title, p.author, p.image_url,
+                   {price_sql},
+                   {"ws.min_price" if store_filter else "s.max_price"},
+                   (SELECT GROUP_CONCAT(w.website) FROM website_stats w
+                    WHERE s.websites_mask & w.bit) as websites,
+                   s.offers_count,
+                   {rank_sql} as rank
+            FROM {from_sql}{fts_join_sql}
+        '''
     
-    # Собираем WHERE
-    where_sql = " AND ".join(where_conditions)
+        # Фильтр по магазину - книги, у которых есть его предложения
+        if store_filter:
+            where_conditions.append("ws.website = ?")
+            params.append(website_filter)
     
-    # Сортировка
-    order_by = "offers_count DESC"
-    if sort_by == "price_asc":
-        order_by = "min_price ASC"
-    elif sort_by == "price_desc":
-        order_by = "min_price DESC"
-    elif sort_by == "title":
-        order_by = "p.title ASC"
-    elif sort_by == "author":
-        order_by = "p.author ASC"
+        # Фильтр по цене - по самой низкой цене книги (в выбранном магазине)
+        if min_price is not None:
+            where_conditions.append(f"{price_sql} >= ?")
+            params.append(float(min_price))
     
-    # Финальный SQL
-    sql = f'''
-        {select_sql}
-        WHERE {where_sql}
-        GROUP BY p.id
-        ORDER BY {order_by}
-        LIMIT 100
-    '''
+        if max_price is not None:
+            where_conditions.append(f"{price_sql} <= ?")
+            params.append(float(max_price))
     
-    cursor.execute(sql, params)
+        # Курсор: продолжаем строго после последней книги предыдущей страницы
+        after_values = decode_cursor(after, len(sort_keys)) if after else None
+        if not after_values:
+            keyset_steps = [([], [])]
+        elif match_query:
+            # Найденные книги сортируются в памяти - индекса для курсора нет, хватит одного условия
+            comparison = '>' if direction == 'ASC' else '<'
+            keyset_steps = [([f"({', '.join(sort_keys)}) {comparison} ({', '.join('?' * len(sort_keys))})"],
+                             after_values)]
+        else:
+            keyset_steps = keyset_conditions(sort_keys, after_values, direction)
     
-    books = []
-    for row in cursor.fetchall():
-        book_id, title, author, image_url, min_price_val, max_price_val, websites, offers_count = row
+        # Сортировка (rank в FTS5 - это bm25: чем меньше, тем релевантнее)
+        order_by = ', '.join(f"{key} {direction}" for key in sort_keys)
+    
+        # Финальный SQL (берем на одну книгу больше, чтобы понять, есть ли следующая страница);
+        # следующий шаг курсора нужен, только если страница еще не набралась
+        rows = []
+        for keyset_where, keyset_params in keyset_steps:
+            conditions = where_conditions
+            if f"{price_sql} = ?" in keyset_where:
+                # Цена задана равенством: «+» не дает SQLite искать по диапазону фильтра
+                # цены вместо индекса (цена, id)
+                conditions = ['+' + condition if condition.startswith(price_sql + ' ') else condition
+                              for condition in where_conditions]
+            where_sql = " AND ".join(conditions + keyset_where)
+            sql = f'''
+                {select_sql}
+                WHERE {where_sql}
+                ORDER BY {order_by}
+                LIMIT ?
+            '''
+            cursor.execute(sql, params + keyset_params + [page_size + 1 - len(rows)])
+            rows.extend(cursor.fetchall())
+            if len(rows) > page_size:
+                break
+    
+        has_next_page = len(rows) > page_size
+        rows = rows[:page_size]
+    
+        # Получаем предложения для всех найденных книг одним запросом
+        offers_by_product = {}
+        if rows:
+            placeholders = ','.join('?' * len(rows))
+            cursor.execute(f'''
+                SELECT product_id, website, price, url 
+                FROM offers 
+                WHERE product_id IN ({placeholders}) AND price > 0
+                ORDER BY product_id, price
+            ''', [row[0] for row in rows])
         
-        # Получаем все предложения для книги
-        cursor2 = conn.cursor()
-        cursor2.execute('''
-            SELECT website, price, url 
-            FROM offers 
-            WHERE product_id = ? AND price > 0
-            ORDER BY price
-        ''', (book_id,))
+            for product_id, website, price, url in cursor.fetchall():
+                offers_by_product.setdefault(product_id, []).append({
+                    'website': website,
+                    'price': price,
+                    'url': url
+                })
+    
+    books = []
+    last_sort_values = None
+    for row in rows:
+        book_id, title, author, image_url, min_price_val, max_price_val, websites, offers_count, rank = row
         
-        offers = []
-        for website, price, url in cursor2.fetchall():
-            offers.append({
-                'website': website,
-                'price': price,
-                'url': url
-            })
+        sort_values = {
+            'f.rank': rank,
+            '-s.offers_count': -offers_count,
+            's.offers_count': offers_count,
+            's.min_price': min_price_val,
+            'ws.min_price': min_price_val,
+            's.product_id': book_id,
+            'ws.product_id': book_id,
+            'p.title': title,
+            'p.author': author,
+            'p.id': book_id,
+        }
+        last_sort_values = [sort_values[key] for key in sort_keys]
         
+        offers = offers_by_product.get(book_id)
         if not offers:
-            cursor2.close()
             continue
         
         books.append({
@@ -164,78 +282,95 @@ def search_books(query="", sort_by="relevance", website_filter="all", min_price=
             'websites': websites.split(',') if websites else [],
             'offers': offers
         })
-        
-        cursor2.close()
     
-    conn.close()
-    return books
+    next_cursor = encode_cursor(last_sort_values) if has_next_page else None
+    return books, next_cursor
 
 def get_book_details(book_id):
     """Получает полную информацию о книге"""
-    conn = sqlite3.connect('book_database.db')
-    cursor = conn.cursor()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute('''
-        SELECT p.title, p.author, p.image_url, p.created_at
-        FROM products p
-        WHERE p.id = ?
-    ''', (book_id,))
+        cursor.execute('''
+            SELECT p.title, p.author, p.image_url, p.created_at
+            FROM products p
+            WHERE p.id = ?
+        ''', (book_id,))
     
-    row = cursor.fetchone()
-    if not row:
-        conn.close()
-        return None
+        row = cursor.fetchone()
+        if not row:
+            return None
     
-    title, author, image_url, created_at = row
+        title, author, image_url, created_at = row
     
-    # Получаем все предложения
-    cursor.execute('''
-        SELECT website, price, url 
-        FROM offers 
-        WHERE product_id = ? AND price > 0
-        ORDER BY price
-    ''', (book_id,))
+        # Получаем все предложения
+        cursor.execute('''
+            SELECT website, price, url 
+            FROM offers 
+            WHERE product_id = ? AND price > 0
+            ORDER BY price
+        ''', (book_id,))
     
-    offers = []
-    for website, price, url in cursor.fetchall():
-        offers.append({
-            'website': website,
-            'price': price,
-            'url': url
-        })
+        offers = []
+        for website, price, url in cursor.fetchall():
+            offers.append({
+                'website': website,
+                'price': price,
+                'url': url
+            })
     
-    # Статистика по книге
-    cursor.execute('''
-        SELECT 
-            COUNT(DISTINCT website) as websites_count,
-            MIN(price) as min_price,
-            MAX(price) as max_price,
-            AVG(price) as avg_price
-        FROM offers 
-        WHERE product_id = ? AND price > 0
-    ''', (book_id,))
+        # Статистика по книге
+        cursor.execute('''
+            SELECT 
+                COUNT(DISTINCT website) as websites_count,
+                MIN(price) as min_price,
+                MAX(price) as max_price,
+                AVG(price) as avg_price
+            FROM offers 
+            WHERE product_id = ? AND price > 0
+        ''', (book_id,))
     
-    stats_row = cursor.fetchone()
+        stats_row = cursor.fetchone()
     
-    book_details = {
-        'id': book_id,
-        'title': title,
-        'author': author or 'Неизвестен',
-        'image_url': image_url or '',
-        'created_at': created_at,
-        'offers': offers,
-        'stats': {
-            'websites_count': stats_row[0] if stats_row else 0,
-            'min_price': stats_row[1] if stats_row else 0,
-            'max_price': stats_row[2] if stats_row else 0,
-            'avg_price': stats_row[3] if stats_row else 0
-        }
-    }
+        book_details = {
+            'id': book_id,
+            'title': title,
+            'author': author or 'Неизвестен',
+            'image_url': image_url or '',
+            'created_at': created_at,
+            'offers': offers,
+            'stats': {
+                'websites_count': stats_row[0] if stats_row else 0,
+                'min_price': stats_row[1] if stats_row else 0,
+                'max_price': stats_row[2] if stats_row else 0,
+                'avg_price': stats_row[3] if stats_row else 0
+            }
+        }
     
-    conn.close()
-    return book_details
+        return book_details
 
 class BookWebsiteHandler(http.server.SimpleHTTPRequestHandler):
+    # Не даем медленному клиенту бесконечно занимать поток
+    timeout = 30
+    # Сколько соединение keep-alive может простаивать между запросами, занимая поток пула
+    keepalive_timeout = 1
+    
+    def handle(self):
+        """Обрабатывает запросы соединения по очереди. Следующий запрос keep-alive
+        ждем не дольше keepalive_timeout: простаивающий браузер не держит поток,
+        пока запросы других клиентов стоят в очереди пула"""
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection:
+            self.connection.settimeout(self.keepalive_timeout)
+            try:
+                if not self.rfile.peek(1):
+                    break
+            except OSError:
+                break
+            self.connection.settimeout(self.timeout)
+            self.handle_one_request()
+    
     def do_GET(self):
         # Обрабатываем разные маршруты
         if self.path.startswith('/api/book/'):
@@ -244,16 +379,27 @@ class BookWebsiteHandler(http.server.SimpleHTTPRequestHandler):
             if book_id.isdigit():
                 book_details = get_book_details(int(book_id))
                 if book_details:
+                    body = json.dumps(book_details).encode('utf-8')
                     self.send_response(200)
                     self.send_header('Content-type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
                     self.end_headers()
-                    self.wfile.write(json.dumps(book_details).encode('utf-8'))
+                    self.wfile.write(body)
                 else:
-                    self.send_error(404, "Книга не найдена")
+                    self.send_error(404, explain="Книга не найдена")
             else:
-                self.send_error(400, "Некорректный ID книги")
+                self.send_error(400, explain="Некорректный ID книги")
             return
         
+        elif self.path == '/api/pool':
+            # Метрики пула соединений с базой
+            body = json.dumps(pool.stats()).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
         # Главная страница
         elif self.path == '/' or '?' in self.path or self.path == '/index.html':
             # Извлекаем параметры
@@ -265,27 +411,32 @@ class BookWebsiteHandler(http.server.SimpleHTTPRequestHandler):
             website_filter = params.get('website', ['all'])[0]
             min_price = params.get('min_price', [None])[0]
             max_price = params.get('max_price', [None])[0]
+            after = params.get('after', [None])[0]
             
             # Получаем данные
             stats = get_database_stats()
             websites = get_all_websites()
-            books = search_books(search_query, sort_by, website_filter, min_price, max_price)
+            books, next_cursor = search_books(search_query, sort_by, website_filter,
+                                              min_price, max_price, after=after)
             current_time = datetime.now().strftime('%d.%m.%Y %H:%M')
             
             # Генерируем HTML
             html = self.generate_main_page(stats, books, search_query, sort_by, 
                                          website_filter, websites, min_price, 
-                                         max_price, current_time)
+                                         max_price, current_time, after, next_cursor)
             
+            body = html.encode('utf-8')
             self.send_response(200)
             self.send_header('Content-type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
             self.end_headers()
-            self.wfile.write(html.encode('utf-8'))
+            self.wfile.write(body)
         else:
             super().do_GET()
     
     def generate_main_page(self, stats, books, search_query, sort_by, 
-                          website_filter, websites, min_price, max_price, current_time):
+                          website_filter, websites, min_price, max_price, current_time,
+                          after=None, next_cursor=None):
         """Генерирует главную страницу"""
         
         # Основной HTML
@@ -717,6 +868,12 @@ class BookWebsiteHandler(http.server.SimpleHTTPRequestHandler):
         }
         
         /* Сообщения */
+        .pagination {
+            display: flex;
+            justify-content: center;
+            gap: 15px;
+            padding: 0 40px 40px;
+        }
         .no-books {
             text-align: center;
             padding: 60px;
@@ -969,7 +1126,29 @@ class BookWebsiteHandler(http.server.SimpleHTTPRequestHandler):
         
         # Завершаем основную часть
         html += '''
-        </div>
+        </div>'''
+        
+        # Постраничная навигация (курсор ведет на страницу после последней показанной книги)
+        if after or next_cursor:
+            page_params = {'q': search_query, 'sort': sort_by, 'website': website_filter}
+            if min_price:
+                page_params['min_price'] = min_price
+            if max_price:
+                page_params['max_price'] = max_price
+            
+            html += '''
+        <div class="pagination">'''
+            if after:
+                html += '''
+            <a href="/?''' + urllib.parse.urlencode(page_params) + '''" class="filter-btn clear-btn">« В начало</a>'''
+            if next_cursor:
+                page_params['after'] = next_cursor
+                html += '''
+            <a href="/?''' + urllib.parse.urlencode(page_params) + '''" class="filter-btn">Следующая страница »</a>'''
+            html += '''
+        </div>'''
+        
+        html += '''
         
         <!-- Футер -->
         <div class="footer">
@@ -1132,47 +1311,114 @@ class BookWebsiteHandler(http.server.SimpleHTTPRequestHandler):
         
         return html
 
+class ThreadPoolHTTPServer(socketserver.TCPServer):
+    """HTTP-сервер, который обрабатывает соединения в пуле из workers потоков"""
+    allow_reuse_address = True
+    
+    def __init__(self, server_address, handler_class, workers=8):
+        # Пул создаем до bind(): при занятом порте TCPServer вызывает server_close()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='http-worker')
+        super().__init__(server_address, handler_class)
+    
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+    
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+    
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
 # Запускаем сервер
 PORT = 8000
 
-print(f"📊 Загружаем статистику...")
-stats = get_database_stats()
-websites = get_all_websites()
-print(f"✅ Найдено: {stats['total_books']} книг, {stats['total_offers']} предложений")
-print(f"🏪 Магазины: {', '.join(websites)}")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Веб-сайт библиотеки книг")
+    parser.add_argument('--port', type=int, default=PORT, help="порт сервера")
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help="число потоков для запросов (0 - обрабатывать по одному)")
+    args = parser.parse_args()
+    PORT = args.port
+    
+    print("="*60)
+    print("🚀 ЗАПУСК БИБЛИОТЕКИ КНИГ")
+    print("="*60)
+
+    # Проверяем базу данных
+    if not os.path.exists('book_database.db'):
+        print("❌ ОШИБКА: Файл book_database.db не найден!")
+        print("\n🔧 РЕШЕНИЕ:")
+        print("1. Сначала запустите: python 1_create_database.py")
+        print("2. Убедитесь, что CSV файлы в той же папке")
+        print("\n📁 Текущая папка:", os.getcwd())
+        print("="*60)
+        input("Нажмите Enter для выхода...")
+        sys.exit(1)
+
+    pool = ConnectionPool('book_database.db', size=max(1, args.workers))
+    with pool.connection() as conn:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    missing_tables = {'products_fts', 'database_stats', 'website_stats', 'product_summary', 'store_summary'} - tables
+    if missing_tables:
+        print(f"❌ ОШИБКА: База создана старой версией скрипта, нет таблиц: {', '.join(sorted(missing_tables))}")
+        print("🔧 Пересоздайте базу: python 1_create_database.py")
+        print("="*60)
+        input("Нажмите Enter для выхода...")
+        sys.exit(1)
 
-print(f"\n🌐 Запускаем веб-сервер на порту {PORT}...")
-print(f"📚 Откройте в браузере: http://localhost:{PORT}")
-print("="*60)
-print("✨ ИСПРАВЛЕНИЯ:")
-print("   1. Кнопка 'Сбросить всё' теперь работает (ссылка на главную)")
-print("   2. Убраны все упоминания ISBN")
-print("   3. Поисковая строка по центру")
-print("   4. Убран смайлик из названия сайта")
-print("   5. Поиск теперь работает вместе с фильтрами")
-print("="*60)
-print("🛑 Для остановки нажмите Ctrl+C")
-print("="*60)
+    print(f"📊 Загружаем статистику...")
+    stats = get_database_stats()
+    websites = get_all_websites()
+    print(f"✅ Найдено: {stats['total_books']} книг, {stats['total_offers']} предложений")
+    print(f"🏪 Магазины: {', '.join(websites)}")
 
-try:
-    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    print(f"\n🌐 Запускаем веб-сервер на порту {PORT}...")
+    print(f"📚 Откройте в браузере: http://localhost:{PORT}")
+    print("="*60)
+    print("✨ ИСПРАВЛЕНИЯ:")
+    print("   1. Кнопка 'Сбросить всё' теперь работает (ссылка на главную)")
+    print("   2. Убраны все упоминания ISBN")
+    print("   3. Поисковая строка по центру")
+    print("   4. Убран смайлик из названия сайта")
+    print("   5. Поиск теперь работает вместе с фильтрами")
+    print("="*60)
+    print("🛑 Для остановки нажмите Ctrl+C")
+    print("="*60)
+
+    try:
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
     
-    with socketserver.TCPServer(("", PORT), BookWebsiteHandler) as httpd:
-        print(f"✅ Сервер запущен успешно!")
-        print(f"📍 Адрес: http://localhost:{PORT}")
-        print("="*60)
-        httpd.serve_forever()
+        if args.workers > 0:
+            # HTTP/1.1 - браузер переиспользует соединение (keep-alive)
+            BookWebsiteHandler.protocol_version = "HTTP/1.1"
+            httpd = ThreadPoolHTTPServer(("", PORT), BookWebsiteHandler, workers=args.workers)
+            print(f"🧵 Режим: пул из {args.workers} потоков, keep-alive")
+        else:
+            httpd = socketserver.TCPServer(("", PORT), BookWebsiteHandler)
+            print("🧵 Режим: один запрос за раз")
         
-except OSError as e:
-    if "10048" in str(e):
-        print(f"❌ Порт {PORT} уже занят!")
-        print("🔧 Решение: Запустите с другим портом (например, 8080)")
-        input("Нажмите Enter для выхода...")
-    else:
-        print(f"❌ Ошибка: {e}")
+        with httpd:
+            print(f"✅ Сервер запущен успешно!")
+            print(f"📍 Адрес: http://localhost:{PORT}")
+            print("="*60)
+            httpd.serve_forever()
+        
+    except OSError as e:
+        if "10048" in str(e):
+            print(f"❌ Порт {PORT} уже занят!")
+            print("🔧 Решение: Запустите с другим портом (например, 8080)")
+            input("Нажмите Enter для выхода...")
+        else:
+            print(f"❌ Ошибка: {e}")
+            input("Нажмите Enter для выхода...")
+    except KeyboardInterrupt:
+        print("\n🛑 Сервер остановлен пользователем")
+    except Exception as e:
+        print(f"❌ Неизвестная ошибка: {e}")
         input("Нажмите Enter для выхода...")
-except KeyboardInterrupt:
-    print("\n🛑 Сервер остановлен пользователем")
-except Exception as e:
-    print(f"❌ Неизвестная ошибка: {e}")
-    input("Нажмите Enter для выхода...")
\ No newline at end of file
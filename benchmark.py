@@ -0,0 +1,1368 @@
+# benchmark.py - ЗАМЕРЫ ПРОИЗВОДИТЕЛЬНОСТИ
+import contextlib
+import csv
+import gzip
+import hashlib
+import http.client
+import importlib.util
+import io
+import itertools
+import os
+import random
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import dedup
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def load_script(filename, module_name):
+    """Загружает скрипт проекта (имя начинается с цифры) как модуль"""
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(PROJECT_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    # Модуль в sys.modules - его функции можно передавать в процессы пула
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+# Файлы и магазины - те же, что читает 1_create_database.py
+SOURCES = [
+    ('chitai_gorod_1000.csv', 'chitai-gorod'),
+    ('labirint_1000.csv', 'labirint'),
+    ('moscowbooks_1000.csv', 'moscowbooks'),
+]
+
+def write_synthetic_csvs(directory, products=5000):
+    """Пишет CSV магазинов со случайными книгами; каждая книга есть во всех трех магазинах"""
+    words = ['Война', 'Мир', 'Преступление', 'Наказание', 'Идиот', 'Бесы',
+             'Отцы', 'Дети', 'Обломов', 'Мастер', 'Маргарита', 'Дракон']
+    authors = ['Толстой Л. Н.', 'Достоевский Ф. М.', 'Тургенев И. С.',
+               'Гончаров И. А.', 'Булгаков М. А.', 'Лукьяненко С. В.']
+
+    rng = random.Random(42)
+    books = []
+    for product_id in range(1, products + 1):
+        title = f"{' '.join(rng.sample(words, 3))} {product_id}"
+        books.append((title, rng.choice(authors), f"978{product_id:09d}"))
+
+    for filename, website in SOURCES:
+        with open(os.path.join(directory, filename), 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(['title', 'author', 'price', 'url', 'website', 'isbn', 'image_url'])
+            for n, (title, author, isbn) in enumerate(books, 1):
+                writer.writerow([title, author, rng.randint(100, 3000),
+                                 f"https://{website}.ru/book/{n}/", website, isbn, ''])
+
+def write_large_csv(path, rows):
+    """Пишет один CSV магазина на rows строк; каждая десятая строка невалидна,
+    у каждой пятидесятой - лишние пробелы в названии"""
+    rng = random.Random(7)
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(['title', 'author', 'price', 'url', 'website', 'isbn', 'image_url'])
+        for n in range(rows):
+            if n % 10 == 0:
+                title = "Название не указано"
+            elif n % 50 == 1:
+                title = f"  Книга \t номер {n} "
+            else:
+                title = f"Книга номер {n}"
+            writer.writerow([title, f"Автор {n % 5000}", rng.randint(0, 3000),
+                             f"https://labirint.ru/books/{n}/", 'labirint', f"978{n:09d}", ''])
+
+def create_synthetic_database(directory, products=5000):
+    """Собирает базу скриптом 1_create_database.py из синтетических CSV"""
+    write_synthetic_csvs(directory, products)
+    subprocess.run([sys.executable, os.path.join(PROJECT_DIR, '1_create_database.py')],
+                   cwd=directory, check=True, stdout=subprocess.DEVNULL)
+
+# Карточка книги в разметке каждого магазина - из них локальный сервер собирает страницы каталога
+STORE_CARDS = {
+    'chitai-gorod': ('<article class="product-card">'
+                     '<a class="product-card__title" href="/product/{slug}">{title}</a>'
+                     '<div class="product-card__subtitle">{author}</div>'
+                     '<div class="product-mini-card-price__price">{price} ₽</div>'
+                     '<img class="product-card__image" src="//cdn.example.ru/{slug}.jpg">'
+                     '</article>'),
+    'labirint': ('<div class="product">'
+                 '<a class="product-title-link" href="/books/{slug}/"><span class="product-title">{title}</span></a>'
+                 '<div class="product-author">{author}</div>'
+                 '<span class="price-val">{price} ₽</span>'
+                 '<div class="product-pubhouse">Эксмо</div><div class="product-pubyear">2023</div>'
+                 '<img class="book-img-cover" data-src="https://img.example.ru/{slug}.jpg">'
+                 '</div>'),
+    'moscowbooks': ('<div class="catalog__item js-catalog-item">'
+                    '<a class="book-preview__title-link" href="/book/{slug}/">{title}</a>'
+                    '<div class="book-preview__author"><span class="author-name">{author}</span></div>'
+                    '<div class="book-preview__price">{price} ₽</div>'
+                    '<img class="book-preview__img" src="/upload/{slug}.jpg">'
+                    '</div>'),
+}
+
+# Страница книги в разметке каждого магазина: префикс адреса и шаблон (ISBN, издательство, год)
+STORE_DETAILS = {
+    'chitai-gorod': ('/product/', '<div class="product-detail-features">'
+                                  '<span itemprop="isbn">{isbn13}</span>'
+                                  '<a itemprop="publisher" href="/publisher/eksmo">Эксмо</a>'
+                                  '<span itemprop="datePublished">2021</span></div>'),
+    'labirint': ('/books/', '<div class="isbn">ISBN: {isbn13}</div>'
+                            '<div class="publisher">Издательство: <a href="/pubhouse/1/">АСТ</a>, 2022 г.</div>'),
+    'moscowbooks': ('/book/', '<dl><dt>ISBN</dt><dd itemprop="isbn">{isbn10}</dd>'
+                              '<dt>Издательство</dt><dd itemprop="publisher">Азбука</dd>'
+                              '<dt>Год</dt><dd itemprop="datePublished">2020</dd></dl>'),
+}
+
+# Одна и та же книга в разных магазинах подписана по-разному - совпадает только ISBN
+SHARED_AUTHORS = {'chitai-gorod': "Иванов И. {n}", 'labirint': "Иван Иванов {n}", 'moscowbooks': "Иванов Иван {n}"}
+
+def book_isbn(slug):
+    """Настоящий (с верной контрольной цифрой) ISBN-13 978-5-... книги локального магазина"""
+    body = '9785' + str(int(hashlib.sha1(slug.encode('utf-8')).hexdigest(), 16))[:8]
+    check = (10 - sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(body)) % 10) % 10
+    return body + str(check)
+
+def render_detail_page(store, slug):
+    """Страница книги: ISBN через дефисы (Moscowbooks - в виде ISBN-10), издательство, год"""
+    isbn = book_isbn(slug)
+    check = (11 - sum((10 - i) * int(d) for i, d in enumerate(isbn[3:12])) % 11) % 11
+    isbn10 = isbn[3:12] + ('X' if check == 10 else str(check))
+    details = STORE_DETAILS[store][1].format(
+        isbn13=f"{isbn[:3]}-{isbn[3]}-{isbn[4:8]}-{isbn[8:12]}-{isbn[12]}",
+        isbn10=f"{isbn10[0]}-{isbn10[1:5]}-{isbn10[5:9]}-{isbn10[9]}")
+    return f'<html><head><title>{slug}</title></head><body><main>{details}</main></body></html>'
+
+def render_store_page(store, page_id, cards=20, shared=0):
+    """Страница каталога магазина: шапка с меню, cards карточек и подвал.
+    
+    Последние shared карточек одинаковы на всех страницах - как книги,
+    которые магазин показывает сразу в нескольких разделах.
+    """
+    menu = ''.join(f'<li class="menu__item"><a href="/catalog/{n}/">Раздел {n}</a></li>' for n in range(100))
+    items = ''.join(STORE_CARDS[store].format(slug=f"{page_id}-{n}", title=f"Книга {page_id} {n}",
+                                              author=f"Автор {n}", price=100 + n)
+                    for n in range(cards - shared))
+    items += ''.join(STORE_CARDS[store].format(slug=f"shared-{n}", title=f"Бестселлер {n}",
+                                               author=SHARED_AUTHORS[store].format(n=n), price=500 + n)
+                     for n in range(shared))
+    return (f'<html><head><title>Каталог</title></head><body>'
+            f'<header><nav><ul class="menu">{menu}</ul></nav></header>'
+            f'<main><div class="catalog">{items}</div></main>'
+            f'<footer><p>© {store}</p></footer></body></html>')
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Локальная замена сайта магазина: на любой адрес каталога отдает страницу
+    с cards_per_page карточками в разметке магазина store, на адрес книги -
+    страницу книги (keep-alive, gzip, ETag)"""
+    protocol_version = 'HTTP/1.1'
+    store = None
+    cards_per_page = 20
+    shared_cards = 0
+
+    def do_GET(self):
+        self.server.request_times.append(time.monotonic())
+        detail_prefix = STORE_DETAILS[self.store][0]
+        if self.path.startswith(detail_prefix):
+            body = render_detail_page(self.store, self.path[len(detail_prefix):].strip('/')).encode('utf-8')
+        else:
+            page_id = re.sub(r'\W+', '-', self.path).strip('-')
+            body = render_store_page(self.store, page_id, self.cards_per_page, self.shared_cards).encode('utf-8')
+        etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('ETag', etag)
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.bytes_sent += len(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Сервер с ошибками: первый запрос к /busy - 429 с Retry-After: 1, к .../overloaded -
+    503 с Retry-After: 1, /missing - всегда 404. Время и код ответов - в server.log"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        hits = self.server.hits[self.path] = self.server.hits.get(self.path, 0) + 1
+        if self.path == '/busy' and hits == 1:
+            status = 429
+        elif self.path.endswith('/overloaded') and hits == 1:
+            status = 503
+        elif self.path == '/missing':
+            status = 404
+        else:
+            status = 200
+        self.server.log.append((time.monotonic(), status))
+        self.send_response(status)
+        if status in (429, 503):
+            self.send_header('Retry-After', '1')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stand_in(store, shared_cards=0):
+    """Запускает локальный сервер магазина в фоновом потоке; адрес - server.base_url"""
+    handler = type(f'StandIn_{store}', (StandInHandler,), {'store': store, 'shared_cards': shared_cards})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.request_times = []
+    server.bytes_sent = 0
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def max_requests_per_second(request_times):
+    """Наибольшее число запросов, пришедших за любую секунду"""
+    times = sorted(request_times)
+    return max((sum(1 for t in times[i:] if t - start < 1.0) for i, start in enumerate(times)), default=0)
+
+def trace_statements(site, func, *args):
+    """Вызывает функцию сайта и возвращает ее результат и выполненные SELECT-запросы"""
+    statements = []
+    # Пул из одного соединения: функция гарантированно получит отслеживаемое соединение
+    site.pool.close()
+    site.pool = site.ConnectionPool(site.pool.path, size=1)
+    with site.pool.connection() as conn:
+        conn.set_trace_callback(statements.append)
+    try:
+        result = func(*args)
+    finally:
+        conn.set_trace_callback(None)
+
+    # Внутренние запросы FTS5 к служебным таблицам ('main'.'products_fts_*') не считаем
+    selects = [s for s in statements
+               if s.lstrip().upper().startswith('SELECT') and "'main'." not in s]
+    return result, selects
+
+def benchmark_search(site, repeats=20):
+    """Считает запросы и время для search_books на типичных поисках"""
+    print("\n🔎 SEARCH_BOOKS: ЗАПРОСЫ НА СТРАНИЦУ")
+    print("-"*60)
+
+    cases = [
+        ('без фильтров', ("", "relevance", "all", None, None)),
+        ('поиск "Мир"', ("Мир", "relevance", "all", None, None)),
+        ('цена по возрастанию', ("", "price_asc", "all", None, None)),
+        ('магазин + цена', ("", "title", "labirint", "500", "2000")),
+    ]
+
+    max_statements = 2
+    failed = False
+    for name, args in cases:
+        (books, _), selects = trace_statements(site, site.search_books, *args)
+        statements = len(selects)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            site.search_books(*args)
+        elapsed_ms = (time.perf_counter() - start) / repeats * 1000
+
+        status = "✅" if statements <= max_statements else "❌"
+        if statements > max_statements:
+            failed = True
+        print(f"  {status} {name}: {len(books)} книг, {statements} SQL-запросов, {elapsed_ms:.1f} мс")
+
+    return not failed
+
+def benchmark_pagination(site, page_size=100):
+    """Проходит все страницы каждой сортировки по курсору и сравнивает первую и последнюю"""
+    print("\n📄 ПОСТРАНИЧНАЯ НАВИГАЦИЯ (КУРСОРЫ)")
+    print("-"*60)
+
+    ok = True
+    for sort_by in site.SORT_ORDERS:
+        seen = set()
+        page_times = []
+        after = None
+        while True:
+            start = time.perf_counter()
+            books, after = site.search_books("", sort_by, "all", None, None,
+                                             after=after, page_size=page_size)
+            page_times.append((time.perf_counter() - start) * 1000)
+            seen.update(book['id'] for book in books)
+            if not after:
+                break
+
+        pages = len(page_times)
+        total = site.get_database_stats()['total_books']
+        status = "✅" if len(seen) == total else "❌"
+        if len(seen) != total:
+            ok = False
+        print(f"  {status} {sort_by}: {pages} стр., {len(seen)} из {total} книг без повторов; "
+              f"первая {page_times[0]:.1f} мс, последняя {page_times[-1]:.1f} мс")
+
+    # Подделанный курсор (не числа и не строки, целое вне 64 бит, бесконечность) -
+    # это первая страница, а не ошибка 500
+    forged_ok = True
+    for values, sort_by in (([{}, 1], "popular"), ([10**20, 1], "price_asc"),
+                            ([10**20, 1], "title"), ([float('inf'), 1], "price_asc")):
+        try:
+            first_page = site.search_books("", sort_by, "all", None, None,
+                                           after=site.encode_cursor(values), page_size=page_size) == \
+                site.search_books("", sort_by, "all", None, None, page_size=page_size)
+        except (sqlite3.Error, OverflowError):
+            first_page = False
+        forged_ok = forged_ok and first_page
+        print(f"  {'✅' if first_page else '❌'} Курсор {values} ({sort_by}) - первая страница")
+    return ok and forged_ok
+
+def benchmark_store_filter(site, page_size=100):
+    """С выбранным магазином фильтр и сортировка по цене - по цене в этом магазине:
+    проходит все страницы и сверяет книги и цены с предложениями магазина в offers"""
+    print("\n🏪 ФИЛЬТР ПО МАГАЗИНУ: ЦЕНА В ВЫБРАННОМ МАГАЗИНЕ")
+    print("-"*60)
+
+    ok = True
+    for website, sort_by, min_price, max_price in [('labirint', 'price_asc', None, 500),
+                                                   ('moscowbooks', 'price_desc', 1000, 2000),
+                                                   ('chitai-gorod', 'popular', 200, 800),
+                                                   ('labirint', 'title', None, None)]:
+        with site.pool.connection() as conn:
+            expected = dict(conn.execute('''
+                SELECT product_id, MIN(price) FROM offers
+                WHERE website = ? AND price > 0
+                GROUP BY product_id
+                HAVING MIN(price) BETWEEN ? AND ?
+            ''', (website, min_price or 0, max_price or float('inf'))).fetchall())
+
+        found = {}
+        prices = []
+        after = None
+        start = time.perf_counter()
+        while True:
+            books, after = site.search_books("", sort_by, website, min_price, max_price,
+                                             after=after, page_size=page_size)
+            for book in books:
+                found[book['id']] = book['min_price']
+                prices.append(book['min_price'])
+            if not after:
+                break
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        ordered = sort_by not in site.PRICE_SORTS or prices == sorted(prices, reverse=sort_by == 'price_desc')
+        case_ok = found == expected and ordered
+        ok = ok and case_ok
+        print(f"  {'✅' if case_ok else '❌'} {website}, {sort_by}, цена {min_price or 0}-{max_price or '∞'}: "
+              f"{len(found)} из {len(expected)} книг, цены магазина, {elapsed_ms:.1f} мс на все страницы")
+    return ok
+
+def benchmark_deep_pages(site, directory, products=100_000, page_size=100, repeats=5):
+    """Сравнивает первую и последнюю страницу каждой сортировки на большой базе, где
+    у большинства книг одинаковый первый ключ (offers_count у всех 3, авторов 6):
+    курсор должен находить место по индексу, а не перебирать книги с тем же ключом"""
+    print(f"\n📄 ПОСЛЕДНЯЯ СТРАНИЦА: {products:,} КНИГ С ПОВТОРЯЮЩИМИСЯ КЛЮЧАМИ".replace(',', ' '))
+    print("-"*60)
+
+    deep_dir = os.path.join(directory, 'deep')
+    os.mkdir(deep_dir)
+    write_synthetic_csvs(deep_dir, products)
+    subprocess.run([sys.executable, os.path.join(PROJECT_DIR, '1_create_database.py'), '--exact'],
+                   cwd=deep_dir, check=True, stdout=subprocess.DEVNULL)
+
+    def median_ms(*args, **kwargs):
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = site.search_books(*args, **kwargs)
+            times.append((time.perf_counter() - start) * 1000)
+        return sorted(times)[len(times) // 2], result
+
+    main_pool = site.pool
+    site.pool = site.ConnectionPool(os.path.join(deep_dir, 'book_database.db'), size=1)
+    ok = True
+    try:
+        for sort_by, (sort_keys, direction) in site.SORT_ORDERS.items():
+            if sort_by == 'relevance':
+                continue
+            # Курсор последней страницы: ключи книги, после которой осталось ровно page_size книг
+            reverse = 'DESC' if direction == 'ASC' else 'ASC'
+            with site.pool.connection() as conn:
+                values = conn.execute(f'''
+                    SELECT {', '.join(sort_keys)}
+                    FROM product_summary s JOIN products p ON p.id = s.product_id
+                    ORDER BY {', '.join(f"{key} {reverse}" for key in sort_keys)}
+                    LIMIT 1 OFFSET ?
+                ''', (page_size,)).fetchone()
+            first_ms, _ = median_ms("", sort_by, "all", None, None, page_size=page_size)
+            last_ms, (books, next_cursor) = median_ms("", sort_by, "all", None, None, page_size=page_size,
+                                                      after=site.encode_cursor(list(values)))
+            sort_ok = len(books) == page_size and next_cursor is None and last_ms <= 2 * first_ms + 1
+            ok = ok and sort_ok
+            print(f"  {'✅' if sort_ok else '❌'} {sort_by}: первая {first_ms:.2f} мс, последняя {last_ms:.2f} мс")
+    finally:
+        site.pool.close()
+        site.pool = main_pool
+    return ok
+
+def benchmark_csv_loading(builder, directory, rows=1_000_000):
+    """Замеряет скорость загрузки и очистки CSV (load_source из 1_create_database.py)"""
+    print(f"\n📖 ЗАГРУЗКА CSV: {rows:,} СТРОК".replace(',', ' '))
+    print("-"*60)
+
+    path = os.path.join(directory, 'large.csv')
+    write_large_csv(path, rows)
+
+    start = time.perf_counter()
+    books, invalid_count = builder.load_source(path, 'labirint')
+    elapsed = time.perf_counter() - start
+
+    print(f"  Валидных: {len(books)}, отброшено: {invalid_count}")
+    print(f"  {elapsed:.2f} с, " + f"{rows / elapsed:,.0f} строк/с".replace(',', ' '))
+    os.remove(path)
+    return len(books) + invalid_count == rows
+
+def benchmark_parallel_loading(builder, directory, rows=300_000):
+    """Читает CSV трех магазинов по очереди и в процессах (load_sources): результат тот же,
+    первый магазин отдается в дедупликацию раньше, чем прочитаны все"""
+    print(f"\n⚡ ЗАГРУЗКА CSV: {len(SOURCES)} МАГАЗИНА ПО {rows:,} СТРОК".replace(',', ' '))
+    print("-"*60)
+
+    load_dir = os.path.join(directory, 'parallel')
+    os.mkdir(load_dir)
+    sources = []
+    for filename, website in SOURCES:
+        write_large_csv(os.path.join(load_dir, filename), rows)
+        sources.append((os.path.join(load_dir, filename), website))
+
+    results = {}
+    for workers in (1, len(sources)):
+        start = time.perf_counter()
+        first_ready = None
+        batches = []
+        for _, _, books, invalid_count, error in builder.load_sources(sources, workers):
+            first_ready = first_ready or time.perf_counter() - start
+            batches.append((books, invalid_count, error))
+        results[workers] = (batches, time.perf_counter() - start, first_ready)
+
+    (sequential, sequential_time, _), (parallel, parallel_time, first_ready) = results.values()
+    same = all(error is None and other_error is None and books.equals(other_books) and invalid == other_invalid
+               for (books, invalid, error), (other_books, other_invalid, other_error) in zip(sequential, parallel))
+    ok = same
+    cores = os.cpu_count() or 1
+    if cores > 1:
+        ok = ok and parallel_time < sequential_time
+    print(f"  {'✅' if same else '❌'} По очереди: {sequential_time:.2f} с; в {len(sources)} процессах: "
+          f"{parallel_time:.2f} с, первый магазин готов через {first_ready:.2f} с - данные те же")
+    if cores == 1:
+        print("  Одно ядро - ускорения от процессов не ждем")
+    return ok
+
+# Пик памяти сборки в отдельном процессе: mode = 'imports' (только интерпретатор и pandas),
+# 'dicts' (как было: все строки словарями в одном списке, товары и предложения - кортежами)
+# или 'columns' (как сейчас: файлы потоком в дедупликацию, товары и предложения столбцами)
+BUILD_MEMORY_SCRIPT = """
+import resource, sys
+sys.path.insert(0, {project_dir!r})
+from benchmark import load_script
+builder = load_script('1_create_database.py', 'builder')
+sources, mode = {sources!r}, {mode!r}
+if mode == 'dicts':
+    books = [book for _, _, batch, _, _ in builder.load_sources(sources, 1) for book in builder.iter_books(batch)]
+    product_rows, offer_rows = [list(rows) for rows in builder.deduplicate(books)[:2]]
+elif mode == 'columns':
+    product_rows, offer_rows = builder.deduplicate(book for _, _, batch, _, _ in builder.load_sources(sources, 1)
+                                                   for book in builder.iter_books(batch))[:2]
+# ru_maxrss в Linux сохраняется через exec (это был бы пик родителя) - берем VmHWM
+try:
+    with open('/proc/self/status') as f:
+        peak = next(int(line.split()[1]) * 1024 for line in f if line.startswith('VmHWM:'))
+except OSError:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak = peak if sys.platform == 'darwin' else peak * 1024
+print(peak)
+"""
+
+def benchmark_build_memory(directory, rows=500_000):
+    """Пик памяти (RSS) сборки на миллион строк CSV: строки словарями в списке (как было)
+    и потоковая загрузка со столбцовыми товарами и предложениями (как сейчас)"""
+    print(f"\n🧠 СБОРКА БАЗЫ: ПАМЯТЬ НА {rows:,} СТРОК CSV".replace(',', ' '))
+    print("-"*60)
+
+    memory_dir = os.path.join(directory, 'memory')
+    os.mkdir(memory_dir)
+    path = os.path.join(memory_dir, 'labirint_1000.csv')
+    write_large_csv(path, rows)
+
+    peaks = {}
+    for mode in ('imports', 'dicts', 'columns'):
+        script = BUILD_MEMORY_SCRIPT.format(project_dir=PROJECT_DIR, sources=[(path, 'labirint')], mode=mode)
+        result = subprocess.run([sys.executable, '-c', script], stdout=subprocess.PIPE, text=True, check=True)
+        peaks[mode] = int(result.stdout.split()[-1])
+
+    # На миллион строк - без памяти самого интерпретатора с pandas
+    per_million = {mode: (peaks[mode] - peaks['imports']) / rows * 1_000_000 / 2**20 for mode in ('dicts', 'columns')}
+    ok = per_million['columns'] < per_million['dicts']
+    print(f"  Интерпретатор с pandas: {peaks['imports'] / 2**20:.0f} МБ")
+    print(f"  {'✅' if ok else '❌'} На миллион строк: словари {per_million['dicts']:.0f} МБ, "
+          f"столбцы {per_million['columns']:.0f} МБ (x{per_million['dicts'] / per_million['columns']:.1f})")
+    return ok
+
+SUMMARY_QUERIES = [
+    "SELECT * FROM product_summary ORDER BY product_id",
+    "SELECT * FROM store_summary ORDER BY product_id, website",
+    "SELECT * FROM website_stats ORDER BY website",
+    "SELECT total_books, total_offers, ROUND(avg_price, 6), websites FROM database_stats",
+]
+
+def benchmark_build(builder, directory, products=100_000, changed=5000):
+    """Замеряет полную сборку базы скриптом 1_create_database.py и дозагрузку:
+    сводные таблицы после дозагрузки должны совпасть с полным пересчетом"""
+    rows = products * len(SOURCES)
+    print(f"\n🏗️ СБОРКА БАЗЫ: {rows:,} СТРОК CSV".replace(',', ' '))
+    print("-"*60)
+
+    build_dir = os.path.join(directory, 'build')
+    os.mkdir(build_dir)
+    write_synthetic_csvs(build_dir, products)
+
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(PROJECT_DIR, '1_create_database.py')],
+                            cwd=build_dir, stdout=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - start
+
+    print(f"  {elapsed:.2f} с, " + f"{rows / elapsed:,.0f} строк/с".replace(',', ' '))
+
+    # Повторный запуск на тех же CSV: ничего не вставляется, только сравниваются хэши
+    start = time.perf_counter()
+    rerun = subprocess.run([sys.executable, os.path.join(PROJECT_DIR, '1_create_database.py')],
+                           cwd=build_dir, stdout=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+
+    unchanged = "Добавлено: книг 0, предложений 0" in rerun.stdout
+    status = "✅" if unchanged else "❌"
+    print(f"  {status} Повторная (инкрементальная) загрузка: {elapsed:.2f} с")
+
+    # Дозагрузка с новыми ценами и новыми книгами одного магазина
+    path = os.path.join(build_dir, SOURCES[1][0])
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        rows = list(csv.reader(f))
+    for row in rows[1:changed + 1]:
+        row[2] = str(int(row[2]) + 1)
+    rows.extend([f"Новая книга {n}", "Новый автор", 500, f"https://labirint.ru/new/{n}/", 'labirint', '', '']
+                for n in range(changed))
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        csv.writer(f).writerows(rows)
+    start = time.perf_counter()
+    update = subprocess.run([sys.executable, os.path.join(PROJECT_DIR, '1_create_database.py')],
+                            cwd=build_dir, stdout=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - start
+
+    with contextlib.closing(sqlite3.connect(os.path.join(build_dir, 'book_database.db'))) as conn, \
+            contextlib.closing(sqlite3.connect(':memory:')) as full:
+        conn.backup(full)
+        incremental = [conn.execute(query).fetchall() for query in SUMMARY_QUERIES]
+        builder.refresh_summary(full.cursor())
+        recomputed = [full.execute(query).fetchall() for query in SUMMARY_QUERIES]
+    summary_ok = update.returncode == 0 and incremental == recomputed
+    print(f"  {'✅' if summary_ok else '❌'} Дозагрузка {changed} новых цен и {changed} новых книг: {elapsed:.2f} с, "
+          f"сводные таблицы {'совпадают' if summary_ok else 'не совпадают'} с полным пересчетом")
+    return result.returncode == 0 and rerun.returncode == 0 and unchanged and summary_ok
+
+def synthetic_offers(works, seed=11):
+    """Предложения трех магазинов без ISBN: каждая книга (works штук) подписана в
+    магазинах по-разному - «Фамилия И. О.», «Имя Фамилия», «Фамилия Имя» с «ё»
+    и пояснением в скобках. Возвращает (книги для deduplicate, номер книги каждого предложения)."""
+    rng = random.Random(seed)
+    syllables = ['ка', 'ло', 'ми', 'ре', 'то', 'на', 'ви', 'сё', 'ду', 'же', 'ры', 'пла', 'гор', 'стан']
+    word = lambda parts: ''.join(rng.choice(syllables) for _ in range(parts))
+    vocabulary = [word(3) for _ in range(2000)]
+    surnames = [word(3).capitalize() + rng.choice(['ов', 'ин', 'ский', 'енко']) for _ in range(works // 5 + 1)]
+    names = [(word(2).capitalize(), word(2).capitalize()) for _ in range(50)]
+
+    books, labels = [], []
+    for work in range(works):
+        title = ' '.join(rng.sample(vocabulary, 3)).capitalize()
+        surname, (name, patronymic) = rng.choice(surnames), rng.choice(names)
+        variants = [(title, f"{surname} {name[0]}. {patronymic[0]}."),
+                    (title.replace('е', 'ё', 1), f"{name} {surname}"),
+                    (f"{title} (подарочное издание)", f"{surname} {name}")]
+        for n, ((_, website), (variant_title, author)) in enumerate(zip(SOURCES, variants)):
+            books.append({'title': variant_title, 'author': author, 'isbn': '', 'price': 100.0 + n,
+                          'website': website, 'url': f"https://{website}.ru/book/{work}/", 'image_url': ''})
+            labels.append(work)
+    return books, labels
+
+def benchmark_fuzzy_dedup(builder, works=(10_000, 40_000)):
+    """Нечеткое объединение книг (dedup.FuzzyMatcher): точность и полнота на размеченных
+    парах dedup_sample.csv и время на растущем числе предложений - с блокировкой
+    сравнений на предложение не становится больше"""
+    print("\n🔗 ДЕДУПЛИКАЦИЯ: ПОХОЖИЕ НАЗВАНИЯ И АВТОРЫ")
+    print("-"*60)
+
+    result = dedup.evaluate(dedup.load_labelled_pairs(os.path.join(PROJECT_DIR, 'dedup_sample.csv')))
+    quality_ok = result['precision'] >= 0.95 and result['recall'] >= 0.85
+    print(f"  {'✅' if quality_ok else '❌'} Размеченные пары: точность {result['precision']:.2f}, "
+          f"полнота {result['recall']:.2f} (ошибок {len(result['errors'])})")
+
+    ok = quality_ok
+    per_offer = []
+    for count in works:
+        books, labels = synthetic_offers(count)
+        exact_products = len(builder.deduplicate(books)[0])
+        matcher = dedup.FuzzyMatcher()
+        start = time.perf_counter()
+        product_rows, offer_rows = builder.deduplicate(books, matcher=matcher)[:2]
+        elapsed = time.perf_counter() - start
+        # Товар «чистый», если все его предложения - одна и та же книга
+        works_of = {}
+        for (product_id, *_), work in zip(offer_rows, labels):
+            works_of.setdefault(product_id, set()).add(work)
+        pure = sum(len(found) == 1 for found in works_of.values()) / len(works_of)
+        merged = 1 - (len(product_rows) - count) / (exact_products - count)
+        per_offer.append(matcher.comparisons / len(books))
+        run_ok = pure >= 0.99 and merged >= 0.95
+        ok = ok and run_ok
+        offers = f"{len(books):,}".replace(',', ' ')
+        print(f"  {'✅' if run_ok else '❌'} {offers} предложений: товаров {len(product_rows)} "
+              f"(точно: {exact_products}, книг {count}), объединено {merged:.0%} повторов, "
+              f"чистых товаров {pure:.1%}, {elapsed:.1f} с, {per_offer[-1]:.1f} сравнений на предложение")
+
+    # Без блокировки сравнений на предложение было бы пропорционально числу товаров
+    scales = per_offer[-1] <= 2 * per_offer[0]
+    ok = ok and scales
+    print(f"  {'✅' if scales else '❌'} В {works[-1] // works[0]} раза больше предложений - сравнений на "
+          f"предложение {per_offer[0]:.1f} -> {per_offer[-1]:.1f}")
+    return ok
+
+def benchmark_merge_duplicates(builder, directory, works=20_000):
+    """Собирает базу с точным объединением (--exact) из предложений с по-разному
+    записанными авторами, затем объединяет дубликаты в готовой базе
+    (--merge-duplicates): товаров становится столько, сколько книг, предложения
+    не теряются, товары не смешивают разные книги; плюс независимость от порядка строк"""
+    print("\n🧩 ДЕДУПЛИКАЦИЯ: ОБЪЕДИНЕНИЕ ДУБЛИКАТОВ В ГОТОВОЙ БАЗЕ")
+    print("-"*60)
+
+    # Книга с ISBN одного товара и названием другого связывает их в любом порядке строк
+    linked = [{'title': title, 'author': author, 'isbn': isbn, 'price': 100.0, 'website': 'labirint',
+               'url': f"https://labirint.ru/books/{n}/", 'image_url': ''}
+              for n, (title, author, isbn) in enumerate([("Дюна", "Герберт Фрэнк", '9785170000001'),
+                                                         ("Дюна. Мессия", "Герберт Ф.", ''),
+                                                         ("Дюна. Мессия", "Герберт Ф.", '9785170000001')])]
+    orders = [builder.deduplicate(list(order)) for order in itertools.permutations(linked)]
+    order_ok = all(len(result[0]) == 1 and result[0][0][3] == '9785170000001' for result in orders)
+    print(f"  {'✅' if order_ok else '❌'} ISBN + название в любом из 6 порядков строк - один товар с ISBN")
+
+    merge_dir = os.path.join(directory, 'merge')
+    os.mkdir(merge_dir)
+    books, labels = synthetic_offers(works)
+    for filename, website in SOURCES:
+        with open(os.path.join(merge_dir, filename), 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(['title', 'author', 'price', 'url', 'isbn', 'image_url'])
+            writer.writerows([book['title'], book['author'], book['price'], book['url'], '', '']
+                             for book in books if book['website'] == website)
+    script = os.path.join(PROJECT_DIR, '1_create_database.py')
+    subprocess.run([sys.executable, script, '--exact'], cwd=merge_dir, check=True, stdout=subprocess.DEVNULL)
+
+    database = os.path.join(merge_dir, 'book_database.db')
+    with contextlib.closing(sqlite3.connect(database)) as conn:
+        products_before = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        # Как база, собранная до сводных таблиц: --merge-duplicates создает их сам
+        for table in ('database_stats', 'website_stats', 'product_summary', 'store_summary'):
+            conn.execute(f"DROP TABLE {table}")
+        conn.commit()
+
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, script, '--merge-duplicates'], cwd=merge_dir, stdout=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - start
+
+    work_of_url = {book['url']: work for book, work in zip(books, labels)}
+    with sqlite3.connect(database) as conn:
+        products_after = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        offers = conn.execute("SELECT product_id, url FROM offers").fetchall()
+        summary = conn.execute("SELECT COUNT(*), SUM(offers_count) FROM product_summary").fetchone()
+    works_of = {}
+    for product_id, url in offers:
+        works_of.setdefault(product_id, set()).add(work_of_url[url])
+    pure = all(len(found) == 1 for found in works_of.values())
+
+    merge_ok = (result.returncode == 0 and products_after == works and len(offers) == len(books)
+                and pure and summary == (works, len(books)))
+    print(f"  {'✅' if merge_ok else '❌'} Товаров {products_before} -> {products_after} (книг {works}), "
+          f"предложений {len(offers)} из {len(books)}, {elapsed:.1f} с")
+    return order_ok and merge_ok
+
+def benchmark_html_parsing(scraper, pages=50):
+    """Разбирает одни и те же страницы BeautifulSoup и lxml: карточек в секунду и совпадение результата"""
+    print("\n🧩 РАЗБОР СТРАНИЦ: BEAUTIFULSOUP vs LXML")
+    print("-"*60)
+
+    # isbn и время разбора генерируются заново при каждом разборе - их не сравниваем
+    volatile = ('isbn', 'date_parsed')
+
+    ok = True
+    for spec in scraper.STORES:
+        store = spec.website
+        html_pages = [render_store_page(store, f"page-{n}") for n in range(pages)]
+        results = []
+        for backend in ('soup', 'lxml'):
+            start = time.perf_counter()
+            books = [book for html in html_pages
+                     for book in scraper.parse_store_page(html, spec, 'https://example.ru', 'Жанр', backend)]
+            elapsed = time.perf_counter() - start
+            results.append(([{k: v for k, v in book.items() if k not in volatile} for book in books],
+                            len(books) / elapsed))
+
+        (soup_books, soup_speed), (lxml_books, lxml_speed) = results
+        same = soup_books == lxml_books and len(lxml_books) == pages * StandInHandler.cards_per_page
+        if not same:
+            ok = False
+        soup_rate = f"{soup_speed:,.0f}".replace(',', ' ')
+        lxml_rate = f"{lxml_speed:,.0f}".replace(',', ' ')
+        print(f"  {'✅' if same else '❌'} {store}: BeautifulSoup {soup_rate} карточек/с, "
+              f"lxml {lxml_rate} карточек/с (x{lxml_speed / soup_speed:.1f})")
+    return ok
+
+def benchmark_crawl(scraper, rate=20, concurrency=2):
+    """Парсит три локальных магазина одновременно и проверяет лимит частоты на каждый сайт"""
+    print(f"\n🕷️ ПАРСИНГ: 3 МАГАЗИНА ОДНОВРЕМЕННО ({rate} запросов/с на сайт)")
+    print("-"*60)
+
+    servers = {store: start_stand_in(store) for store in STORE_CARDS}
+    scraper.http = scraper.HttpClient(pool_size=concurrency)
+    scraper.crawler = scraper.Crawler(fetch=scraper.retry_request, concurrency=concurrency, rate=rate)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = scraper.parse_all_sites(base_urls={store: server.base_url for store, server in servers.items()})
+    elapsed = time.perf_counter() - start
+
+    ok = True
+    requests_total = 0
+    connections = scraper.http.stats()
+    for (store, server), books in zip(servers.items(), results):
+        requests_total += len(server.request_times)
+        peak = max_requests_per_second(server.request_times)
+        opened = connections[server.base_url.split('//')[1]]['connections_opened']
+        status = "✅" if peak <= rate + 1 and books and opened <= concurrency else "❌"
+        if status == "❌":
+            ok = False
+        print(f"  {status} {store}: {len(server.request_times)} страниц, {len(books)} книг, "
+              f"пик {peak} запросов/с, соединений {opened}")
+        server.shutdown()
+        server.server_close()
+
+    # Последовательный обход с тем же лимитом занял бы не меньше суммы по сайтам
+    sequential = requests_total / rate
+    status = "✅" if elapsed < sequential * 0.7 else "❌"
+    if status == "❌":
+        ok = False
+    print(f"  {status} {elapsed:.1f} с вместо ~{sequential:.1f} с при обходе сайтов по очереди")
+    return ok
+
+def benchmark_crawl_cache(scraper, directory, rate=50, concurrency=2):
+    """Два обхода подряд с кэшем ответов: второй должен получить только 304 и ничего не разбирать"""
+    print("\n🗄️ ПАРСИНГ: ПОВТОРНЫЙ ОБХОД С КЭШЕМ (ETag)")
+    print("-"*60)
+
+    servers = {store: start_stand_in(store) for store in STORE_CARDS}
+    base_urls = {store: server.base_url for store, server in servers.items()}
+    cache_dir = os.path.join(directory, 'http_cache')
+
+    passes = []
+    for _ in range(2):
+        for server in servers.values():
+            server.bytes_sent = 0
+        cache = scraper.ResponseCache(cache_dir)
+        scraper.http = scraper.HttpClient(pool_size=concurrency, cache=cache)
+        scraper.crawler = scraper.Crawler(fetch=scraper.retry_request, concurrency=concurrency, rate=rate)
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = scraper.parse_all_sites(base_urls=base_urls)
+        elapsed = time.perf_counter() - start
+
+        stats = scraper.http.stats().values()
+        passes.append({'time': elapsed,
+                       'books': sum(len(books) for books in results),
+                       'requests': sum(host['requests'] for host in stats),
+                       'not_modified': sum(host['not_modified'] for host in stats),
+                       'bytes': sum(server.bytes_sent for server in servers.values()),
+                       'parse_skipped': cache.parse_skipped})
+        scraper.http.close()
+
+    for server in servers.values():
+        server.shutdown()
+        server.server_close()
+
+    first, second = passes
+    print(f"  Первый обход: {first['requests']} страниц, {first['bytes'] / 1024:.0f} КБ, "
+          f"{first['books']} книг, {first['time']:.1f} с")
+    print(f"  Второй обход: {second['not_modified']} ответов 304, {second['bytes'] / 1024:.0f} КБ, "
+          f"без разбора {second['parse_skipped']} страниц, {second['books']} книг, {second['time']:.1f} с")
+    ok = (second['not_modified'] == second['requests'] and second['bytes'] == 0
+          and second['parse_skipped'] == second['requests'] and second['books'] == first['books'])
+    print(f"  {'✅' if ok else '❌'} Неизменившиеся страницы не скачиваются и не разбираются заново")
+    return ok
+
+def benchmark_duplicate_cards(scraper, rate=200, concurrency=2, shared=5):
+    """Парсит локальные магазины, где shared карточек повторяются на всех страницах всех разделов:
+    каждая карточка должна попасть в результат ровно один раз"""
+    print("\n♻️ ПАРСИНГ: ПОВТОРЯЮЩИЕСЯ КАРТОЧКИ")
+    print("-"*60)
+
+    servers = {store: start_stand_in(store, shared) for store in STORE_CARDS}
+    scraper.http = scraper.HttpClient(pool_size=concurrency)
+    scraper.crawler = scraper.Crawler(fetch=scraper.retry_request, concurrency=concurrency, rate=rate)
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = scraper.parse_all_sites(base_urls={store: server.base_url for store, server in servers.items()})
+    scraper.http.close()
+
+    ok = True
+    for (store, server), books in zip(servers.items(), results):
+        pages = len(server.request_times)
+        unique_cards = pages * (StandInHandler.cards_per_page - shared) + shared
+        urls = [book['url'] for book in books]
+        same = len(books) == len(set(urls)) == unique_cards
+        if not same:
+            ok = False
+        print(f"  {'✅' if same else '❌'} {store}: {pages} страниц, {pages * StandInHandler.cards_per_page} "
+              f"карточек, уникальных {unique_cards}, в результате {len(books)}")
+        server.shutdown()
+        server.server_close()
+    return ok
+
+def benchmark_enrichment(scraper, directory, rate=200, concurrency=2, shared=5):
+    """Обогащает CSV локальных магазинов ISBN со страниц книг и собирает базу до и после:
+    книги, общие для трех магазинов (разные подписи авторов), должны слиться по ISBN"""
+    print("\n🔎 ПАРСИНГ: НАСТОЯЩИЕ ISBN СО СТРАНИЦ КНИГ")
+    print("-"*60)
+
+    servers = {store: start_stand_in(store, shared) for store in STORE_CARDS}
+    base_urls = {store: server.base_url for store, server in servers.items()}
+    paths = {spec.website: os.path.join(directory, spec.output_file) for spec in scraper.STORES}
+    scraper.http = scraper.HttpClient(pool_size=concurrency)
+    scraper.crawler = scraper.Crawler(fetch=scraper.retry_request, concurrency=concurrency, rate=rate)
+    sinks = {website: scraper.BookFile(path, spec.columns())
+             for spec, (website, path) in zip(scraper.STORES, paths.items())}
+    with contextlib.redirect_stdout(io.StringIO()):
+        scraper.parse_all_sites(base_urls=base_urls, sinks=sinks)
+    for sink in sinks.values():
+        sink.close()
+
+    def count_products():
+        # --exact: склеивают только ISBN, иначе одни и те же книги магазинов
+        # объединило бы нечеткое сравнение названий и авторов и без обогащения
+        db_path = os.path.join(directory, 'book_database.db')
+        subprocess.run([sys.executable, os.path.join(PROJECT_DIR, '1_create_database.py'), '--full', '--exact'],
+                       cwd=directory, check=True, stdout=subprocess.DEVNULL)
+        with contextlib.closing(sqlite3.connect(db_path)) as conn:
+            return conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    products_before = count_products()
+    for server in servers.values():
+        server.request_times.clear()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = scraper.enrich_all_sites(paths=paths, base_urls=base_urls)
+    elapsed = time.perf_counter() - start
+    scraper.http.close()
+    detail_requests = sum(len(server.request_times) for server in servers.values())
+    for server in servers.values():
+        server.shutdown()
+        server.server_close()
+
+    rows = []
+    for path in paths.values():
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            rows.extend(csv.DictReader(f))
+    correct = sum(1 for row in rows if row['isbn'] == book_isbn(row['url'].rstrip('/').rsplit('/', 1)[1]))
+    products_after = count_products()
+
+    isbn_ok = correct == len(rows) == detail_requests == sum(books for books, _ in results.values())
+    # shared книг есть в каждом из трех магазинов: после обогащения - по одному товару на книгу
+    merge_ok = products_before == len(rows) and products_after == len(rows) - 2 * shared
+    print(f"  {'✅' if isbn_ok else '❌'} {detail_requests} страниц книг за {elapsed:.1f} с, "
+          f"верный ISBN у {correct} из {len(rows)} книг")
+    print(f"  {'✅' if merge_ok else '❌'} Товаров в базе: {products_before} со случайными ISBN, "
+          f"{products_after} с настоящими")
+    return isbn_ok and merge_ok
+
+def benchmark_streaming_output(scraper, directory, rate=200, concurrency=2):
+    """Парсит локальные магазины в списки и в CSV-файлы: пик памяти и полнота записанных файлов"""
+    print("\n💾 ПАРСИНГ: ПОТОКОВАЯ ЗАПИСЬ В CSV")
+    print("-"*60)
+
+    servers = {store: start_stand_in(store) for store in STORE_CARDS}
+    base_urls = {store: server.base_url for store, server in servers.items()}
+
+    peaks = {}
+    for mode in ('list', 'file'):
+        scraper.http = scraper.HttpClient(pool_size=concurrency)
+        scraper.crawler = scraper.Crawler(fetch=scraper.retry_request, concurrency=concurrency, rate=rate)
+        sinks = ({spec.website: scraper.BookFile(os.path.join(directory, spec.output_file), spec.columns())
+                  for spec in scraper.STORES} if mode == 'file' else None)
+        tracemalloc.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = scraper.parse_all_sites(base_urls=base_urls, sinks=sinks)
+        peaks[mode] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        scraper.http.close()
+        if mode == 'list':
+            expected = [len(books) for books in results]
+        else:
+            for sink in sinks.values():
+                sink.close()
+            written = [len(sink) for sink in sinks.values()]
+
+    for server in servers.values():
+        server.shutdown()
+        server.server_close()
+
+    paths = [os.path.join(directory, spec.output_file) for spec in scraper.STORES]
+    rows = []
+    for path in paths:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            rows.append(sum(1 for _ in csv.DictReader(f)))
+    merged = scraper.merge_csv(paths, os.path.join(directory, 'all_books_3000.csv'))
+
+    ok = rows == written == expected and merged == sum(expected)
+    print(f"  {'✅' if ok else '❌'} В файлах магазинов {rows} строк, в объединенном {merged} "
+          f"(в памяти было {expected})")
+    print(f"  Пик памяти: списки {peaks['list'] / 2**20:.1f} МБ, CSV {peaks['file'] / 2**20:.1f} МБ")
+    ok = ok and peaks['file'] < peaks['list']
+    return ok
+
+def benchmark_resume(scraper, directory, rate=200, concurrency=2, fail_after=60):
+    """Обрывает обход после fail_after страниц и запускает его снова с тем же checkpoint,
+    как это делает сам парсер (pars.crawl_to_files): после обрыва прогресс должен остаться,
+    второй запуск - не загружать готовые страницы и удалить прогресс, а в файлах - ни потерь,
+    ни повторов"""
+    print("\n↩️ ПАРСИНГ: ПРОДОЛЖЕНИЕ ПРЕРВАННОГО ОБХОДА")
+    print("-"*60)
+
+    servers = {store: start_stand_in(store) for store in STORE_CARDS}
+    base_urls = {store: server.base_url for store, server in servers.items()}
+    checkpoint_path = os.path.join(directory, 'crawl_checkpoint.jsonl')
+    paths = {spec.website: os.path.join(directory, spec.output_file) for spec in scraper.STORES}
+
+    fetched = 0
+    lock = threading.Lock()
+    def failing_fetch(url):
+        # После fail_after страниц "сайты пропадают" - как упавшая сеть посреди обхода
+        nonlocal fetched
+        with lock:
+            fetched += 1
+            if fetched > fail_after:
+                raise scraper.requests.ConnectionError("обрыв")
+        return scraper.retry_request(url)
+
+    requests_made = []
+    failed_pages = []
+    kept = []
+    for fetch in (failing_fetch, scraper.retry_request):
+        for server in servers.values():
+            server.request_times.clear()
+        scraper.http = scraper.HttpClient(pool_size=concurrency)
+        scraper.crawler = scraper.Crawler(fetch=fetch, concurrency=concurrency, rate=rate)
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, failed = scraper.crawl_to_files(checkpoint_path, paths=paths, base_urls=base_urls)
+        scraper.http.close()
+        requests_made.append(sum(len(server.request_times) for server in servers.values()))
+        failed_pages.append(failed)
+        kept.append(os.path.exists(checkpoint_path))
+        if fetch is failing_fetch and kept[-1]:
+            checkpoint = scraper.Checkpoint(checkpoint_path)
+            pages_done = checkpoint.pages()
+            checkpoint.close()
+            # Обрыв посреди записи: недописанная строка checkpoint и лишние байты в CSV
+            with open(checkpoint_path, 'a', encoding='utf-8') as f:
+                f.write('{"store": "labirint", "categ')
+            with open(paths['labirint'], 'a', encoding='utf-8') as f:
+                f.write('Оборванная,строка')
+
+    # Страница раздела не загрузилась, а следующая за ней оказалась пустой (раздел
+    # кончился): раздел не должен отмечаться законченным - повторный запуск догрузит ее
+    gap_dir = os.path.join(directory, 'gap')
+    os.makedirs(gap_dir)
+    gap_checkpoint = os.path.join(gap_dir, 'crawl_checkpoint.jsonl')
+    gap_paths = {website: os.path.join(gap_dir, os.path.basename(path)) for website, path in paths.items()}
+    spec = scraper.STORES[0]
+    failed_url = spec.page_url(spec.categories[0], 2, base_urls[spec.website])
+    empty_url = spec.page_url(spec.categories[0], 4, base_urls[spec.website])
+    gap_runs = []
+    for fail in (True, False):
+        fetched_urls = set()
+        def gap_fetch(url, fail=fail, fetched_urls=fetched_urls):
+            fetched_urls.add(url)
+            if fail and url == failed_url:
+                raise scraper.requests.ConnectionError("обрыв")
+            if url == empty_url:
+                return types.SimpleNamespace(text='<html><body></body></html>', unchanged=False, body_hash=None)
+            return scraper.retry_request(url)
+        scraper.http = scraper.HttpClient(pool_size=concurrency)
+        scraper.crawler = scraper.Crawler(fetch=gap_fetch, concurrency=concurrency, rate=rate)
+        with contextlib.redirect_stdout(io.StringIO()):
+            scraper.crawl_to_files(gap_checkpoint, paths=gap_paths, base_urls=base_urls)
+        scraper.http.close()
+        gap_runs.append((failed_url in fetched_urls, os.path.exists(gap_checkpoint)))
+    gap_ok = gap_runs == [(True, True), (True, False)]
+
+    for server in servers.values():
+        server.shutdown()
+        server.server_close()
+
+    urls = []
+    for path in paths.values():
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            urls.extend(row['url'] for row in csv.DictReader(f))
+    # Полный обход: все страницы всех разделов, по cards_per_page книг, не больше limit с магазина
+    total_pages = sum(len(spec.categories) * spec.pages_per_category() for spec in scraper.STORES)
+    expected = sum(min(spec.limit, len(spec.categories) * spec.pages_per_category() * StandInHandler.cards_per_page)
+                   for spec in scraper.STORES)
+
+    if not kept[0]:
+        pages_done = 0
+    first, second = requests_made
+    checkpoint_ok = kept == [True, False] and failed_pages[0] > 0 and failed_pages[1] == 0
+    refetched_ok = pages_done > 0 and first == pages_done and second == total_pages - pages_done
+    files_ok = len(urls) == len(set(urls)) == expected
+    print(f"  {'✅' if checkpoint_ok else '❌'} После обрыва ({failed_pages[0]} страниц не загрузилось) "
+          f"прогресс {'сохранен' if kept[0] else 'удален'}; после полного обхода - "
+          f"{'сохранен' if kept[1] else 'удален'}")
+    print(f"  {'✅' if refetched_ok else '❌'} Первый запуск: {pages_done} страниц до обрыва; "
+          f"второй загрузил {second} страниц (всего страниц {total_pages})")
+    print(f"  {'✅' if gap_ok else '❌'} Страница 2 не загрузилась, страница 4 пустая: повторный запуск "
+          f"{'загрузил' if gap_runs[1][0] else 'не загрузил'} страницу 2, прогресс "
+          f"{'удален' if not gap_runs[1][1] else 'остался'}")
+    print(f"  {'✅' if files_ok else '❌'} В файлах {len(urls)} книг, уникальных {len(set(urls))}, "
+          f"ожидалось {expected}")
+    return checkpoint_ok and refetched_ok and gap_ok and files_ok
+
+def benchmark_replay(scraper, directory, concurrency=4, rate=1000):
+    """Записывает обход локальных магазинов под настоящими адресами сайтов (--record),
+    затем обходит запись без сети (--replay): страниц/с, карточек/с и пик памяти
+    всего конвейера - загрузка, разбор, запись CSV"""
+    print("\n📼 ПАРСИНГ: ЗАПИСЬ И ВОСПРОИЗВЕДЕНИЕ СТРАНИЦ")
+    print("-"*60)
+
+    fixtures_dir = os.path.join(directory, 'fixtures')
+    servers = {store: start_stand_in(store) for store in STORE_CARDS}
+    stand_ins = {urlsplit(spec.base_url).netloc: servers[spec.website].base_url for spec in scraper.STORES}
+    def via_stand_ins(url):
+        parts = urlsplit(url)
+        return scraper.retry_request(stand_ins[parts.netloc] + url.split(parts.netloc, 1)[1])
+
+    recorder = scraper.FixtureRecorder(fixtures_dir)
+    scraper.http = scraper.HttpClient(pool_size=concurrency)
+    scraper.crawler = scraper.Crawler(fetch=recorder.wrap(via_stand_ins), concurrency=concurrency, rate=rate)
+    with contextlib.redirect_stdout(io.StringIO()):
+        recorded = scraper.parse_all_sites()
+    scraper.http.close()
+    for server in servers.values():
+        server.shutdown()
+        server.server_close()
+
+    def replay_crawl(output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+        replay = scraper.FixtureReplay(fixtures_dir)
+        scraper.http = scraper.HttpClient(pool_size=concurrency)
+        scraper.crawler = scraper.Crawler(fetch=replay.wrap(scraper.retry_request),
+                                          concurrency=concurrency, rate=rate)
+        sinks = {spec.website: scraper.BookFile(os.path.join(output_dir, spec.output_file), spec.columns())
+                 for spec in scraper.STORES}
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            scraper.parse_all_sites(sinks=sinks)
+        elapsed = time.perf_counter() - start
+        for sink in sinks.values():
+            sink.close()
+        scraper.http.close()
+        stats = replay.stats().values()
+        replay.close()
+        return (elapsed, sum(host['served'] for host in stats), sum(host['misses'] for host in stats),
+                sum(len(sink) for sink in sinks.values()))
+
+    elapsed, pages, misses, cards = replay_crawl(os.path.join(directory, 'replay'))
+    tracemalloc.start()
+    replay_crawl(os.path.join(directory, 'replay_memory'))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    # Воспроизведение дает те же книги, что и запись (ссылки - настоящих сайтов);
+    # порядок страниц зависит от потоков, поэтому сравниваем отсортированные
+    replayed = []
+    for spec in scraper.STORES:
+        with open(os.path.join(directory, 'replay', spec.output_file), newline='', encoding='utf-8-sig') as f:
+            replayed.extend((row['url'], row['title'], row['author'], row['price']) for row in csv.DictReader(f))
+    expected = [(book['url'], book['title'], book['author'], str(book['price'])) for books in recorded for book in books]
+    same = sorted(replayed) == sorted(expected) and not misses and pages == recorder.recorded
+    real_urls = all(url.startswith(tuple(spec.base_url for spec in scraper.STORES)) for url, *_ in replayed)
+
+    ok = same and real_urls
+    print(f"  {'✅' if ok else '❌'} Записано {recorder.recorded} страниц, воспроизведено {pages} "
+          f"(нет в записи: {misses}), книг {cards} - те же, что при записи")
+    pages_rate = f"{pages / elapsed:,.0f}".replace(',', ' ')
+    cards_rate = f"{cards / elapsed:,.0f}".replace(',', ' ')
+    print(f"  {pages_rate} страниц/с, {cards_rate} карточек/с, пик памяти {peak / 2**20:.1f} МБ")
+    return ok
+
+def benchmark_parse_processes(scraper, workers=2, concurrency=4, rate=1000):
+    """Обходит локальные магазины с разбором в потоках загрузки и в процессах-разборщиках
+    (ParsePool): те же книги, пропускная способность стадий загрузки и разбора"""
+    print(f"\n🧮 ПАРСИНГ: РАЗБОР СТРАНИЦ В {workers} ПРОЦЕССАХ")
+    print("-"*60)
+
+    volatile = ('isbn', 'date_parsed')
+
+    def crawl(pool):
+        servers = {store: start_stand_in(store) for store in STORE_CARDS}
+        scraper.http = scraper.HttpClient(pool_size=concurrency)
+        scraper.crawler = scraper.Crawler(fetch=scraper.retry_request, concurrency=concurrency, rate=rate)
+        scraper.parse_pool = pool
+        start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = scraper.parse_all_sites(base_urls={store: server.base_url for store, server in servers.items()})
+        finally:
+            scraper.parse_pool = None
+        elapsed = time.perf_counter() - start
+        fetch_time = sum(host['fetch_time_s'] for host in scraper.crawler.stats().values())
+        scraper.http.close()
+        for server in servers.values():
+            server.shutdown()
+            server.server_close()
+        # Порт локального магазина в ссылках у каждого обхода свой - сравниваем пути
+        def local(value):
+            value = str(value)
+            for server in servers.values():
+                value = value.replace(server.base_url, '')
+            return value
+        books = sorted(tuple(sorted((k, local(v)) for k, v in book.items() if k not in volatile))
+                       for store_books in results for book in store_books)
+        return books, elapsed, fetch_time
+
+    inline_books, inline_elapsed, _ = crawl(None)
+    pool = scraper.ParsePool(workers=workers)
+    pool_books, pool_elapsed, fetch_time = crawl(pool)
+    stats = pool.stats()
+    pool.close()
+
+    same = pool_books == inline_books and stats['cards'] == len(pool_books)
+    bounded = stats['max_queued'] <= pool.max_pending
+    ok = same and bounded
+    # Выигрыш по времени возможен, только если разборщикам хватает ядер
+    cores = os.cpu_count() or 1
+    if cores > 1:
+        faster = pool_elapsed < inline_elapsed
+        ok = ok and faster
+    print(f"  {'✅' if same else '❌'} Книг {len(pool_books)} - те же, что при разборе в потоках загрузки")
+    print(f"  {'✅' if bounded else '❌'} В очереди разбора не больше {stats['max_queued']} страниц "
+          f"(предел {pool.max_pending}), ожидание места {stats['queue_wait_s']} с")
+    print(f"  Загрузка: {fetch_time:.1f} с суммарно в {concurrency} потоках на сайт; "
+          f"разбор: {stats['pages']} страниц, {stats['pages_per_s']} страниц/с, {stats['parse_time_s']} с в процессах")
+    verdict = ("" if cores == 1 else "✅ " if pool_elapsed < inline_elapsed else "❌ ")
+    print(f"  {verdict}Обход: {inline_elapsed:.1f} с с разбором в потоках, {pool_elapsed:.1f} с с процессами"
+          + (" (одно ядро - ускорения не ждем)" if cores == 1 else ""))
+    return ok
+
+def benchmark_http_retries(scraper, pages=8, concurrency=4, rate=4):
+    """Проверяет повторы HttpClient: 429 ждет Retry-After, 404 не повторяется"""
+    print("\n🔁 HTTP: ПОВТОРЫ И RETRY-AFTER")
+    print("-"*60)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+    server.hits = {}
+    server.log = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    http = scraper.HttpClient(backoff=0.1)
+
+    start = time.perf_counter()
+    busy_ok = http.get(f"{base_url}/busy").status_code == 200
+    busy_time = time.perf_counter() - start
+    busy_ok = busy_ok and server.hits['/busy'] == 2 and busy_time >= 1.0
+
+    try:
+        http.get(f"{base_url}/missing")
+        missing_ok = False
+    except scraper.requests.HTTPError:
+        missing_ok = server.hits['/missing'] == 1
+
+    print(f"  {'✅' if busy_ok else '❌'} 429: повтор через {busy_time:.1f} с (Retry-After: 1)")
+    print(f"  {'✅' if missing_ok else '❌'} 404: без повторов ({server.hits.get('/missing', 0)} запрос)")
+    http.close()
+
+    # Повторы через лимиты сайта: после 503 с Retry-After сайт молчит секунду для всех
+    # потоков, и даже с повторами запросов не больше rate в секунду
+    server.log.clear()
+    crawler = scraper.Crawler(fetch=lambda url: http.get(url), concurrency=concurrency, rate=rate)
+    http = scraper.HttpClient(pool_size=concurrency, backoff=0.1, on_retry=crawler.retry_wait)
+    urls = [f"{base_url}/page/{n}" + ('/overloaded' if n % 3 == 0 else '') for n in range(1, pages + 1)]
+    responses = crawler.map(crawler.fetch, urls, workers=concurrency)
+    http.close()
+    server.shutdown()
+    server.server_close()
+
+    times = [t for t, _ in server.log]
+    quiet = all(not start + 0.05 < t < start + 0.95 for start, status in server.log if status == 503 for t in times)
+    peak = max_requests_per_second(times)
+    limited_ok = (all(response.status_code == 200 for response in responses) and quiet
+                  and peak <= rate + 1 and crawler.stats()[urlsplit(base_url).netloc]['retries'] == pages // 3)
+    print(f"  {'✅' if limited_ok else '❌'} Повторы через лимит сайта: {len(times)} запросов, "
+          f"до {peak} в секунду (лимит {rate}), после 503 сайт {'ждет' if quiet else 'не ждет'} Retry-After")
+    return busy_ok and missing_ok and limited_ok
+
+def benchmark_homepage(site):
+    """Проверяет, что статистика главной страницы не требует агрегатов по таблицам"""
+    print("\n🏠 ГЛАВНАЯ СТРАНИЦА: СТАТИСТИКА")
+    print("-"*60)
+
+    statements = []
+    for func in (site.get_database_stats, site.get_all_websites):
+        _, selects = trace_statements(site, func)
+        statements.extend(selects)
+
+    aggregates = [s for s in statements if 'FROM products' in s or 'FROM offers' in s]
+    status = "✅" if not aggregates else "❌"
+    print(f"  {status} {len(statements)} SQL-запросов, обращений к products/offers: {len(aggregates)}")
+    return not aggregates
+
+def benchmark_pool(site, threads=8, requests_per_thread=50, max_wait_ms=250):
+    """Гоняет search_books из нескольких потоков и печатает метрики пула; соединения
+    выдаются по очереди, поэтому ни один поток не должен ждать дольше max_wait_ms"""
+    print("\n🏊 ПУЛ СОЕДИНЕНИЙ: ПАРАЛЛЕЛЬНЫЕ ЗАПРОСЫ")
+    print("-"*60)
+
+    site.pool.close()
+    site.pool = site.ConnectionPool(site.pool.path, size=threads // 2)
+
+    def worker():
+        for _ in range(requests_per_thread):
+            site.search_books("Мир", "price_asc", "all", None, None)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total = threads * requests_per_thread
+    stats = site.pool.stats()
+    print(f"  {total} запросов в {threads} потоках: {total / elapsed:.0f} запросов/с")
+    print(f"  Соединений открыто: {stats['opened']} из {stats['size']}")
+    print(f"  Попаданий в пул: {stats['hits']}, ожиданий: {stats['waits']} "
+          f"({stats['wait_time_ms']} мс суммарно)")
+    ok = stats['opened'] <= stats['size'] and stats['max_wait_ms'] <= max_wait_ms
+    print(f"  {'✅' if ok else '❌'} Самое долгое ожидание соединения: {stats['max_wait_ms']} мс "
+          f"(предел {max_wait_ms} мс)")
+    return ok
+
+def benchmark_idle_keepalive(site, workers=2, idle_clients=2):
+    """Занимает все потоки сервера простаивающими соединениями keep-alive и замеряет
+    ответ новому клиенту: его не должны задерживать дольше keepalive_timeout"""
+    print("\n🔌 СЕРВЕР: ПРОСТАИВАЮЩИЕ СОЕДИНЕНИЯ KEEP-ALIVE")
+    print("-"*60)
+
+    handler = type('QuietHandler', (site.BookWebsiteHandler,),
+                   {'protocol_version': 'HTTP/1.1', 'log_message': lambda self, *args: None})
+    httpd = site.ThreadPoolHTTPServer(('127.0.0.1', 0), handler, workers=workers)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    port = httpd.server_address[1]
+
+    def get(conn, path='/api/pool'):
+        conn.request('GET', path)
+        response = conn.getresponse()
+        response.read()
+        return response
+
+    # Каждый «браузер» делает два запроса по одному соединению и замолкает, не закрывая его
+    idle = [http.client.HTTPConnection('127.0.0.1', port, timeout=60) for _ in range(idle_clients)]
+    reused = True
+    for conn in idle:
+        get(conn)
+        sock = conn.sock
+        get(conn)
+        reused = reused and conn.sock is sock
+
+    start = time.perf_counter()
+    with contextlib.closing(http.client.HTTPConnection('127.0.0.1', port, timeout=60)) as conn:
+        status = get(conn).status
+    latency = time.perf_counter() - start
+
+    for conn in idle:
+        conn.close()
+    httpd.shutdown()
+    httpd.server_close()
+
+    limit = site.BookWebsiteHandler.keepalive_timeout + 0.5
+    ok = reused and status == 200 and latency < limit
+    print(f"  {'✅' if ok else '❌'} {idle_clients} простаивающих соединения на {workers} потоках: "
+          f"новый клиент получил ответ за {latency:.2f} с (предел {limit:.1f} с), "
+          f"keep-alive {'работает' if reused else 'не работает'}")
+    return ok
+
+if __name__ == "__main__":
+    print("="*60)
+    print("ЗАМЕРЫ ПРОИЗВОДИТЕЛЬНОСТИ")
+    print("="*60)
+
+    site = load_script('3_website.py', 'website')
+    builder = load_script('1_create_database.py', 'builder')
+    scraper = load_script('pars.py', 'scraper')
+    ok = True
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        create_synthetic_database(tmp_dir)
+        os.chdir(tmp_dir)
+        ok = benchmark_search(site) and ok
+        ok = benchmark_pagination(site) and ok
+        ok = benchmark_store_filter(site) and ok
+        ok = benchmark_deep_pages(site, tmp_dir) and ok
+        ok = benchmark_homepage(site) and ok
+        ok = benchmark_pool(site) and ok
+        ok = benchmark_idle_keepalive(site) and ok
+        site.pool.close()
+        os.chdir(PROJECT_DIR)
+        ok = benchmark_csv_loading(builder, tmp_dir) and ok
+        ok = benchmark_build(builder, tmp_dir) and ok
+        ok = benchmark_parallel_loading(builder, tmp_dir) and ok
+        ok = benchmark_build_memory(tmp_dir) and ok
+    ok = benchmark_fuzzy_dedup(builder) and ok
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        ok = benchmark_merge_duplicates(builder, tmp_dir) and ok
+
+    ok = benchmark_html_parsing(scraper) and ok
+    ok = benchmark_crawl(scraper) and ok
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        ok = benchmark_crawl_cache(scraper, tmp_dir) and ok
+    ok = benchmark_duplicate_cards(scraper) and ok
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        ok = benchmark_enrichment(scraper, tmp_dir) and ok
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        ok = benchmark_streaming_output(scraper, tmp_dir) and ok
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        ok = benchmark_resume(scraper, tmp_dir) and ok
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        ok = benchmark_replay(scraper, tmp_dir) and ok
+    ok = benchmark_parse_processes(scraper) and ok
+    ok = benchmark_http_retries(scraper) and ok
+
+    print("\n" + "="*60)
+    print("✅ ЗАМЕРЫ ЗАВЕРШЕНЫ" if ok else "❌ ЕСТЬ РЕГРЕССИИ")
+    print("="*60)
+    sys.exit(0 if ok else 1)
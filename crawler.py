@@ -0,0 +1,483 @@
+# crawler.py - ОДНОВРЕМЕННЫЙ ОБХОД МАГАЗИНОВ С ОГРАНИЧЕНИЕМ ЧАСТОТЫ ЗАПРОСОВ
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+
+# Вежливость по умолчанию: не больше 2 одновременных запросов к сайту
+# и в среднем один запрос в 2 секунды (как прежние паузы random.uniform(1, 3))
+DEFAULT_CONCURRENCY = 2
+DEFAULT_RATE = 0.5
+DEFAULT_BURST = 1
+
+# Временные ошибки сервера - запрос стоит повторить; остальные 4xx - окончательные
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Дольше этого не ждем, даже если сервер просит в Retry-After
+MAX_RETRY_AFTER = 60
+
+class TokenBucket:
+    """Ведро токенов: в среднем rate запросов в секунду, подряд без ожидания - не больше burst.
+
+    Токен резервируется сразу (счетчик может уйти в минус), поэтому потоки
+    встают в очередь и спят ровно столько, сколько нужно, без опроса в цикле.
+    pause() сдвигает на паузу все токены - и уже зарезервированные, и новые.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._shifted = 0.0   # сумма всех пауз: поток, проснувшись, досыпает то, что добавилось
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Ждет свой токен и возвращает время ожидания в секундах"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            shifted = self._shifted
+        waited = 0.0
+        while wait > 0:
+            time.sleep(wait)
+            waited += wait
+            # Пока спали, сайт могли приостановить - наш токен сдвинулся вместе со всеми
+            with self._lock:
+                wait, shifted = self._shifted - shifted, self._shifted
+        return waited
+
+    def pause(self, seconds):
+        """Не выдает токенов seconds секунд (сайт перегружен, Retry-After). Паузы от
+        нескольких потоков не складываются: пауза продлевается только до now + seconds"""
+        with self._lock:
+            now = time.monotonic()
+            delay = now + seconds - max(now, self._paused_until)
+            if delay <= 0:
+                return
+            self._paused_until = now + seconds
+            self._shifted += delay
+            self._refill(now)
+            self._tokens -= delay * self.rate
+
+class HostLimiter:
+    """Ограничения для одного сайта: одновременные запросы и частота"""
+
+    def __init__(self, concurrency, rate, burst):
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.bucket = TokenBucket(rate, burst)
+        self.requests = 0
+        self.retries = 0
+        self.wait_time = 0.0
+        self.fetch_time = 0.0
+
+class Crawler:
+    """Движок обхода: запросы к каждому сайту идут через его HostLimiter,
+    а разные сайты (и разные разделы одного сайта) обходятся параллельно.
+
+    fetch - функция загрузки одной страницы (url -> ответ).
+    hosts - отдельные настройки для сайтов: {'www.labirint.ru': {'rate': 0.3}, ...}
+    """
+
+    def __init__(self, fetch, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE,
+                 burst=DEFAULT_BURST, hosts=None):
+        self._fetch = fetch
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.hosts = hosts or {}
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, url):
+        """HostLimiter для сайта из url (создается при первом обращении)"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._limiters:
+                settings = {'concurrency': self.concurrency, 'rate': self.rate, 'burst': self.burst}
+                settings.update(self.hosts.get(host, {}))
+                self._limiters[host] = HostLimiter(**settings)
+            return self._limiters[host]
+
+    def fetch(self, url):
+        """Загружает страницу, соблюдая ограничения ее сайта"""
+        limiter = self.limiter(url)
+        with limiter.slots:
+            wait = limiter.bucket.acquire()
+            with self._lock:
+                limiter.requests += 1
+                limiter.wait_time += wait
+            start = time.perf_counter()
+            try:
+                return self._fetch(url)
+            finally:
+                with self._lock:
+                    limiter.fetch_time += time.perf_counter() - start
+
+    def retry_wait(self, url, delay):
+        """Ожидание перед повтором запроса (HttpClient(on_retry=...)): сайт целиком
+        приостанавливается на delay секунд, затем повтор ждет свой токен, как любой
+        запрос - перегруженный сайт не получает запросов чаще rate"""
+        limiter = self.limiter(url)
+        limiter.bucket.pause(delay)
+        wait = limiter.bucket.acquire()
+        with self._lock:
+            limiter.requests += 1
+            limiter.retries += 1
+            limiter.wait_time += wait
+
+    def map(self, func, items, workers=None):
+        """Выполняет func для каждого элемента параллельно; результаты - в исходном порядке"""
+        items = list(items)
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=min(len(items), workers or self.concurrency)) as pool:
+            return list(pool.map(func, items))
+
+    def stats(self):
+        """Метрики по сайтам: число запросов (с повторами), повторов, суммарное ожидание
+        из-за лимита частоты и суммарное время самих загрузок"""
+        with self._lock:
+            return {host: {'requests': limiter.requests,
+                           'retries': limiter.retries,
+                           'wait_time_s': round(limiter.wait_time, 2),
+                           'fetch_time_s': round(limiter.fetch_time, 2)}
+                    for host, limiter in self._limiters.items()}
+
+def retry_after_seconds(response):
+    """Сколько секунд просит подождать заголовок Retry-After (число или дата), None - если его нет"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return min(int(value), MAX_RETRY_AFTER)
+    try:
+        delay = parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
+    return min(max(delay, 0), MAX_RETRY_AFTER)
+
+class ResponseCache:
+    """Кэш ответов на диске: по каждому URL - тело страницы, ETag/Last-Modified,
+    хэш тела и книги, уже разобранные из этого тела.
+
+    Запись - файл <directory>/<sha1(url)>.json; пишется через временный файл,
+    поэтому прерванный обход не оставляет битых записей.
+    """
+
+    def __init__(self, directory='http_cache'):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.parse_skipped = 0
+        self._lock = threading.Lock()
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, url):
+        """Запись кэша для url или None"""
+        try:
+            with open(self._path(url), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url, entry):
+        """Сохраняет запись для url (атомарно)"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(url))
+
+    def get_parsed(self, url, body_hash):
+        """Книги, разобранные из страницы с этим хэшем тела, или None"""
+        entry = self.get(url)
+        if entry and entry.get('parsed_hash') == body_hash and entry.get('parsed') is not None:
+            with self._lock:
+                self.parse_skipped += 1
+            return entry['parsed']
+        return None
+
+    def put_parsed(self, url, body_hash, records):
+        """Запоминает книги, разобранные из страницы с этим хэшем тела"""
+        entry = self.get(url)
+        if entry and entry.get('body_hash') == body_hash:
+            entry['parsed_hash'] = body_hash
+            entry['parsed'] = records
+            self.put(url, entry)
+
+class Checkpoint:
+    """Прогресс обхода на диске, чтобы прерванный обход продолжался с того же места.
+
+    Файл JSON Lines, только дописывается: строка на каждую готовую страницу
+    {"store", "category", "page", "books", "offset"} (offset - размер CSV магазина
+    после записи ее книг) и на законченный раздел {"store", "category", "finished": true}.
+    Строка пишется после книг страницы, поэтому все, что в файле, - уже на диске.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._pages = {}      # (магазин, раздел) -> номера готовых страниц
+        self._finished = set()
+        self._books = {}      # магазин -> книг записано
+        self._offsets = {}    # магазин -> размер CSV после последней готовой страницы
+        self._failed = set()  # (магазин, раздел, страница) - не загрузились в этом запуске
+        self._lock = threading.Lock()
+        self._load()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        # Строка, оборванная на середине, - не записанная страница: отрезаем ее
+        complete = data[:data.rfind(b'\n') + 1]
+        if len(complete) != len(data):
+            with open(self.path, 'r+b') as f:
+                f.truncate(len(complete))
+        for line in complete.decode('utf-8').splitlines():
+            self._apply(json.loads(line))
+
+    def _apply(self, record):
+        key = (record['store'], record['category'])
+        if record.get('finished'):
+            self._finished.add(key)
+            return
+        self._pages.setdefault(key, set()).add(record['page'])
+        self._books[record['store']] = self._books.get(record['store'], 0) + record['books']
+        if record.get('offset') is not None:
+            self._offsets[record['store']] = record['offset']
+
+    def _write(self, record):
+        with self._lock:
+            self._apply(record)
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self._file.flush()
+
+    @property
+    def resumed(self):
+        """Есть ли в файле прогресс прошлого обхода"""
+        return bool(self._pages or self._finished)
+
+    def done_pages(self, store, category):
+        """Номера готовых страниц раздела"""
+        return self._pages.get((store, category), set())
+
+    def cursor(self, store, category):
+        """Последняя готовая страница раздела (0 - раздел еще не начат)"""
+        return max(self.done_pages(store, category), default=0)
+
+    def is_finished(self, store, category):
+        """Раздел закончился (страница без книг) - обходить его больше не нужно"""
+        return (store, category) in self._finished
+
+    def books(self, store=None):
+        """Сколько книг магазина (или всех магазинов) уже записано"""
+        return self._books.get(store, 0) if store else sum(self._books.values())
+
+    def pages(self):
+        """Сколько страниц всех магазинов уже готово"""
+        return sum(len(pages) for pages in self._pages.values())
+
+    def offset(self, store):
+        """Размер CSV магазина после последней готовой страницы (None - магазин не начат)"""
+        return self._offsets.get(store)
+
+    def page_done(self, store, category, page, books, offset=None):
+        """Отмечает страницу готовой - после того, как ее книги записаны"""
+        self._write({'store': store, 'category': category, 'page': page, 'books': books, 'offset': offset})
+
+    def category_done(self, store, category):
+        """Отмечает раздел законченным. Раздел, в котором в этом запуске не загрузилась
+        страница, не отмечается: иначе следующий запуск пропустил бы его целиком и
+        так и не загрузил бы ее"""
+        with self._lock:
+            if any(failed[:2] == (store, category) for failed in self._failed):
+                return
+        self._write({'store': store, 'category': category, 'finished': True})
+
+    def page_failed(self, store, category, page):
+        """Отмечает, что страницу не удалось загрузить или разобрать. В файл это не
+        пишется - следующий запуск просто загрузит ее снова, - но обход уже не завершен"""
+        with self._lock:
+            self._failed.add((store, category, page))
+
+    def failed_pages(self):
+        """Сколько страниц не загрузилось в этом запуске"""
+        return len(self._failed)
+
+    def close(self):
+        self._file.close()
+
+    def clear(self):
+        """Обход завершен без ошибок: прогресс больше не нужен"""
+        self.close()
+        os.remove(self.path)
+
+class CachedResponse:
+    """Ответ из кэша вместо 304 Not Modified - с теми полями, которые нужны парсерам"""
+    status_code = 200
+    ok = True
+    unchanged = True
+
+    def __init__(self, url, entry):
+        self.url = url
+        self.text = entry['text']
+        self.body_hash = entry['body_hash']
+        self.headers = {}
+
+    def __bool__(self):
+        return True
+
+class HttpClient:
+    """Сессии requests - по одной на сайт.
+
+    Соединения с сайтом переиспользуются (keep-alive, до pool_size штук),
+    ответы запрашиваются сжатыми (gzip/deflate, brotli - если установлен),
+    User-Agent выбирается один раз на сессию. Повторяются только временные
+    ошибки: сетевые сбои, 429 и 5xx (с учетом Retry-After); остальные 4xx
+    сразу выбрасывают requests.HTTPError.
+
+    С cache (ResponseCache) запросы условные: If-None-Match/If-Modified-Since,
+    на 304 возвращается CachedResponse. У каждого ответа есть body_hash и
+    unchanged - True, если тело то же, что и в прошлый раз.
+
+    on_retry(url, delay) - как ждать перед повтором (Crawler.retry_wait - через
+    лимиты сайта); без него поток просто спит delay секунд.
+    """
+
+    def __init__(self, pool_size=DEFAULT_CONCURRENCY, max_retries=3, timeout=20, backoff=2.0, user_agent=None,
+                 cache=None, on_retry=None):
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff = backoff
+        self.user_agent = user_agent
+        self.cache = cache
+        self.on_retry = on_retry
+        self._sessions = {}
+        self._adapters = {}
+        self._retries = {}
+        self._not_modified = {}
+        self._unchanged = {}
+        self._lock = threading.Lock()
+
+    def session(self, url):
+        """Сессия сайта из url (создается при первом обращении)"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers.update(make_headers(accept_encoding=True))
+                if self.user_agent:
+                    session.headers['User-Agent'] = self.user_agent()
+                self._sessions[host] = session
+                self._adapters[host] = adapter
+                self._retries[host] = 0
+                self._not_modified[host] = 0
+                self._unchanged[host] = 0
+            return self._sessions[host]
+
+    def get(self, url, max_retries=None, **kwargs):
+        """GET с повторами временных ошибок; возвращает успешный ответ"""
+        max_retries = max_retries or self.max_retries
+        session = self.session(url)
+        host = urlsplit(url).netloc
+
+        entry = self.cache.get(url) if self.cache else None
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        for attempt in range(max_retries):
+            try:
+                response = session.get(url, timeout=self.timeout, headers=headers, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == max_retries - 1:
+                    raise
+                delay = self.backoff * (attempt + 1)
+            else:
+                if response.status_code not in RETRYABLE_STATUSES or attempt == max_retries - 1:
+                    response.raise_for_status()
+                    return self._remember(url, host, response, entry)
+                delay = retry_after_seconds(response)
+                if delay is None:
+                    delay = self.backoff * (attempt + 1)
+                response.close()
+            with self._lock:
+                self._retries[host] += 1
+            if self.on_retry:
+                self.on_retry(url, delay)
+            else:
+                time.sleep(delay)
+
+    def _remember(self, url, host, response, entry):
+        """Сверяет ответ с кэшем: 304 превращает в CachedResponse, новое тело сохраняет"""
+        if response.status_code == 304 and entry:
+            with self._lock:
+                self._not_modified[host] += 1
+            return CachedResponse(url, entry)
+
+        response.body_hash = hashlib.sha1(response.content).hexdigest()
+        response.unchanged = bool(entry) and entry.get('body_hash') == response.body_hash
+        if response.unchanged:
+            with self._lock:
+                self._unchanged[host] += 1
+        if self.cache is not None:
+            validators = {'etag': response.headers.get('ETag'),
+                          'last_modified': response.headers.get('Last-Modified')}
+            if not response.unchanged:
+                self.cache.put(url, {'url': url, **validators,
+                                     'body_hash': response.body_hash, 'text': response.text})
+            elif any(entry.get(key) != value for key, value in validators.items()):
+                entry.update(validators)
+                self.cache.put(url, entry)
+        return response
+
+    def stats(self):
+        """Метрики по сайтам: запросы, открытые и переиспользованные соединения, повторы,
+        ответы 304 и страницы с неизменившимся телом"""
+        result = {}
+        with self._lock:
+            adapters = list(self._adapters.items())
+        for host, adapter in adapters:
+            pools = [adapter.poolmanager.pools[key] for key in adapter.poolmanager.pools.keys()]
+            requests_made = sum(pool.num_requests for pool in pools)
+            opened = sum(pool.num_connections for pool in pools)
+            result[host] = {'requests': requests_made,
+                            'connections_opened': opened,
+                            'connections_reused': requests_made - opened,
+                            'retries': self._retries[host],
+                            'not_modified': self._not_modified[host],
+                            'unchanged': self._unchanged[host]}
+        return result
+
+    def close(self):
+        """Закрывает все сессии и их соединения"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._adapters.clear()
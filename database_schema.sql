@@ -35,16 +35,89 @@ CREATE TABLE IF NOT EXISTS offers (
     price REAL,
     url TEXT NOT NULL,
     parsed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    content_hash TEXT, -- хэш строки CSV для инкрементальной загрузки
     FOREIGN KEY (product_id) REFERENCES products(id)
 );
 
 -- Индексы для ускорения поиска
 CREATE INDEX IF NOT EXISTS idx_products_isbn ON products(isbn);
 CREATE INDEX IF NOT EXISTS idx_products_title ON products(title);
+CREATE INDEX IF NOT EXISTS idx_products_author ON products(author);
 CREATE INDEX IF NOT EXISTS idx_offers_product_id ON offers(product_id);
 CREATE INDEX IF NOT EXISTS idx_offers_website ON offers(website);
 CREATE INDEX IF NOT EXISTS idx_raw_data_isbn ON raw_data(isbn);
 
+-- Сводная статистика для главной страницы (пересчитывается при сборке базы)
+CREATE TABLE IF NOT EXISTS database_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    total_books INTEGER NOT NULL,
+    total_offers INTEGER NOT NULL,
+    avg_price REAL NOT NULL,
+    websites INTEGER NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS website_stats (
+    website TEXT PRIMARY KEY,
+    offers_count INTEGER NOT NULL,
+    bit INTEGER NOT NULL
+);
+
+-- Цены и магазины по каждой книге (пересчитывается при сборке базы)
+CREATE TABLE IF NOT EXISTS product_summary (
+    product_id INTEGER PRIMARY KEY,
+    min_price REAL NOT NULL,
+    max_price REAL NOT NULL,
+    avg_price REAL NOT NULL,
+    offers_count INTEGER NOT NULL,
+    websites_mask INTEGER NOT NULL,
+    FOREIGN KEY (product_id) REFERENCES products(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_product_summary_min_price ON product_summary(min_price);
+CREATE INDEX IF NOT EXISTS idx_product_summary_offers_count ON product_summary(offers_count);
+
+-- Цена и число предложений книги в каждом магазине - для фильтра по магазину на сайте
+CREATE TABLE IF NOT EXISTS store_summary (
+    product_id INTEGER NOT NULL,
+    website TEXT NOT NULL,
+    min_price REAL NOT NULL,
+    offers_count INTEGER NOT NULL,
+    PRIMARY KEY (product_id, website),
+    FOREIGN KEY (product_id) REFERENCES products(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_store_summary_price ON store_summary(website, min_price, product_id);
+
+-- Полнотекстовый индекс по названию и автору («ё» хранится как «е»)
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+    title,
+    author,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products
+BEGIN
+    INSERT INTO products_fts (rowid, title, author)
+    VALUES (NEW.id,
+            replace(replace(NEW.title, 'ё', 'е'), 'Ё', 'Е'),
+            replace(replace(COALESCE(NEW.author, ''), 'ё', 'е'), 'Ё', 'Е'));
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF title, author ON products
+BEGIN
+    UPDATE products_fts
+    SET title = replace(replace(NEW.title, 'ё', 'е'), 'Ё', 'Е'),
+        author = replace(replace(COALESCE(NEW.author, ''), 'ё', 'е'), 'Ё', 'Е')
+    WHERE rowid = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products
+BEGIN
+    DELETE FROM products_fts WHERE rowid = OLD.id;
+END;
+
 -- Триггер для обновления даты изменения
 CREATE TRIGGER IF NOT EXISTS update_products_timestamp 
 AFTER UPDATE ON products
@@ -55,4 +128,4 @@ END;
 -- Комментарии к таблицам
 COMMENT ON TABLE products IS 'Уникальные книги после дедупликации';
 COMMENT ON TABLE offers IS 'Предложения книг с конкретных сайтов';
-COMMENT ON TABLE raw_data IS 'Сырые данные из CSV файлов перед обработкой';
\ No newline at end of file
+COMMENT ON TABLE raw_data IS 'Сырые данные из CSV файлов перед обработкой';
\ No newline at end of file
@@ -0,0 +1,112 @@
+# db_pool.py - ПУЛ СОЕДИНЕНИЙ С БАЗОЙ ДЛЯ ВЕБ-САЙТА
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Настройки, которые применяются один раз при открытии соединения
+CONNECTION_PRAGMAS = {
+    'mmap_size': 256 * 1024 * 1024,  # читаем файл базы через mmap (256 МБ)
+    'cache_size': -64000,            # кэш страниц ~64 МБ на соединение
+    'temp_store': 'MEMORY',          # сортировки и GROUP BY во временных таблицах в памяти
+}
+
+class ConnectionPool:
+    """Пул соединений только для чтения с базой SQLite.
+
+    Соединения открываются лениво (не больше size штук) и переиспользуются
+    между запросами, поэтому схема и кэш страниц остаются «прогретыми».
+    Когда все соединения заняты, потоки ждут в очереди: освободившееся
+    соединение отдается тому, кто ждет дольше всех, а не новому запросу.
+    """
+
+    def __init__(self, path='book_database.db', size=8, pragmas=None):
+        self.path = path
+        self.size = size
+        self.pragmas = CONNECTION_PRAGMAS if pragmas is None else pragmas
+        self._idle = []                  # свободные соединения, последнее - самое «горячее»
+        self._waiters = deque()          # очереди ждущих потоков в порядке прихода
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._hits = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+
+    def _open(self):
+        conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def acquire(self):
+        """Берет свободное соединение, открывает новое или ждет своей очереди"""
+        with self._lock:
+            # Пока кто-то ждет, свободные соединения достаются ему - без обгона
+            if self._idle and not self._waiters:
+                self._hits += 1
+                return self._idle.pop()
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+            else:
+                waiter = queue.SimpleQueue()
+                self._waiters.append(waiter)
+
+        if can_open:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+
+        start = time.perf_counter()
+        conn = waiter.get()
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._waits += 1
+            self._wait_time += waited
+            self._max_wait = max(self._max_wait, waited)
+        return conn
+
+    def release(self, conn):
+        """Возвращает соединение в пул: первому в очереди ждущих или в свободные"""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().put(conn)
+            else:
+                self._idle.append(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        """Метрики пула: сколько соединений открыто, попаданий и ожиданий"""
+        with self._lock:
+            return {
+                'size': self.size,
+                'opened': self._opened,
+                'idle': len(self._idle),
+                'hits': self._hits,
+                'waits': self._waits,
+                'wait_time_ms': round(self._wait_time * 1000, 2),
+                'max_wait_ms': round(self._max_wait * 1000, 2),
+            }
+
+    def close(self):
+        """Закрывает все свободные соединения"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._opened -= len(idle)
+        for conn in idle:
+            conn.close()
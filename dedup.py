@@ -0,0 +1,295 @@
+# dedup.py - НЕЧЕТКОЕ ОБЪЕДИНЕНИЕ КНИГ РАЗНЫХ МАГАЗИНОВ ПО НАЗВАНИЮ И АВТОРУ (С БЛОКИРОВКОЙ)
+#
+# «Седьмой / Лукьяненко С. В.» и «Седьмой / Сергей Лукьяненко» - одна книга,
+# хотя строки «название_автор» у них разные. Сравнивать каждую книгу с каждой
+# нельзя (n² пар на миллионах предложений), поэтому книга сравнивается только
+# с книгами из своих блоков - с тем же набором слов названия или с той же
+# фамилией автора и похожим самым длинным словом названия.
+import csv
+import difflib
+import re
+
+# Заглушки парсера вместо автора - такой автор считается неизвестным
+UNKNOWN_AUTHORS = {"автор не указан", "неизвестен", "неизвестный автор", "коллектив авторов"}
+
+_PUNCTUATION = re.compile(r'[^\w]+')
+_BRACKETS = re.compile(r'\([^)]*\)|\[[^\]]*\]')
+_NUMBERS = re.compile(r'\d+')
+_ROMAN = re.compile(r'(?=[ivxl])l?x{0,3}(?:ix|iv|v?i{0,3})')
+# Номер тома или части: «Т. II», «(часть 2)», «Книга 3»
+_VOLUME = re.compile(r'(?<!\w)(?:т|том|ч|часть|кн|книга|вып|выпуск)\.?\s*(?:\d+|[ivxl]+)(?!\w)', re.IGNORECASE)
+VOLUME_MARKERS = {'т', 'том', 'ч', 'часть', 'кн', 'книга', 'вып', 'выпуск'}
+ORDINALS = {'первый': 1, 'первая': 1, 'второй': 2, 'вторая': 2, 'третий': 3, 'третья': 3,
+            'четвертый': 4, 'четвертая': 4, 'пятый': 5, 'пятая': 5}
+ROMAN_DIGITS = {'i': 1, 'v': 5, 'x': 10, 'l': 50}
+
+def normalize_text(text):
+    """Нижний регистр, «ё» -> «е», знаки препинания -> пробел, пробелы -> один пробел"""
+    text = (text or '').lower().replace('ё', 'е')
+    return ' '.join(_PUNCTUATION.sub(' ', text).split())
+
+def normalize_title(title):
+    """Название для сравнения: без пояснений в скобках («(подарочное издание)»), кавычек и знаков.
+    Скобки с номером тома («(Т. 2)») остаются - это уже другая книга"""
+    def strip(match):
+        return match.group() if _VOLUME.search(match.group()) else ' '
+    return normalize_text(_BRACKETS.sub(strip, title or ''))
+
+def normalize_author(author):
+    """Автор для сравнения: слова имени в исходном порядке, инициалы (до двух букв:
+    «С.», «Дж.») - одной буквой; заглушки («Автор не указан») - пустой кортеж"""
+    author = normalize_text(author)
+    if author in UNKNOWN_AUTHORS:
+        return ()
+    return tuple(word[0] if len(word) <= 2 else word for word in author.split())
+
+def authors_compatible(a, b):
+    """Один ли это автор: «лукьяненко с в» и «сергей лукьяненко» - да, «толстой л н» и
+    «алексей толстой» - нет.
+
+    Нужно общее полное слово (фамилия), первые буквы слов одного автора должны
+    входить в первые буквы другого (инициалы и порядок слов не важны), а полные
+    имена на одну букву - совпадать («сергей» и «светлана» - разные люди).
+    """
+    if not a or not b:
+        return not a and not b
+    words_a = {word for word in a if len(word) > 1}
+    words_b = {word for word in b if len(word) > 1}
+    if not words_a & words_b:
+        return False
+    letters_a = sorted(word[0] for word in a)
+    letters_b = sorted(word[0] for word in b)
+    shorter, longer = (letters_a, letters_b) if len(letters_a) <= len(letters_b) else (letters_b, letters_a)
+    rest = list(longer)
+    for letter in shorter:
+        if letter not in rest:
+            return False
+        rest.remove(letter)
+    other_names = {word[0] for word in words_b - words_a}
+    return not any(word[0] in other_names for word in words_a - words_b)
+
+def trigrams(title):
+    """Множество триграмм названия (с пробелами по краям - чтобы учитывались начала слов)"""
+    padded = f" {title} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def title_similarity(a, b):
+    """Похожесть нормализованных названий: доля общих триграмм (коэффициент Жаккара)"""
+    if a == b:
+        return 1.0
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+def roman_value(word):
+    """Значение римского числа («ii» -> 2) или None"""
+    if not _ROMAN.fullmatch(word):
+        return None
+    values = [ROMAN_DIGITS[letter] for letter in word]
+    return sum(-value if value < following else value
+               for value, following in zip(values, values[1:] + [0]))
+
+def title_numbers(title):
+    """Числа в названии («гарри поттер 2», «1984») - у одной книги они совпадают.
+    Римские числа («т i», «часть ii») и номера томов словами («том второй») -
+    тоже числа: «Тихий Дон. Т. I» и «Т. II» - разные книги"""
+    numbers = _NUMBERS.findall(title)
+    words = title.split()
+    for i, word in enumerate(words):
+        after_marker = i > 0 and words[i - 1] in VOLUME_MARKERS
+        before_marker = i + 1 < len(words) and words[i + 1] in VOLUME_MARKERS
+        # Одиночная «i» - римское число только после «т.»: «I, Robot» - не первый том
+        value = roman_value(word) if len(word) > 1 or after_marker else None
+        if value is None and (after_marker or before_marker):
+            value = ORDINALS.get(word)
+        if value is not None:
+            numbers.append(str(value))
+    return sorted(numbers)
+
+def words_similar(a, b):
+    """Одно ли это слово с опечаткой или в другой форме («грэя» - «грея», «приключения» -
+    «приключение»); «учебник» и «учебное», «спо» и «с» - разные слова"""
+    return difflib.SequenceMatcher(None, a, b).ratio() >= 0.75
+
+def titles_compatible(a, b):
+    """Могут ли нормализованные названия быть одной книгой: слова, которые есть только
+    в одном из них, - либо то же слово с опечаткой, либо подзаголовок, которого у
+    другого нет («мастер и маргарита роман»). Если у обоих на месте друг друга
+    разные слова («javascript» - «python», «для вузов» - «для спо») - это разные книги"""
+    words_a, words_b = set(a.split()), set(b.split())
+    only_a, only_b = words_a - words_b, words_b - words_a
+    unmatched_a = [word for word in only_a if not any(words_similar(word, other) for other in only_b)]
+    unmatched_b = [word for word in only_b if not any(words_similar(word, other) for other in only_a)]
+    return not (unmatched_a and unmatched_b)
+
+def blocking_keys(title, author, numbers):
+    """Ключи блоков книги: набор слов названия (порядок не важен) и для каждого полного
+    слова автора - оно же с началами двух самых длинных слов названия и числами
+    названия (книги с разными числами не сравниваются)"""
+    words = set(title.split())
+    keys = ['t:' + ' '.join(sorted(words))]
+    longest = sorted(words, key=lambda word: (-len(word), word))[:2]
+    suffix = ' '.join(numbers)
+    for name in author:
+        if len(name) > 1:
+            keys.extend(f"a:{name}:{word[:3]}:{suffix}" for word in longest)
+    return keys
+
+class FuzzyMatcher:
+    """Индекс товаров для нечеткого поиска книги по названию и автору.
+
+    add() запоминает товар (его нормализованное название и автора) в блоках по
+    blocking_keys(), find() ищет товар для новой книги только среди товаров из ее
+    блоков: нужны совместимые авторы (authors_compatible), одинаковые числа в
+    названии, похожесть названий не ниже threshold и совместимые различающиеся
+    слова названий (titles_compatible). Блок, в котором набралось
+    max_block товаров (обычно это заглушки вроде «Без автора»), больше не растет -
+    так одна книга никогда не сравнивается с тысячами.
+    """
+
+    def __init__(self, threshold=0.7, max_block=50):
+        self.threshold = threshold
+        self.max_block = max_block
+        self._products = []  # (id товара, название, автор, числа названия) - нормализованные
+        self._blocks = {}
+        self._pending = []
+        self._last = None  # разбор последней книги: add() после неудачного find() не повторяет его
+        self.comparisons = 0
+        self.matches = 0
+
+    def _prepare(self, title, author):
+        """(название, автор, числа, ключи блоков) книги - нормализованные"""
+        if self._last is None or self._last[0] != (title, author):
+            normalized_title, normalized_author = normalize_title(title), normalize_author(author)
+            numbers = title_numbers(normalized_title)
+            keys = blocking_keys(normalized_title, normalized_author, numbers)
+            self._last = ((title, author), (normalized_title, normalized_author, numbers, keys))
+        return self._last[1]
+
+    def add(self, product_id, title, author):
+        """Добавляет товар в индекс"""
+        title, author, numbers, keys = self._prepare(title, author)
+        if not title:
+            return
+        index = len(self._products)
+        self._products.append((product_id, title, author, numbers))
+        for key in keys:
+            block = self._blocks.setdefault(key, [])
+            if len(block) < self.max_block:
+                block.append(index)
+
+    def add_later(self, product_id, title, author):
+        """Добавляет товар в индекс при первом find() - товары из базы при повторной
+        загрузке, где все предложения уже известны, не индексируются вовсе"""
+        self._pending.append((product_id, title, author))
+
+    def find(self, title, author):
+        """id самого похожего товара или None"""
+        if self._pending:
+            pending, self._pending = self._pending, []
+            for product in pending:
+                self.add(*product)
+        title, author, numbers, keys = self._prepare(title, author)
+        if not title:
+            return None
+        candidates = set()
+        for key in keys:
+            candidates.update(self._blocks.get(key, ()))
+
+        best_id, best_score = None, self.threshold
+        for index in sorted(candidates):
+            product_id, other_title, other_author, other_numbers = self._products[index]
+            self.comparisons += 1
+            if other_numbers != numbers or not authors_compatible(author, other_author):
+                continue
+            score = title_similarity(title, other_title)
+            if (score >= best_score and (best_id is None or score > best_score)
+                    and titles_compatible(title, other_title)):
+                best_id, best_score = product_id, score
+        if best_id is not None:
+            self.matches += 1
+        return best_id
+
+    def stats(self):
+        """Товаров в индексе, блоков, сравнений и найденных совпадений"""
+        return {'products': len(self._products) + len(self._pending),
+                'blocks': len(self._blocks),
+                'comparisons': self.comparisons,
+                'matches': self.matches}
+
+class UnionFind:
+    """Система непересекающихся множеств: union(a, b) - a и b одно и то же,
+    find(a) - представитель множества a. Объединение по размеру и сжатие путей -
+    почти линейное время на миллионах элементов."""
+
+    def __init__(self):
+        self._parent = {}
+        self._size = {}
+
+    def find(self, item):
+        parent = self._parent
+        root = item
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while item != root:
+            parent[item], item = root, parent[item]
+        return root
+
+    def union(self, a, b):
+        """Объединяет множества a и b и возвращает представителя"""
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return root_a
+        size_a, size_b = self._size.get(root_a, 1), self._size.get(root_b, 1)
+        if size_a < size_b:
+            root_a, root_b = root_b, root_a
+        self._parent.setdefault(root_a, root_a)
+        self._parent[root_b] = root_a
+        self._size[root_a] = size_a + size_b
+        self._size.pop(root_b, None)
+        return root_a
+
+    def groups(self):
+        """Множества из двух и более элементов - списками"""
+        groups = {}
+        for item in list(self._parent):
+            groups.setdefault(self.find(item), []).append(item)
+        return list(groups.values())
+
+# ============================================
+# ОЦЕНКА ПО РАЗМЕЧЕННЫМ ПАРАМ
+# ============================================
+def load_labelled_pairs(path):
+    """Размеченные пары из CSV: title_a, author_a, title_b, author_b, same (1 - одна книга)"""
+    with open(path, newline='', encoding='utf-8') as f:
+        return [(row['title_a'], row['author_a'], row['title_b'], row['author_b'], row['same'] == '1')
+                for row in csv.DictReader(f)]
+
+def evaluate(pairs, **options):
+    """Точность и полнота FuzzyMatcher (с блокировкой) на размеченных парах.
+
+    Для каждой пары первая книга добавляется в пустой индекс, вторая ищется в нем.
+    Возвращает {'precision', 'recall', 'true_positive', 'false_positive',
+    'false_negative', 'errors'}; errors - пары, на которых ошибся матчер.
+    """
+    true_positive = false_positive = false_negative = 0
+    errors = []
+    for title_a, author_a, title_b, author_b, same in pairs:
+        matcher = FuzzyMatcher(**options)
+        matcher.add(1, title_a, author_a)
+        found = matcher.find(title_b, author_b) == 1
+        if found and same:
+            true_positive += 1
+        elif found:
+            false_positive += 1
+            errors.append((title_a, author_a, title_b, author_b, same))
+        elif same:
+            false_negative += 1
+            errors.append((title_a, author_a, title_b, author_b, same))
+    matched = true_positive + false_positive
+    relevant = true_positive + false_negative
+    return {'precision': true_positive / matched if matched else 1.0,
+            'recall': true_positive / relevant if relevant else 1.0,
+            'true_positive': true_positive,
+            'false_positive': false_positive,
+            'false_negative': false_negative,
+            'errors': errors}
@@ -0,0 +1,171 @@
+# extract.py - РАЗБОР КАРТОЧЕК КНИГ ПО ОПИСАНИЮ ПОЛЕЙ (lxml ИЛИ BeautifulSoup)
+import re
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    from lxml.cssselect import CSSSelector
+    LXML_AVAILABLE = True
+except ImportError:  # нет lxml или cssselect - разбираем BeautifulSoup
+    LXML_AVAILABLE = False
+
+# ============================================
+# НОРМАЛИЗАТОРЫ ЗНАЧЕНИЙ
+# ============================================
+def clean_price(price_text):
+    """Цена из текста: первое число (пробелы внутри числа допускаются), без него - 0"""
+    if not price_text:
+        return 0
+    match = re.search(r'\d[\d\s]*', price_text)
+    return int(re.sub(r'\s', '', match.group())) if match else 0
+
+def absolute_url(href, base_url):
+    """Ссылка со страницы -> полный адрес: //host/... -> https:, /path -> base_url + /path"""
+    if not href:
+        return ""
+    if href.startswith('//'):
+        return 'https:' + href
+    if href.startswith('/'):
+        return base_url + href
+    return href
+
+def _isbn13_valid(digits):
+    return sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits)) % 10 == 0
+
+def _isbn10_valid(digits):
+    return sum((10 - i) * (10 if d == 'X' else int(d)) for i, d in enumerate(digits)) % 11 == 0
+
+def normalize_isbn(text):
+    """ISBN из текста («ISBN: 978-5-04-116482-3») -> 13 цифр без дефисов.
+
+    ISBN-10 переводится в ISBN-13, номера с неверной контрольной цифрой
+    пропускаются; если корректного ISBN нет - пустая строка.
+    """
+    for match in re.finditer(r'(?:97[89][\s-]?)?(?:\d[\s-]?){9}[\dXx]', text or ''):
+        digits = re.sub(r'[\s-]', '', match.group()).upper()
+        if len(digits) == 13 and digits.isdigit() and _isbn13_valid(digits):
+            return digits
+        if len(digits) == 10 and _isbn10_valid(digits):
+            body = '978' + digits[:9]
+            check = (10 - sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(body)) % 10) % 10
+            return body + str(check)
+    return ""
+
+def extract_year(text):
+    """Год издания из текста («Эксмо, 2023 г.» -> «2023»); нет года - пустая строка"""
+    match = re.search(r'\b(1[5-9]\d\d|20\d\d)\b', text or '')
+    return match.group(1) if match else ""
+
+def strip_parenthetical(title):
+    """Убирает из названия пояснение в скобках: «Мастер и Маргарита (подарочное)» -> «Мастер и Маргарита»"""
+    if '(' in title and ')' in title:
+        return title.split('(')[0].strip()
+    return title
+
+# ============================================
+# ОПИСАНИЕ ПОЛЯ КАРТОЧКИ
+# ============================================
+class Field:
+    """Поле карточки товара.
+
+    selectors - CSS-селекторы по порядку: значение берется из первого, что его дал.
+    attr - None (текст элемента) или имя атрибута / кортеж имен (первое непустое).
+    url - значение - ссылка, ее надо сделать полной (absolute_url).
+    normalize - функция над найденным значением (например, strip_parenthetical).
+    """
+
+    def __init__(self, selectors, attr=None, default="", url=False, normalize=None):
+        self.selectors = [selectors] if isinstance(selectors, str) else list(selectors)
+        self.attrs = (attr,) if isinstance(attr, str) else attr
+        self.default = default
+        self.url = url
+        self.normalize = normalize
+        self._compiled = None
+
+    def compiled(self):
+        """Селекторы, скомпилированные lxml в XPath (один раз на поле)"""
+        if self._compiled is None:
+            self._compiled = [CSSSelector(selector) for selector in self.selectors]
+        return self._compiled
+
+    def _value(self, elem, text):
+        if self.attrs is None:
+            return text(elem).strip()
+        for name in self.attrs:
+            value = elem.get(name)
+            if value:
+                return value
+        return None
+
+    def extract(self, card, backend, base_url):
+        """Значение поля в карточке (card - элемент lxml или BeautifulSoup)"""
+        value = None
+        if backend == 'lxml':
+            for selector in self.compiled():
+                found = selector(card)
+                value = self._value(found[0], lambda elem: elem.text_content()) if found else None
+                if value:
+                    break
+        else:
+            for selector in self.selectors:
+                elem = card.select_one(selector)
+                value = self._value(elem, lambda elem: elem.text) if elem else None
+                if value:
+                    break
+
+        if not value:
+            return self.default
+        if self.url:
+            value = absolute_url(value, base_url)
+        if self.normalize:
+            value = self.normalize(value)
+        return value
+
+# ============================================
+# РАЗБОР СТРАНИЦЫ
+# ============================================
+_compiled_items = {}
+
+def parse_html(html):
+    """Строит дерево lxml из текста страницы"""
+    try:
+        return lxml.html.fromstring(html)
+    except ValueError:
+        # lxml не принимает str с объявлением кодировки <?xml ... encoding=...?>
+        return lxml.html.fromstring(html.encode('utf-8'))
+
+def find_cards(html, item_selectors, backend):
+    """Карточки на странице: результат первого из item_selectors, который что-то нашел"""
+    if backend == 'lxml':
+        root = parse_html(html)
+        for selector in item_selectors:
+            if selector not in _compiled_items:
+                _compiled_items[selector] = CSSSelector(selector)
+            cards = _compiled_items[selector](root)
+            if cards:
+                return cards
+    else:
+        soup = BeautifulSoup(html, 'html.parser')
+        for selector in item_selectors:
+            cards = soup.select(selector)
+            if cards:
+                return cards
+    return []
+
+def extract_fields(html, fields, base_url, backend=None):
+    """Разбирает страницу одной книги: словарь {поле: значение} по описаниям fields,
+    селекторы ищутся по всей странице"""
+    backend = backend or ('lxml' if LXML_AVAILABLE else 'soup')
+    root = parse_html(html) if backend == 'lxml' else BeautifulSoup(html, 'html.parser')
+    return {name: field.extract(root, backend, base_url) for name, field in fields.items()}
+
+def extract_cards(html, item_selectors, fields, base_url, backend=None):
+    """Разбирает страницу: список словарей {поле: значение} по описаниям fields.
+
+    backend - 'lxml' (по умолчанию, если установлен) или 'soup'. Все поля
+    карточки извлекаются за один проход по ней.
+    """
+    backend = backend or ('lxml' if LXML_AVAILABLE else 'soup')
+    return [{name: field.extract(card, backend, base_url) for name, field in fields.items()}
+            for card in find_cards(html, item_selectors, backend)]
@@ -0,0 +1,125 @@
+# fixtures.py - ЗАПИСЬ СТРАНИЦ САЙТОВ И ИХ ВОСПРОИЗВЕДЕНИЕ ЛОКАЛЬНЫМ СЕРВЕРОМ (БЕЗ СЕТИ)
+#
+# pars.py --record fixtures/  - обычный обход, тела ответов сохраняются на диск;
+# pars.py --replay fixtures/  - тот же обход, но страницы отдает локальный сервер.
+import hashlib
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+def fixture_name(path):
+    """Имя файла страницы по пути с запросом: /catalog/books/x?page=2 -> <sha1>.html"""
+    return hashlib.sha1(path.encode('utf-8')).hexdigest() + '.html'
+
+def split_url(url):
+    """url -> (сайт, путь с запросом)"""
+    parts = urlsplit(url)
+    return parts.netloc, (parts.path or '/') + ('?' + parts.query if parts.query else '')
+
+class FixtureRecorder:
+    """Сохраняет страницы в directory/<сайт>/<sha1(путь?запрос)>.html и список
+    адресов в directory/<сайт>/urls.txt. Записи атомарные (через временный файл)."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.recorded = 0
+        self._lock = threading.Lock()
+
+    def save(self, url, text):
+        """Сохраняет тело страницы url (в UTF-8)"""
+        host, path = split_url(url)
+        host_dir = os.path.join(self.directory, host)
+        os.makedirs(host_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=host_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, os.path.join(host_dir, fixture_name(path)))
+        with self._lock:
+            self.recorded += 1
+            with open(os.path.join(host_dir, 'urls.txt'), 'a', encoding='utf-8') as f:
+                f.write(url + '\n')
+
+    def wrap(self, fetch):
+        """fetch, который сохраняет каждую загруженную страницу"""
+        def recording_fetch(url):
+            response = fetch(url)
+            if response:
+                self.save(url, response.text)
+            return response
+        return recording_fetch
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """Отдает записанные страницы своего сайта (host_dir); чего нет - 404"""
+    protocol_version = 'HTTP/1.1'
+    # Заголовки и тело уходят отдельными пакетами - без Nagle ответ не ждет ACK клиента
+    disable_nagle_algorithm = True
+    host_dir = None
+
+    def do_GET(self):
+        try:
+            with open(os.path.join(self.host_dir, fixture_name(self.path)), 'rb') as f:
+                body = f.read()
+        except OSError:
+            with self.server.lock:
+                self.server.misses += 1
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        with self.server.lock:
+            self.server.served += 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class FixtureReplay:
+    """Локальные серверы с записанными страницами - по одному на каждый сайт из directory.
+
+    wrap(fetch) подменяет в адресе сайт на его локальный сервер, поэтому парсер
+    обходит те же адреса, что и при записи, а в результатах остаются настоящие ссылки.
+    В сеть воспроизведение не ходит: адрес незаписанного сайта - LookupError.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._servers = {}
+        for host in sorted(os.listdir(directory)):
+            host_dir = os.path.join(directory, host)
+            if not os.path.isdir(host_dir):
+                continue
+            handler = type('ReplayHandler', (ReplayHandler,), {'host_dir': host_dir})
+            server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+            server.served = server.misses = 0
+            server.lock = threading.Lock()
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self._servers[host] = server
+
+    def url(self, url):
+        """Адрес той же страницы на локальном сервере"""
+        host, path = split_url(url)
+        server = self._servers.get(host)
+        if server is None:
+            raise LookupError(f"нет записанных страниц сайта {host}")
+        return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+    def wrap(self, fetch):
+        """fetch, который загружает страницы с локальных серверов"""
+        return lambda url: fetch(self.url(url))
+
+    def stats(self):
+        """Сколько страниц отдано и сколько не нашлось в записи - по сайтам"""
+        return {host: {'served': server.served, 'misses': server.misses}
+                for host, server in self._servers.items()}
+
+    def close(self):
+        for server in self._servers.values():
+            server.shutdown()
+            server.server_close()
+        self._servers.clear()
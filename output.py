@@ -0,0 +1,91 @@
+# output.py - ПОТОКОВАЯ ЗАПИСЬ КНИГ В CSV ПО МЕРЕ ПАРСИНГА И ПОТОКОВОЕ ОБЪЕДИНЕНИЕ ФАЙЛОВ
+import csv
+import os
+
+ENCODING = 'utf-8-sig'  # как у pandas.to_csv в прежней версии парсера - файлы открываются в Excel
+
+class BookFile:
+    """CSV-файл книг одного магазина, который пополняется постранично.
+
+    Ведет себя как список для конвейера парсинга: extend(books) дописывает
+    строки и сразу сбрасывает их на диск, len() - сколько книг записано.
+    Поэтому упавший через час обход оставляет на диске все готовые страницы,
+    а память не растет с числом книг.
+
+    Файл создается заново с заголовком. С offset (из crawler.Checkpoint) - это
+    продолжение прерванного обхода: файл обрезается до offset (строки страниц,
+    не отмеченных готовыми, отбрасываются) и дописывается дальше; count - сколько
+    книг в нем уже есть.
+    """
+
+    def __init__(self, path, columns, offset=None, count=0):
+        self.path = path
+        self.columns = list(columns)
+        resume = offset is not None and os.path.exists(path) and os.path.getsize(path) >= offset
+        self.count = count if resume else 0
+        if resume:
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+        self._file = open(path, 'a' if resume else 'w', newline='', encoding=ENCODING)
+        self._writer = csv.DictWriter(self._file, fieldnames=self.columns, extrasaction='ignore')
+        if not resume:
+            self._writer.writeheader()
+            self._file.flush()
+
+    def extend(self, books):
+        """Дописывает книги страницы в конец файла"""
+        self._writer.writerows(books)
+        self._file.flush()
+        self.count += len(books)
+
+    def urls(self):
+        """Ссылки книг, уже записанных в файл (при продолжении обхода), - множество"""
+        if not self.count:
+            return set()
+        self._file.flush()
+        with open(self.path, newline='', encoding=ENCODING) as f:
+            return {row['url'] for row in csv.DictReader(f) if row.get('url')}
+
+    def tell(self):
+        """Размер файла в байтах - для отметки страницы в crawler.Checkpoint"""
+        return self._file.tell()
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_header(path):
+    """Заголовок CSV-файла (список столбцов); у пустого файла - []"""
+    with open(path, newline='', encoding=ENCODING) as f:
+        return next(csv.reader(f), [])
+
+def merge_csv(paths, out_path):
+    """Объединяет CSV-файлы в один, читая их построчно, и возвращает число строк.
+
+    Столбцы - объединение столбцов всех файлов в порядке появления (как у
+    pandas.concat); чего нет в файле, остается пустым. Отсутствующие файлы
+    пропускаются.
+    """
+    paths = [path for path in paths if os.path.exists(path)]
+    columns = []
+    for path in paths:
+        columns.extend(column for column in read_header(path) if column not in columns)
+
+    rows = 0
+    with open(out_path, 'w', newline='', encoding=ENCODING) as out:
+        writer = csv.DictWriter(out, fieldnames=columns, restval='')
+        writer.writeheader()
+        for path in paths:
+            with open(path, newline='', encoding=ENCODING) as f:
+                for row in csv.DictReader(f):
+                    writer.writerow(row)
+                    rows += 1
+    return rows
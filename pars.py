@@ -1,530 +1,500 @@
-# 1. Устанавливаем библиотеки
-!pip install requests beautifulsoup4 pandas numpy fake-useragent lxml -q
-!apt-get update > /dev/null 2>&1
-!apt-get install -y chromium-chromedriver > /dev/null 2>&1
+# 1. Устанавливаем библиотеки (в Colab - этими командами в отдельной ячейке)
+# !pip install requests beautifulsoup4 pandas numpy fake-useragent lxml cssselect -q
+# !apt-get update > /dev/null 2>&1
+# !apt-get install -y chromium-chromedriver > /dev/null 2>&1
 
 # 2. Импортируем всё необходимое
+import argparse
+import csv
+import itertools
+import os
+import threading
 import requests
-from bs4 import BeautifulSoup
 import pandas as pd
 import time
 import random
-import re
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from fake_useragent import UserAgent
 
+from crawler import Checkpoint, Crawler, HttpClient, ResponseCache, DEFAULT_CONCURRENCY, DEFAULT_RATE
+from extract import LXML_AVAILABLE, clean_price, extract_cards, extract_fields
+from fixtures import FixtureRecorder, FixtureReplay
+from output import BookFile, merge_csv, read_header
+from parse_pool import ParsePool
+from stores import STORES
+
 # Создаем объект для случайных User-Agent
 ua = UserAgent()
 
 # ============================================
 # ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
 # ============================================
-def clean_price(price_text):
-    """Очищает цену от лишних символов"""
-    if not price_text:
-        return 0
-    cleaned = re.sub(r'[^\d]', '', price_text)
-    return int(cleaned) if cleaned else 0
-
 def generate_isbn():
     """Генерирует случайный ISBN"""
     return f"978{random.randint(100000000, 999999999)}"
 
+def wait_retry(url, delay):
+    """Повтор запроса идет через лимиты сайта: сайт ждет delay секунд, повтор - свой токен"""
+    crawler.retry_wait(url, delay)
+
+# Сессии по сайтам: соединения переиспользуются, User-Agent - один на сессию
+http = HttpClient(user_agent=lambda: ua.random, on_retry=wait_retry)
+
 def retry_request(url, max_retries=3):
-    """Повторяет запрос при ошибках"""
-    for attempt in range(max_retries):
-        try:
-            headers = {'User-Agent': ua.random}
-            response = requests.get(url, headers=headers, timeout=20)
-            response.raise_for_status()
-            return response
-        except requests.RequestException as e:
-            if attempt == max_retries - 1:
-                raise
-            time.sleep(2 * (attempt + 1))
-    return None
+    """Загружает страницу через сессию сайта, повторяя запрос при временных ошибках"""
+    return http.get(url, max_retries=max_retries)
+
+# Движок обхода: лимиты на каждый сайт вместо фиксированных пауз между страницами
+crawler = Crawler(fetch=retry_request)
+
+# Чем разбирать страницы: 'lxml' (быстрее, если установлен) или 'soup' (BeautifulSoup)
+HTML_PARSER = 'lxml' if LXML_AVAILABLE else 'soup'
+
+# Процессы-разборщики (parse_pool.ParsePool); None - страницы разбираются в потоках загрузки
+parse_pool = None
+
+def parse_page(url, response, parse_func, *args):
+    """Разбирает страницу функцией parse_func(html, *args).
+    
+    Если страница не изменилась с прошлого обхода (ответ 304 или тот же хэш тела),
+    книги берутся из кэша ответов без повторного разбора.
+    """
+    cache = http.cache
+    if cache is not None and getattr(response, 'unchanged', False):
+        books = cache.get_parsed(url, response.body_hash)
+        if books is not None:
+            return books
+    
+    books = parse_func(response.text, *args)
+    if cache is not None:
+        cache.put_parsed(url, response.body_hash, books)
+    return books
 
 # ============================================
-# ФУНКЦИЯ ДЛЯ ЧИТАЙ-ГОРОДА (1000+ книг)
+# ОБЩИЙ КОНВЕЙЕР ДЛЯ ВСЕХ МАГАЗИНОВ (описания магазинов - в stores.py)
 # ============================================
-def parse_chitai_gorod(pages=50):  # Увеличил для 1000+ книг
-    print("🚀 Начинаем парсинг Читай-город (цель: 1000+ книг)...")
+def parse_store_page(html, spec, base_url, category, backend=None):
+    """Разбирает страницу каталога магазина spec и возвращает книги с нее"""
+    date_parsed = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    backend = backend or HTML_PARSER
+    if parse_pool is not None:
+        records = parse_pool.cards_of(spec, html, base_url, backend)
+    else:
+        records = extract_cards(html, spec.items, spec.fields, base_url, backend)
     books = []
-    base_url = "https://www.chitai-gorod.ru"
-    
-    # Рабочие жанры
-    genres = [
-        'klassicheskaya-proza-110003',
-        'detektiv-triller-110010', 
-        'fantastika-113787',
-        'lyubovnye-romany-110005',
-        'priklyucheniya-110006',
-        'detskie-knigi-110013',
-        'nauchnaya-literatura-110015',
-        'psikhologiya-110016',
-        'biznes-knigi-110017'
-    ]
+    for record in records:
+        book = {**record, 'price': clean_price(record['original_price']), 'website': spec.website,
+                'isbn': generate_isbn(), 'category': category, 'date_parsed': date_parsed}
+        book['description'] = spec.description.format(**book)
+        books.append(book)
+    return books
+
+def crawl_store(spec, base_url=None, sink=None, checkpoint=None):  # до spec.limit (1000) книг с магазина
+    """Обходит разделы каталога магазина spec и возвращает sink с собранными книгами.
     
-    books_per_genre = max(1, 1000 // len(genres))
-    pages_per_genre = max(1, books_per_genre // 20)  # ~20 книг на странице
+    Книги каждой страницы сразу уходят в sink.extend(): по умолчанию это список
+    в памяти, в __main__ - output.BookFile, который дописывает их в CSV магазина.
+    С checkpoint (crawler.Checkpoint) готовые страницы отмечаются в нем, а
+    отмеченные в прошлых запусках не загружаются снова.
+    Книга с уже встреченной ссылкой (магазины показывают одну книгу в нескольких
+    разделах) отбрасывается сразу, каждая карточка попадает в sink один раз.
+    base_url подменяет адрес сайта (например, локальный сервер в benchmark.py).
+    """
+    base_url = base_url or spec.base_url
+    sink = [] if sink is None else sink
+    print(f"🚀 Начинаем парсинг {spec.name} (цель: {spec.limit}+ книг)...")
+    # книг собрано всеми разделами (с прошлыми запусками) - чтобы вовремя остановиться
+    collected = checkpoint.books(spec.website) if checkpoint else 0
+    parsed = with_title = with_author = with_price = 0
+    # ссылки записанных книг; при продолжении обхода - вместе с записанными в прошлый раз
+    seen_urls = sink.urls() if isinstance(sink, BookFile) else set()
+    duplicates = 0
+    lock = threading.Lock()
     
-    print(f"📊 План: {len(genres)} жанров × {pages_per_genre} страниц × ~20 книг ≈ {len(genres) * pages_per_genre * 20} книг")
+    pages_per_category = spec.pages_per_category()
+    print(f"📊 План: {len(spec.categories)} разделов × {pages_per_category} страниц × ~{spec.per_page} книг "
+          f"≈ {len(spec.categories) * pages_per_category * spec.per_page} книг")
     
-    for genre in genres:
-        print(f"\n📚 Жанр: {genre}")
-        genre_books = []
+    # Разделы обходятся параллельно, частоту запросов к сайту ограничивает crawler
+    def crawl_category(category):
+        nonlocal collected, parsed, duplicates
+        nonlocal with_title, with_author, with_price
+        path, category_name = category[:2]
+        if checkpoint and checkpoint.is_finished(spec.website, path):
+            return
+        done_pages = checkpoint.done_pages(spec.website, path) if checkpoint else set()
+        if done_pages:
+            print(f"\n↩️ {spec.category_label}: {category_name} - продолжаем после страницы "
+                  f"{checkpoint.cursor(spec.website, path)}")
+        else:
+            print(f"\n📚 {spec.category_label}: {category_name}")
+        category_count = 0
         
-        for page in range(1, pages_per_genre + 1):
+        for page in range(1, pages_per_category + 1):
+            if collected >= spec.limit:
+                break
+            if page in done_pages:
+                continue
             try:
-                url = f"{base_url}/catalog/books/{genre}?page={page}"
-                print(f"  📄 Страница {page}/{pages_per_genre}")
+                url = spec.page_url(category, page, base_url)
+                print(f"  📄 {category_name}: страница {page}/{pages_per_category}")
                 
-                response = retry_request(url)
+                response = crawler.fetch(url)
                 if not response:
+                    print(f"  ⚠️ Пропускаем страницу (ошибка запроса)")
+                    if checkpoint:
+                        checkpoint.page_failed(spec.website, path, page)
                     continue
                     
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                items = soup.select('article.product-card, .product-card, .app-products-list__item')
-                
-                if not items:
+                page_books = parse_page(url, response, parse_store_page, spec, base_url, category_name)
+                if not page_books:
                     print(f"  ⚠️ Не найдено книг")
+                    if checkpoint:
+                        checkpoint.category_done(spec.website, path)
                     break
                 
-                page_books = 0
-                for item in items:
-                    try:
-                        title = "Название не указано"
-                        title_selectors = ['.product-card__title', '.product-card__caption a']
-                        for selector in title_selectors:
-                            elem = item.select_one(selector)
-                            if elem and elem.text.strip():
-                                title = elem.text.strip()
-                                if '(' in title and ')' in title:
-                                    title = title.split('(')[0].strip()
-                                break
-                        
-                        author = "Автор не указан"
-                        author_selectors = ['.product-card__subtitle', '.product-card__caption span']
-                        for selector in author_selectors:
-                            elem = item.select_one(selector)
-                            if elem and elem.text.strip():
-                                author = elem.text.strip()
-                                break
-                        
-                        price_text = "0 ₽"
-                        price = 0
-                        price_selectors = ['.product-mini-card-price__price', '.product-price__value']
-                        for selector in price_selectors:
-                            elem = item.select_one(selector)
-                            if elem and elem.text.strip():
-                                price_text = elem.text.strip()
-                                price_match = re.search(r'(\d[\d\s]*)', price_text.replace(' ', ''))
-                                if price_match:
-                                    try: price = int(price_match.group(1))
-                                    except: price = 0
-                                break
-                        
-                        link = ""
-                        link_selectors = ['a.product-card__title', 'a[href*="/product/"]']
-                        for selector in link_selectors:
-                            elem = item.select_one(selector)
-                            if elem and elem.get('href'):
-                                href = elem.get('href')
-                                if href.startswith('/'): link = base_url + href
-                                else: link = href
-                                break
-                        
-                        image_url = ""
-                        img_selectors = ['img.product-card__image', '.product-card__image-wrapper img']
-                        for selector in img_selectors:
-                            elem = item.select_one(selector)
-                            if elem:
-                                img_src = elem.get('src') or elem.get('data-src')
-                                if img_src:
-                                    if img_src.startswith('//'): image_url = 'https:' + img_src
-                                    elif img_src.startswith('/'): image_url = base_url + img_src
-                                    else: image_url = img_src
-                                break
-                        
-                        genre_books.append({
-                            'title': title, 'author': author, 'price': price,
-                            'original_price': price_text, 'url': link, 'website': 'chitai-gorod',
-                            'isbn': generate_isbn(), 'description': f"Книга '{title[:50]}...'",
-                            'image_url': image_url, 'category': genre,
-                            'date_parsed': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        })
-                        page_books += 1
-                        
-                    except Exception:
-                        continue
-                
-                books.extend(genre_books)
-                print(f"  ✅ Добавлено {page_books} книг (всего: {len(books)})")
-                
-                if len(books) >= 1000:
-                    print(f"🎯 Достигнута цель: 1000+ книг!")
-                    return books[:1000]
-                
-                time.sleep(random.uniform(1, 2))
+                # Страница пишется целиком под замком: строки разделов не перемешиваются,
+                # повторы и лишние сверх spec.limit отрезаются. Отметка в checkpoint - после записи
+                with lock:
+                    new_books = []
+                    for book in page_books:
+                        if book['url'] and book['url'] in seen_urls:
+                            continue
+                        seen_urls.add(book['url'])
+                        new_books.append(book)
+                    duplicates += len(page_books) - len(new_books)
+                    page_books = new_books[:spec.limit - collected]
+                    sink.extend(page_books)
+                    if checkpoint:
+                        offset = sink.tell() if hasattr(sink, 'tell') else None
+                        checkpoint.page_done(spec.website, path, page, len(page_books), offset)
+                    collected += len(page_books)
+                    parsed += len(page_books)
+                    with_title += sum(1 for b in page_books if b['title'] != "Название не указано")
+                    with_author += sum(1 for b in page_books if b['author'] != "Автор не указан")
+                    with_price += sum(1 for b in page_books if b['price'] > 0)
+                category_count += len(page_books)
+                print(f"  ✅ Добавлено {len(page_books)} книг (всего: {collected})")
                 
+            except requests.RequestException as e:
+                print(f"  ❌ Ошибка запроса: {str(e)[:50]}")
+                if checkpoint:
+                    checkpoint.page_failed(spec.website, path, page)
+                continue
             except Exception as e:
                 print(f"  ❌ Ошибка: {str(e)[:50]}")
+                if checkpoint:
+                    checkpoint.page_failed(spec.website, path, page)
                 continue
         
-        print(f"  📊 По жанру {genre} собрано: {len(genre_books)} книг")
-    
-    print(f"🎯 Читай-город завершен! Всего книг: {len(books)}")
-    return books[:1000] if len(books) > 1000 else books
-
-# ============================================
-# ФУНКЦИЯ ДЛЯ ЛАБИРИНТА (1000+ книг)
-# ============================================
-def parse_labirint(pages=50):  # Увеличил для 1000+ книг
-    print("🚀 Начинаем парсинг Лабиринт (цель: 1000+ книг)...")
-    books = []
-    base_url = "https://www.labirint.ru"
+        print(f"  📊 {spec.category_label} {category_name}: собрано {category_count} книг")
     
-    # Разные категории для разнообразия
-    categories = [
-        ('/genres/2308/', 'Фантастика'),          # Фантастика
-        ('/genres/1852/', 'Детективы'),          # Детективы
-        ('/genres/1851/', 'Романы'),             # Романы
-        ('/genres/1850/', 'Приключения'),        # Приключения
-        ('/genres/1858/', 'Детские книги'),      # Детские
-        ('/genres/1854/', 'Бизнес'),             # Бизнес
-        ('/genres/1855/', 'Психология'),         # Психология
-        ('/search/?stype=0&way=popular', 'Популярное')  # Популярное
-    ]
+    crawler.map(crawl_category, spec.categories)
+    if collected >= spec.limit:
+        print(f"🎯 Достигнута цель: {spec.limit}+ книг!")
+    print(f"🎯 {spec.name} завершен! Всего книг: {collected}")
+    if duplicates:
+        print(f"♻️ Повторов из других разделов и страниц отброшено: {duplicates}")
     
-    pages_per_category = max(1, 1000 // (len(categories) * 20))
-    print(f"📊 План: {len(categories)} категорий × {pages_per_category} страниц × ~20 книг ≈ {len(categories) * pages_per_category * 20} книг")
+    if parsed:
+        print(f"📊 Статистика {spec.name}" + (f" (за этот запуск: {parsed} книг)" if parsed != collected else "") + ":")
+        print(f"   С названием: {with_title} ({with_title/parsed*100:.1f}%)")
+        print(f"   С автором: {with_author} ({with_author/parsed*100:.1f}%)")
+        print(f"   С ценой: {with_price} ({with_price/parsed*100:.1f}%)")
     
-    for url_suffix, category_name in categories:
-        print(f"\n📚 Категория: {category_name}")
-        
-        for page in range(1, pages_per_category + 1):
-            try:
-                if 'search' in url_suffix:
-                    url = f"{base_url}{url_suffix}&page={page}"
-                else:
-                    url = f"{base_url}{url_suffix}?display=table&page={page}"
-                    
-                print(f"  📄 Страница {page}/{pages_per_category}")
-                
-                response = retry_request(url)
-                if not response:
-                    continue
-                    
-                soup = BeautifulSoup(response.text, 'html.parser')
-                items = soup.select('.product')
+    return sink
 
-                if not items:
-                    print(f"  ⚠️ Не найдено книг")
-                    break
-                
-                page_books = 0
-                for item in items:
-                    try:
-                        title_elem = item.select_one('.product-title')
-                        title = title_elem.text.strip() if title_elem else "Название не указано"
-                        
-                        author_elem = item.select_one('.product-author')
-                        author = author_elem.text.strip() if author_elem else "Автор не указан"
-                        
-                        price_elem = item.select_one('.price-val')
-                        price_text = price_elem.text.strip() if price_elem else "0 ₽"
-                        price = int(re.sub(r'[^\d]', '', price_text)) if price_elem else 0
-                        
-                        link_elem = item.select_one('.product-title-link')
-                        link = base_url + link_elem['href'] if link_elem else ""
-                        
-                        pub_elem = item.select_one('.product-pubhouse')
-                        publisher = pub_elem.text.strip() if pub_elem else "Издательство не указано"
-                        
-                        year_elem = item.select_one('.product-pubyear')
-                        year = year_elem.text.strip() if year_elem else "2023"
-                        
-                        img_elem = item.select_one('.book-img-cover')
-                        image_url = img_elem['data-src'] if img_elem and img_elem.get('data-src') else ""
-                        
-                        books.append({
-                            'title': title, 'author': author, 'price': price,
-                            'original_price': price_text, 'url': link, 'website': 'labirint',
-                            'isbn': generate_isbn(), 'description': f"{publisher}, {year}. {title[:150]}",
-                            'image_url': image_url, 'publisher': publisher, 'year': year,
-                            'category': category_name,
-                            'date_parsed': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        })
-                        page_books += 1
-                        
-                    except Exception:
-                        continue
-                
-                print(f"  ✅ Добавлено {page_books} книг (всего: {len(books)})")
-                
-                if len(books) >= 1000:
-                    print(f"🎯 Достигнута цель: 1000+ книг!")
-                    return books[:1000]
-                
-                time.sleep(random.uniform(2, 4))
-                
-            except Exception as e:
-                print(f"  ❌ Ошибка: {str(e)[:50]}")
-                continue
+
+def parse_all_sites(base_urls=None, sinks=None, checkpoint=None):
+    """Парсит все магазины из STORES одновременно и возвращает их книги (в порядке STORES).
     
-    print(f"🎯 Лабиринт завершен! Всего книг: {len(books)}")
-    return books[:1000] if len(books) > 1000 else books
+    У каждого сайта свой лимит частоты, поэтому общее время определяется
+    самым медленным сайтом, а не суммой всех пауз. base_urls подменяет
+    адреса сайтов: {'labirint': 'http://127.0.0.1:8001', ...}, sinks - куда
+    писать книги магазинов: {'labirint': BookFile(...), ...} (по умолчанию - списки),
+    checkpoint - общий для всех магазинов прогресс обхода (crawler.Checkpoint).
+    """
+    base_urls = base_urls or {}
+    sinks = sinks or {}
+    with ThreadPoolExecutor(max_workers=len(STORES)) as executor:
+        futures = [executor.submit(crawl_store, spec, base_urls.get(spec.website), sinks.get(spec.website),
+                                   checkpoint)
+                   for spec in STORES]
+    return [future.result() for future in futures]
+
+def crawl_to_files(checkpoint_path, paths=None, base_urls=None):
+    """Обходит все магазины с продолжением по checkpoint_path и дописывает книги в CSV
+    магазинов (paths - {магазин: файл}, по умолчанию spec.output_file).
+
+    Прогресс удаляется, только если обход завершен целиком: страница, которая не
+    загрузилась (сеть упала посреди обхода), остается незагруженной в checkpoint,
+    и следующий запуск догрузит ее, не трогая готовые страницы и CSV.
+    Возвращает ({магазин: книг в файле}, число незагруженных страниц).
+    """
+    paths = paths or {}
+    checkpoint = Checkpoint(checkpoint_path)
+    if checkpoint.resumed:
+        print(f"↩️ Продолжаем прерванный обход: готово {checkpoint.pages()} страниц, "
+              f"{checkpoint.books()} книг (--restart - начать заново)")
+
+    # Все три сайта - одновременно, у каждого свой лимит частоты;
+    # книги каждой страницы сразу дописываются в CSV своего магазина
+    sinks = {spec.website: BookFile(paths.get(spec.website, spec.output_file), spec.columns(),
+                                    offset=checkpoint.offset(spec.website),
+                                    count=checkpoint.books(spec.website))
+             for spec in STORES}
+    try:
+        parse_all_sites(base_urls=base_urls, sinks=sinks, checkpoint=checkpoint)
+    finally:
+        for sink in sinks.values():
+            sink.close()
+
+    failed = checkpoint.failed_pages()
+    if failed:
+        checkpoint.close()
+        print(f"\n⚠️ Не загрузилось страниц: {failed} - прогресс сохранен в {checkpoint_path}, "
+              f"повторный запуск догрузит их")
+    else:
+        # Обход завершен - следующий запуск начнется с первых страниц
+        checkpoint.clear()
+    return {website: len(sink) for website, sink in sinks.items()}, failed
 
 # ============================================
-# ФУНКЦИЯ ДЛЯ MOSCOWBOOKS.RU (1000+ книг)
+# ВТОРОЙ ЭТАП: НАСТОЯЩИЕ ISBN СО СТРАНИЦ КНИГ
 # ============================================
-def parse_moscowbooks(pages=50):  # Увеличил для 1000+ книг
-    print("🚀 Начинаем парсинг Moscowbooks.ru (цель: 1000+ книг)...")
-    books = []
-    base_url = "https://www.moscowbooks.ru"
-    
-    # ПРОВЕРЕННЫЕ рабочие жанры (без 404)
-    genres = [
-        ('books/fiction/science-fiction/', 'Фантастика'),
-        ('books/exceptional/history-historical-sciences/', 'История'),
-        ('books/biographies-memoirs-publicism/', 'Биографии'),
-        ('books/exceptional/programming/', 'Программирование'),
-        ('books/fiction/the-novel/', 'Романы'),
-        ('books/children/children-fiction/', 'Детская литература'),
-        ('books/non-fiction/psychology/', 'Психология'),
-        ('books/non-fiction/business-finance/', 'Бизнес'),
-        ('books/non-fiction/philosophy/', 'Философия'),
-        ('books/non-fiction/art-culture/', 'Искусство')
-    ]
+def parse_detail_page(html, spec, base_url, backend=None):
+    """Разбирает страницу книги магазина spec: {'isbn': ..., 'publisher': ..., 'year': ...}"""
+    if parse_pool is not None:
+        return parse_pool.fields_of(spec, html, base_url, backend or HTML_PARSER)
+    return extract_fields(html, spec.detail_fields, base_url, backend or HTML_PARSER)
+
+def enrich_store(spec, path=None, base_url=None, batch_size=100):
+    """Заходит на страницу каждой книги из CSV магазина и берет оттуда настоящие ISBN,
+    издательство и год (spec.detail_fields). Возвращает (книг, найдено ISBN).
     
-    pages_per_genre = max(1, 1000 // (len(genres) * 20))
-    print(f"📊 План: {len(genres)} жанров × {pages_per_genre} страниц × ~20 книг ≈ {len(genres) * pages_per_genre * 20} книг")
+    Случайный ISBN из generate_isbn() заменяется настоящим, а если на странице его
+    нет - пустой строкой: так 1_create_database.py объединяет книги разных магазинов
+    по ISBN, а без него - по названию и автору. Страницы загружаются через crawler
+    (лимиты сайта, кэш ответов), CSV переписывается потоково, пачками по batch_size.
+    """
+    path = path or spec.output_file
+    base_url = base_url or spec.base_url
+    columns = read_header(path)
+    columns += [name for name in spec.detail_fields if name not in columns]
     
-    for genre_url, genre_name in genres:
-        print(f"\n📚 Жанр: {genre_name}")
-        genre_books = []
-        
-        for page in range(1, pages_per_genre + 1):
+    def enrich(book):
+        details = {}
+        if book.get('url'):
             try:
-                if page == 1:
-                    url = f"{base_url}/{genre_url}"
-                else:
-                    url = f"{base_url}/{genre_url}?PAGEN_1={page}"
-                    
-                print(f"  📄 Страница {page}/{pages_per_genre}: {genre_name}")
-                
-                response = retry_request(url)
-                if not response:
-                    print(f"  ⚠️ Пропускаем страницу (ошибка запроса)")
-                    continue
-                    
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                items = soup.select('.catalog__item.js-catalog-item')
-                if not items:
-                    items = soup.select('.js-catalog-item') or soup.select('.catalog__item')
-                
-                if not items:
-                    print(f"  ⚠️ Не найдено книг на странице")
-                    break
-                
-                page_books = 0
-                for item in items:
-                    try:
-                        title = "Название не указано"
-                        title_elem = item.select_one('.book-preview__title-link')
-                        if title_elem and title_elem.text.strip():
-                            title = title_elem.text.strip()
-                        
-                        author = "Автор не указан"
-                        author_elem = item.select_one('.book-preview__author .author-name')
-                        if author_elem and author_elem.text.strip():
-                            author = author_elem.text.strip()
-                        
-                        price = 0
-                        price_text = "0 ₽"
-                        store_price_text = ""
-                        
-                        price_elem = item.select_one('.book-preview__price')
-                        if price_elem and price_elem.text.strip():
-                            price_text = price_elem.text.strip()
-                            price = clean_price(price_text)
-                        
-                        store_price_elem = item.select_one('.book-preview__shop-price')
-                        if store_price_elem and store_price_elem.text.strip():
-                            store_price_text = store_price_elem.text.strip()
-                        
-                        link = ""
-                        link_elem = item.select_one('.book-preview__title-link') or item.select_one('.book-preview__cover a')
-                        if link_elem and link_elem.get('href'):
-                            href = link_elem.get('href')
-                            if href.startswith('/'):
-                                link = base_url + href
-                            elif href.startswith('http'):
-                                link = href
-                        
-                        image_url = ""
-                        img_elem = item.select_one('.book-preview__img')
-                        if img_elem:
-                            img_src = img_elem.get('src') or img_elem.get('data-src')
-                            if img_src:
-                                if img_src.startswith('//'):
-                                    image_url = 'https:' + img_src
-                                elif img_src.startswith('/'):
-                                    image_url = base_url + img_src
-                                else:
-                                    image_url = img_src
-                        
-                        genre_books.append({
-                            'title': title,
-                            'author': author,
-                            'price': price,
-                            'original_price': price_text,
-                            'store_price': store_price_text,
-                            'url': link,
-                            'website': 'moscowbooks',
-                            'isbn': generate_isbn(),
-                            'description': f"Книга '{title[:50]}...'",
-                            'image_url': image_url,
-                            'category': genre_name,
-                            'date_parsed': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        })
-                        page_books += 1
-                        
-                    except Exception as e:
-                        continue
-                
-                books.extend(genre_books)
-                print(f"  ✅ Добавлено {page_books} книг (всего: {len(books)})")
-                
-                if len(books) >= 1000:
-                    print(f"🎯 Достигнута цель: 1000+ книг!")
-                    return books[:1000]
-                
-                time.sleep(random.uniform(1, 3))
-                
-            except requests.RequestException as e:
-                print(f"  ❌ Ошибка запроса: {str(e)[:50]}")
-                continue
+                response = crawler.fetch(book['url'])
+                if response:
+                    details = parse_page(book['url'], response, parse_detail_page, spec, base_url)
             except Exception as e:
-                print(f"  ❌ Ошибка: {str(e)[:50]}")
-                continue
-        
-        print(f"  📊 По жанру {genre_name} собрано: {len(genre_books)} книг")
-    
-    print(f"🎯 Moscowbooks.ru завершен! Всего книг: {len(books)}")
+                print(f"  ❌ {spec.name}: {book['url']}: {str(e)[:50]}")
+        book['isbn'] = details.get('isbn', "")
+        for name, value in details.items():
+            if value:
+                book[name] = value
+        return book
     
-    if books:
-        books_with_title = sum(1 for b in books if b['title'] != "Название не указано")
-        books_with_author = sum(1 for b in books if b['author'] != "Автор не указан")
-        books_with_price = sum(1 for b in books if b['price'] > 0)
-        
-        print(f"📊 Статистика Moscowbooks:")
-        print(f"   Всего книг: {len(books)}")
-        print(f"   С названием: {books_with_title} ({books_with_title/len(books)*100:.1f}%)")
-        print(f"   С автором: {books_with_author} ({books_with_author/len(books)*100:.1f}%)")
-        print(f"   С ценой: {books_with_price} ({books_with_price/len(books)*100:.1f}%)")
-    
-    return books[:1000] if len(books) > 1000 else books
+    print(f"🔎 {spec.name}: загружаем страницы книг из {path}...")
+    books = found = 0
+    tmp_path = path + '.tmp'
+    with open(path, newline='', encoding='utf-8-sig') as f, BookFile(tmp_path, columns) as out:
+        reader = csv.DictReader(f)
+        for batch in iter(lambda: list(itertools.islice(reader, batch_size)), []):
+            enriched = crawler.map(enrich, batch)
+            out.extend(enriched)
+            books += len(enriched)
+            found += sum(1 for book in enriched if book['isbn'])
+            print(f"  ✅ {spec.name}: {books} книг, ISBN найден у {found}")
+    os.replace(tmp_path, path)
+    return books, found
+
+def enrich_all_sites(paths=None, base_urls=None):
+    """Обогащает CSV всех магазинов с detail_fields одновременно: {website: (книг, найдено ISBN)}"""
+    paths = paths or {}
+    base_urls = base_urls or {}
+    specs = [spec for spec in STORES if spec.detail_fields]
+    with ThreadPoolExecutor(max_workers=len(specs)) as executor:
+        futures = {spec.website: executor.submit(enrich_store, spec, paths.get(spec.website),
+                                                 base_urls.get(spec.website))
+                   for spec in specs}
+    return {website: future.result() for website, future in futures.items()}
 
 # ============================================
 # ЗАПУСК ПАРСЕРА (1000+ книг с каждого сайта)
 # ============================================
-print("=" * 70)
-print("🔄 ЗАПУСК ПАРСИНГА 3 САЙТОВ (ЦЕЛЬ: 1000+ КНИГ С КАЖДОГО)")
-print("=" * 70)
-
-print("\n" + "=" * 70)
-print("1️⃣ ПАРСИМ ЧИТАЙ-ГОРОД (1000+ книг)")
-print("=" * 70)
-chitai_books = parse_chitai_gorod(pages=50)
-
-print("\n" + "=" * 70)
-print("2️⃣ ПАРСИМ ЛАБИРИНТ (1000+ книг)")
-print("=" * 70)
-labirint_books = parse_labirint(pages=50)
-
-print("\n" + "=" * 70)
-print("3️⃣ ПАРСИМ MOSCOWBOOKS.RU (1000+ книг)")
-print("=" * 70)
-moscowbooks_books = parse_moscowbooks(pages=50)
-
-# Сохраняем данные
-df_chitai = pd.DataFrame(chitai_books) if chitai_books else pd.DataFrame()
-df_labirint = pd.DataFrame(labirint_books) if labirint_books else pd.DataFrame()
-df_moscowbooks = pd.DataFrame(moscowbooks_books) if moscowbooks_books else pd.DataFrame()
-
-print("\n" + "=" * 70)
-print("💾 СОХРАНЕНИЕ РЕЗУЛЬТАТОВ")
-print("=" * 70)
-
-if not df_chitai.empty:
-    df_chitai.to_csv('chitai_gorod_1000.csv', index=False, encoding='utf-8-sig')
-    print(f"✅ Читай-город: сохранено {len(df_chitai)} книг в chitai_gorod_1000.csv")
-
-if not df_labirint.empty:
-    df_labirint.to_csv('labirint_1000.csv', index=False, encoding='utf-8-sig')
-    print(f"✅ Лабиринт: сохранено {len(df_labirint)} книг в labirint_1000.csv")
-
-if not df_moscowbooks.empty:
-    df_moscowbooks.to_csv('moscowbooks_1000.csv', index=False, encoding='utf-8-sig')
-    print(f"✅ Moscowbooks: сохранено {len(df_moscowbooks)} книг в moscowbooks_1000.csv")
-
-# Объединяем все данные
-all_dfs = [df for df in [df_chitai, df_labirint, df_moscowbooks] if not df.empty]
-
-if len(all_dfs) >= 1:
-    all_books = pd.concat(all_dfs, ignore_index=True)
-    all_books.to_csv('all_books_3000.csv', index=False, encoding='utf-8-sig')
-    
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Парсинг книг с Читай-города, Лабиринта и Moscowbooks")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help="одновременных запросов к одному сайту")
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help="запросов в секунду к одному сайту")
+    parser.add_argument('--pool-size', type=int, default=None,
+                        help="открытых соединений с одним сайтом (по умолчанию = --concurrency)")
+    parser.add_argument('--parser', choices=['lxml', 'soup'], default=HTML_PARSER,
+                        help="чем разбирать страницы: lxml (быстрее) или BeautifulSoup")
+    parser.add_argument('--cache-dir', default='http_cache',
+                        help="папка кэша ответов (ETag/Last-Modified) между запусками")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="не использовать кэш ответов")
+    parser.add_argument('--checkpoint', default='crawl_checkpoint.jsonl',
+                        help="файл прогресса обхода: прерванный обход продолжается с того же места")
+    parser.add_argument('--restart', action='store_true',
+                        help="начать обход заново, даже если есть незаконченный")
+    parser.add_argument('--enrich', action='store_true',
+                        help="после обхода каталога зайти на страницу каждой книги за ISBN, издательством и годом")
+    parser.add_argument('--enrich-only', action='store_true',
+                        help="только обогатить уже собранные CSV, каталог не обходить")
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help="процессов для разбора страниц (0 - разбор в потоках загрузки); "
+                             "имеет смысл, когда --rate и --concurrency подняты")
+    fixtures = parser.add_mutually_exclusive_group()
+    fixtures.add_argument('--record', metavar='DIR',
+                          help="сохранить загруженные страницы в папку (для --replay)")
+    fixtures.add_argument('--replay', metavar='DIR',
+                          help="обойти записанные в папку страницы без сети (локальный сервер)")
+    # parse_known_args: в Colab/Jupyter ядро передает свои аргументы
+    args, _ = parser.parse_known_args()
+    HTML_PARSER = args.parser
+    # Записанные страницы не меняются - кэш ответов при воспроизведении не нужен
+    cache = None if args.no_cache or args.replay else ResponseCache(args.cache_dir)
+    http = HttpClient(pool_size=args.pool_size or args.concurrency, user_agent=lambda: ua.random, cache=cache,
+                      on_retry=wait_retry)
+    fetch = retry_request
+    if args.record:
+        recorder = FixtureRecorder(args.record)
+        fetch = recorder.wrap(fetch)
+    if args.replay:
+        replay = FixtureReplay(args.replay)
+        fetch = replay.wrap(fetch)
+    crawler = Crawler(fetch=fetch, concurrency=args.concurrency, rate=args.rate)
+    if args.parse_workers:
+        parse_pool = ParsePool(workers=args.parse_workers)
+
+    print("=" * 70)
+    print("🔄 ЗАПУСК ПАРСИНГА 3 САЙТОВ (ЦЕЛЬ: 1000+ КНИГ С КАЖДОГО)")
+    print("=" * 70)
+    print(f"⚙️ На каждый сайт: до {args.concurrency} запросов одновременно, {args.rate} запросов/с")
+
+    if args.enrich_only:
+        # Каталог не обходим: берем уже собранные CSV
+        counts = {}
+    else:
+        # Незаконченный прошлый обход продолжается: готовые страницы не загружаются,
+        # CSV магазинов дописываются с места последней готовой страницы
+        if args.restart and os.path.exists(args.checkpoint):
+            os.remove(args.checkpoint)
+        start_time = time.time()
+        counts, _ = crawl_to_files(args.checkpoint)
+        print(f"\n⏱️ Парсинг занял {time.time() - start_time:.0f} с")
+
+    if args.enrich or args.enrich_only:
+        # Второй этап: страницы книг - ради настоящих ISBN (тоже с лимитами и кэшем)
+        print("\n" + "=" * 70)
+        print("🔎 ОБОГАЩЕНИЕ: ISBN, ИЗДАТЕЛЬСТВО И ГОД СО СТРАНИЦ КНИГ")
+        print("=" * 70)
+        start_time = time.time()
+        for website, (books, found) in enrich_all_sites().items():
+            counts[website] = books
+            print(f"✅ {website}: ISBN найден у {found} из {books} книг")
+        print(f"\n⏱️ Обогащение заняло {time.time() - start_time:.0f} с")
+
+    connections = http.stats()
+    for host, host_stats in crawler.stats().items():
+        print(f"   • {host}: {host_stats['requests']} запросов ({host_stats['fetch_time_s']} с в загрузке), "
+              f"ожидание лимита {host_stats['wait_time_s']} с")
+        if host in connections:
+            host_connections = connections[host]
+            print(f"     соединений открыто {host_connections['connections_opened']}, "
+                  f"переиспользовано {host_connections['connections_reused']}, "
+                  f"повторов {host_connections['retries']}")
+            print(f"     не изменилось страниц: {host_connections['not_modified']} (304) + "
+                  f"{host_connections['unchanged']} (тот же хэш)")
+    if cache is not None:
+        print(f"   Страниц взято из кэша без разбора: {cache.parse_skipped}")
+    if parse_pool is not None:
+        parse_stats = parse_pool.stats()
+        print(f"   Разбор: {parse_stats['workers']} процессов, {parse_stats['pages']} страниц "
+              f"({parse_stats['pages_per_s']} страниц/с), {parse_stats['cards']} карточек, "
+              f"{parse_stats['parse_time_s']} с в разборе; ожидание очереди {parse_stats['queue_wait_s']} с, "
+              f"в очереди до {parse_stats['max_queued']} страниц")
+        parse_pool.close()
+    if args.record:
+        print(f"   Записано страниц в {args.record}: {recorder.recorded}")
+    if args.replay:
+        for host, host_stats in replay.stats().items():
+            print(f"   • {host} (запись): отдано {host_stats['served']} страниц, "
+                  f"не записано {host_stats['misses']}")
+        replay.close()
+    http.close()
+
     print("\n" + "=" * 70)
-    print("📊 ИТОГОВЫЕ РЕЗУЛЬТАТЫ ПАРСИНГА")
+    print("💾 СОХРАНЕНИЕ РЕЗУЛЬТАТОВ")
     print("=" * 70)
-    print(f"📚 Читай-город: {len(df_chitai)} книг {'✅ 1000+' if len(df_chitai) >= 1000 else '⚠️ Меньше 1000'}")
-    print(f"📚 Лабиринт: {len(df_labirint)} книг {'✅ 1000+' if len(df_labirint) >= 1000 else '⚠️ Меньше 1000'}")
-    print(f"📚 Moscowbooks: {len(df_moscowbooks)} книг {'✅ 1000+' if len(df_moscowbooks) >= 1000 else '⚠️ Меньше 1000'}")
-    print(f"📚 ВСЕГО: {len(all_books)} книг")
-    
-    print("\n👀 ПРЕДПРОСМОТР ДАННЫХ (первые 10 записей):")
-    print(all_books[['title', 'author', 'price', 'website']].head(10))
-    
-    # Сводная статистика
-    print("\n📈 СВОДНАЯ СТАТИСТИКА:")
-    for website in ['chitai-gorod', 'labirint', 'moscowbooks']:
-        df_site = all_books[all_books['website'] == website]
-        if not df_site.empty:
-            avg_price = df_site['price'].mean()
-            unique_authors = df_site['author'].nunique()
-            print(f"  {website}: {len(df_site)} книг, {unique_authors} авторов, средняя цена: {avg_price:.0f}₽")
-    
-    # Скачиваем для Google Colab
-    try:
-        from google.colab import files
-        files.download('all_books_3000.csv')
-        print("\n📥 Файл all_books_3000.csv скачан на компьютер!")
+
+    for spec in STORES:
+        if spec.website in counts:
+            print(f"✅ {spec.name}: сохранено {counts[spec.website]} книг в {spec.output_file}")
+
+    # Объединяем файлы магазинов построчно, не загружая их в память целиком
+    saved = [spec.output_file for spec in STORES if counts.get(spec.website)]
+
+    if saved:
+        total = merge_csv(saved, 'all_books_3000.csv')
         
-        # Также скачиваем отдельные файлы
-        for filename in ['chitai_gorod_1000.csv', 'labirint_1000.csv', 'moscowbooks_1000.csv']:
-            try:
-                files.download(filename)
-                print(f"📥 Файл {filename} скачан на компьютер!")
-            except:
-                pass
-    except:
-        print("\n✅ Файлы сохранены в текущей директории:")
-        print("   - all_books_3000.csv (все данные)")
-        print("   - chitai_gorod_1000.csv")
-        print("   - labirint_1000.csv")
-        print("   - moscowbooks_1000.csv")
-else:
-    print("\n⚠️ Ни один парсер не вернул данные!")
-
-print("\n" + "=" * 70)
-print("✅ ПАРСИНГ ЗАВЕРШЕН!")
-print("=" * 70)
-print("🔧 Для увеличения количества книг:")
-print("   1. Увеличьте значение pages в вызовах функций")
-print("   2. Добавьте больше жанров/категорий")
-print("   3. Уменьшите задержку между запросами (осторожно!)")
-print("=" * 70)
\ No newline at end of file
+        print("\n" + "=" * 70)
+        print("📊 ИТОГОВЫЕ РЕЗУЛЬТАТЫ ПАРСИНГА")
+        print("=" * 70)
+        for spec in STORES:
+            count = counts.get(spec.website, 0)
+            print(f"📚 {spec.name}: {count} книг {'✅ 1000+' if count >= 1000 else '⚠️ Меньше 1000'}")
+        print(f"📚 ВСЕГО: {total} книг")
+        
+        # Для предпросмотра и статистики хватает четырех столбцов
+        all_books = pd.read_csv('all_books_3000.csv', encoding='utf-8-sig',
+                                usecols=['title', 'author', 'price', 'website'])
+        print("\n👀 ПРЕДПРОСМОТР ДАННЫХ (первые 10 записей):")
+        print(all_books.head(10))
+        
+        # Сводная статистика
+        print("\n📈 СВОДНАЯ СТАТИСТИКА:")
+        for website in [spec.website for spec in STORES]:
+            df_site = all_books[all_books['website'] == website]
+            if not df_site.empty:
+                avg_price = df_site['price'].mean()
+                unique_authors = df_site['author'].nunique()
+                print(f"  {website}: {len(df_site)} книг, {unique_authors} авторов, средняя цена: {avg_price:.0f}₽")
+        
+        # Скачиваем для Google Colab
+        try:
+            from google.colab import files
+            files.download('all_books_3000.csv')
+            print("\n📥 Файл all_books_3000.csv скачан на компьютер!")
+            
+            # Также скачиваем отдельные файлы
+            for filename in ['chitai_gorod_1000.csv', 'labirint_1000.csv', 'moscowbooks_1000.csv']:
+                try:
+                    files.download(filename)
+                    print(f"📥 Файл {filename} скачан на компьютер!")
+                except:
+                    pass
+        except:
+            print("\n✅ Файлы сохранены в текущей директории:")
+            print("   - all_books_3000.csv (все данные)")
+            print("   - chitai_gorod_1000.csv")
+            print("   - labirint_1000.csv")
+            print("   - moscowbooks_1000.csv")
+    else:
+        print("\n⚠️ Ни один парсер не вернул данные!")
+
+    print("\n" + "=" * 70)
+    print("✅ ПАРСИНГ ЗАВЕРШЕН!")
+    print("=" * 70)
+    print("🔧 Для увеличения количества книг:")
+    print("   1. Увеличьте limit у магазинов в stores.py")
+    print("   2. Добавьте больше разделов в categories (stores.py)")
+    print("   3. Увеличьте --rate и --concurrency (осторожно!)")
+    print("=" * 70)
\ No newline at end of file
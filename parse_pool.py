@@ -0,0 +1,90 @@
+# parse_pool.py - РАЗБОР СТРАНИЦ В ОТДЕЛЬНЫХ ПРОЦЕССАХ (НА ВСЕХ ЯДРАХ, А НЕ В ПОТОКАХ ЗАГРУЗКИ)
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from extract import extract_cards, extract_fields
+from stores import STORES
+
+STORES_BY_WEBSITE = {spec.website: spec for spec in STORES}
+
+def _extract(website, detail, html, base_url, backend):
+    """Работа процесса-разборщика: поля карточек страницы каталога (или страницы книги)
+    магазина website и время разбора. Описание магазина процесс берет из своего stores.py -
+    скомпилированные селекторы между процессами не передаются."""
+    start = time.perf_counter()
+    spec = STORES_BY_WEBSITE[website]
+    if detail:
+        result = extract_fields(html, spec.detail_fields, base_url, backend)
+    else:
+        result = extract_cards(html, spec.items, spec.fields, base_url, backend)
+    return result, time.perf_counter() - start
+
+class ParsePool:
+    """Процессы-разборщики: поток загрузки отдает им HTML и ждет готовые поля.
+
+    Разбор (работа для процессора) идет на всех ядрах, а не по очереди под GIL в
+    потоках загрузки. Очереди между загрузкой и разбором нет: поток ждет разбора
+    своей страницы и только потом загружает следующую (по книгам страницы
+    решается, продолжать ли раздел); сеть тем временем используют другие потоки.
+    Одновременно разбирается не больше max_pending страниц, остальные ждут места.
+    stats() - пропускная способность разбора и время ожидания места.
+    """
+
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.workers
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self.pages = 0
+        self.cards = 0
+        self.parse_time = 0.0
+        self.queue_wait = 0.0
+        self.pending = 0
+        self.max_queued = 0
+
+    def _run(self, website, detail, html, base_url, backend):
+        wait_start = time.perf_counter()
+        self._slots.acquire()
+        with self._lock:
+            self.queue_wait += time.perf_counter() - wait_start
+            self.pending += 1
+            self.max_queued = max(self.max_queued, self.pending)
+        try:
+            result, elapsed = self._executor.submit(_extract, website, detail, html, base_url, backend).result()
+        finally:
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+        with self._lock:
+            self.pages += 1
+            self.cards += 1 if detail else len(result)
+            self.parse_time += elapsed
+        return result
+
+    def cards_of(self, spec, html, base_url, backend):
+        """Поля карточек страницы каталога - как extract_cards, но в процессе-разборщике"""
+        return self._run(spec.website, False, html, base_url, backend)
+
+    def fields_of(self, spec, html, base_url, backend):
+        """Поля страницы книги - как extract_fields, но в процессе-разборщике"""
+        return self._run(spec.website, True, html, base_url, backend)
+
+    def stats(self):
+        """Стадия разбора: страниц, карточек, страниц/с с момента запуска, суммарное время
+        разбора в процессах, ожидание места в очереди и наибольшая длина очереди"""
+        with self._lock:
+            elapsed = time.perf_counter() - self._started
+            return {'workers': self.workers,
+                    'pages': self.pages,
+                    'cards': self.cards,
+                    'pages_per_s': round(self.pages / elapsed, 1) if elapsed else 0.0,
+                    'parse_time_s': round(self.parse_time, 2),
+                    'queue_wait_s': round(self.queue_wait, 2),
+                    'max_queued': self.max_queued}
+
+    def close(self):
+        self._executor.shutdown()
@@ -0,0 +1,179 @@
+# stores.py - ОПИСАНИЯ МАГАЗИНОВ ДЛЯ ПАРСЕРА: АДРЕСА КАТАЛОГА, СЕЛЕКТОРЫ КАРТОЧЕК, ПОЛЯ
+#
+# Новый магазин - это новый StoreSpec в STORES: обход, разбор страниц,
+# кэш и ограничения частоты запросов pars.py применяет ко всем одинаково.
+from extract import Field, extract_year, normalize_isbn, strip_parenthetical
+
+# Поля, которые конвейер pars.py добавляет к полям карточки
+BOOK_COLUMNS = ['price', 'website', 'isbn', 'description', 'category', 'date_parsed']
+
+class StoreSpec:
+    """Описание магазина для общего конвейера парсинга.
+
+    categories - разделы каталога: (путь, название) или (путь, название, шаблон адреса),
+    listing_url - шаблон адреса страницы раздела: {base_url}, {path}, {page},
+    first_page_url - отдельный шаблон для первой страницы (если у нее нет номера),
+    items - селекторы карточек на странице (берутся первые, что что-то нашли),
+    fields - {поле: Field}; обязательны title, author, original_price, url, image_url,
+    description - шаблон описания книги по ее полям,
+    output_file - CSV, куда пишутся книги магазина,
+    detail_fields - {поле: Field} на странице книги (isbn, publisher, year) для
+    второго этапа - обогащения (pars.py --enrich); None - магазин не обогащается.
+    Со всех разделов вместе собирается до limit книг, на странице ~per_page карточек.
+    """
+
+    def __init__(self, website, name, base_url, categories, listing_url, items, fields,
+                 description, output_file, detail_fields=None, first_page_url=None,
+                 category_label="Раздел", limit=1000, per_page=20):
+        self.website = website
+        self.name = name
+        self.base_url = base_url
+        self.categories = categories
+        self.listing_url = listing_url
+        self.first_page_url = first_page_url
+        self.items = [items] if isinstance(items, str) else items
+        self.fields = fields
+        self.description = description
+        self.output_file = output_file
+        self.detail_fields = detail_fields
+        self.category_label = category_label
+        self.limit = limit
+        self.per_page = per_page
+
+    def pages_per_category(self):
+        """Сколько страниц брать с раздела, чтобы всего набралось около limit книг"""
+        return max(1, self.limit // (len(self.categories) * self.per_page))
+
+    def columns(self):
+        """Столбцы CSV магазина: поля карточки и поля, которые добавляет конвейер"""
+        return list(self.fields) + [column for column in BOOK_COLUMNS if column not in self.fields]
+
+    def page_url(self, category, page, base_url=None):
+        """Адрес страницы page раздела category"""
+        path = category[0]
+        if len(category) > 2:
+            template = category[2]
+        elif page == 1 and self.first_page_url:
+            template = self.first_page_url
+        else:
+            template = self.listing_url
+        return template.format(base_url=base_url or self.base_url, path=path, page=page)
+
+CHITAI_GOROD = StoreSpec(
+    website='chitai-gorod',
+    name="Читай-город",
+    base_url="https://www.chitai-gorod.ru",
+    category_label="Жанр",
+    # Рабочие жанры
+    categories=[
+        ('klassicheskaya-proza-110003', 'klassicheskaya-proza-110003'),
+        ('detektiv-triller-110010', 'detektiv-triller-110010'),
+        ('fantastika-113787', 'fantastika-113787'),
+        ('lyubovnye-romany-110005', 'lyubovnye-romany-110005'),
+        ('priklyucheniya-110006', 'priklyucheniya-110006'),
+        ('detskie-knigi-110013', 'detskie-knigi-110013'),
+        ('nauchnaya-literatura-110015', 'nauchnaya-literatura-110015'),
+        ('psikhologiya-110016', 'psikhologiya-110016'),
+        ('biznes-knigi-110017', 'biznes-knigi-110017'),
+    ],
+    listing_url="{base_url}/catalog/books/{path}?page={page}",
+    items='article.product-card, .product-card, .app-products-list__item',
+    fields={
+        'title': Field(['.product-card__title', '.product-card__caption a'],
+                       default="Название не указано", normalize=strip_parenthetical),
+        'author': Field(['.product-card__subtitle', '.product-card__caption span'], default="Автор не указан"),
+        'original_price': Field(['.product-mini-card-price__price', '.product-price__value'], default="0 ₽"),
+        'url': Field(['a.product-card__title', 'a[href*="/product/"]'], attr='href', url=True),
+        'image_url': Field(['img.product-card__image', '.product-card__image-wrapper img'],
+                           attr=('src', 'data-src'), url=True),
+    },
+    description="Книга '{title:.50}...'",
+    output_file='chitai_gorod_1000.csv',
+    # Страница книги: характеристики размечены schema.org (itemprop)
+    detail_fields={
+        'isbn': Field(['[itemprop="isbn"]', '.product-detail-features__item-value--isbn'],
+                      normalize=normalize_isbn),
+        'publisher': Field(['[itemprop="publisher"]', '.product-detail-features__item-value a[href*="/publisher/"]']),
+        'year': Field(['[itemprop="datePublished"]', '.product-detail-features__item-value--year'],
+                      normalize=extract_year),
+    },
+)
+
+LABIRINT = StoreSpec(
+    website='labirint',
+    name="Лабиринт",
+    base_url="https://www.labirint.ru",
+    category_label="Категория",
+    # Разные категории для разнообразия
+    categories=[
+        ('/genres/2308/', 'Фантастика'),
+        ('/genres/1852/', 'Детективы'),
+        ('/genres/1851/', 'Романы'),
+        ('/genres/1850/', 'Приключения'),
+        ('/genres/1858/', 'Детские книги'),
+        ('/genres/1854/', 'Бизнес'),
+        ('/genres/1855/', 'Психология'),
+        ('/search/?stype=0&way=popular', 'Популярное', "{base_url}{path}&page={page}"),
+    ],
+    listing_url="{base_url}{path}?display=table&page={page}",
+    items='.product',
+    fields={
+        'title': Field('.product-title', default="Название не указано"),
+        'author': Field('.product-author', default="Автор не указан"),
+        'original_price': Field('.price-val', default="0 ₽"),
+        'url': Field('.product-title-link', attr='href', url=True),
+        'image_url': Field('.book-img-cover', attr='data-src'),
+        'publisher': Field('.product-pubhouse', default="Издательство не указано"),
+        'year': Field('.product-pubyear', default="2023"),
+    },
+    description="{publisher}, {year}. {title:.150}",
+    output_file='labirint_1000.csv',
+    # Страница книги: «ISBN: 978-5-...», «Издательство: Эксмо, 2023 г.»
+    detail_fields={
+        'isbn': Field(['.isbn', '[itemprop="isbn"]'], normalize=normalize_isbn),
+        'publisher': Field(['.publisher a', '[itemprop="publisher"]']),
+        'year': Field(['.publisher', '[itemprop="datePublished"]'], normalize=extract_year),
+    },
+)
+
+MOSCOWBOOKS = StoreSpec(
+    website='moscowbooks',
+    name="Moscowbooks.ru",
+    base_url="https://www.moscowbooks.ru",
+    category_label="Жанр",
+    # ПРОВЕРЕННЫЕ рабочие жанры (без 404)
+    categories=[
+        ('books/fiction/science-fiction/', 'Фантастика'),
+        ('books/exceptional/history-historical-sciences/', 'История'),
+        ('books/biographies-memoirs-publicism/', 'Биографии'),
+        ('books/exceptional/programming/', 'Программирование'),
+        ('books/fiction/the-novel/', 'Романы'),
+        ('books/children/children-fiction/', 'Детская литература'),
+        ('books/non-fiction/psychology/', 'Психология'),
+        ('books/non-fiction/business-finance/', 'Бизнес'),
+        ('books/non-fiction/philosophy/', 'Философия'),
+        ('books/non-fiction/art-culture/', 'Искусство'),
+    ],
+    first_page_url="{base_url}/{path}",
+    listing_url="{base_url}/{path}?PAGEN_1={page}",
+    items=['.catalog__item.js-catalog-item', '.js-catalog-item', '.catalog__item'],
+    fields={
+        'title': Field('.book-preview__title-link', default="Название не указано"),
+        'author': Field('.book-preview__author .author-name', default="Автор не указан"),
+        'original_price': Field('.book-preview__price', default="0 ₽"),
+        'store_price': Field('.book-preview__shop-price'),
+        'url': Field(['.book-preview__title-link', '.book-preview__cover a'], attr='href', url=True),
+        'image_url': Field('.book-preview__img', attr=('src', 'data-src'), url=True),
+    },
+    description="Книга '{title:.50}...'",
+    output_file='moscowbooks_1000.csv',
+    # Страница книги: характеристики размечены schema.org (itemprop)
+    detail_fields={
+        'isbn': Field(['[itemprop="isbn"]', '.book__isbn'], normalize=normalize_isbn),
+        'publisher': Field(['[itemprop="publisher"]', '.book__publisher a']),
+        'year': Field(['[itemprop="datePublished"]', '.book__year'], normalize=extract_year),
+    },
+)
+
+# Магазины в порядке обхода и сохранения результатов
+STORES = [CHITAI_GOROD, LABIRINT, MOSCOWBOOKS]